@@ -0,0 +1,3 @@
+# SPDX-FileCopyrightText: 2025-present Chris Mostert <15890652+chrismostert@users.noreply.github.com>
+#
+# SPDX-License-Identifier: EUPL-1.2
@@ -0,0 +1,183 @@
+"""Benchmark eml2csv on synthetic EML files and write a machine-readable report.
+
+Run from the repository root:
+
+    python -m benchmarks.run --output bench.json
+    python -m benchmarks.run --baseline bench.json  # compare against an earlier report
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections.abc import Callable
+from dataclasses import asdict
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any
+
+from eml2csv.__about__ import __version__
+from eml2csv.lib import (
+    _generate_rows,
+    _Output,
+    _read_candidates_eml,
+    _read_counts_eml,
+    eml2csv,
+)
+from eml2csv.probe import probe_eml
+from eml2csv.util import XML_BACKENDS, set_xml_backend
+from eml2csv.validation import _check
+from tests.synthetic import SyntheticElection, write_pair
+
+SCENARIOS = {
+    # A municipality like West Maas en Waal
+    "municipality": SyntheticElection(reporting_units=20, affiliations=15, candidates=30),
+    # A G4 city at a TK election
+    "g4_city": SyntheticElection(reporting_units=450, affiliations=30, candidates=50),
+}
+
+# Processes of the read_counts_sharded stage, it is only faster than read_counts on a machine with as many cores
+PARSE_WORKERS = 4
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenario", action="append", choices=SCENARIOS, help="Scenario to run, default all")
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiply the number of reporting units")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per stage, the fastest is reported")
+    parser.add_argument(
+        "--parse-workers", type=int, default=PARSE_WORKERS, help="Processes of the read_counts_sharded stage"
+    )
+    parser.add_argument("--xml-backend", choices=["auto", *XML_BACKENDS], default="auto", help="XML parser to use")
+    parser.add_argument("--output", type=Path, help="Write the JSON report to this file instead of stdout")
+    parser.add_argument("--baseline", type=Path, help="Earlier JSON report to compare against")
+    parser.add_argument(
+        "--max-slowdown", type=float, default=1.25, help="Fail if a stage is this many times slower than baseline"
+    )
+    args = parser.parse_args(argv)
+    xml_backend = set_xml_backend(args.xml_backend)
+
+    report: dict[str, Any] = {
+        "eml2csv_version": __version__,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "xml_backend": xml_backend.name,
+        # The sharded stage only shows its speedup with at least as many cores as parse workers
+        "cpu_count": os.cpu_count(),
+        "available_cpus": available_cpus(),
+        "parse_workers": args.parse_workers,
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "scenarios": {},
+    }
+    if report["available_cpus"] < args.parse_workers:
+        sys.stderr.write(
+            f"{args.parse_workers} parse workers but available CPUs: {report['available_cpus']}, "
+            "so read_counts_sharded does not show the speedup of a multi-core machine\n"
+        )
+    with tempfile.TemporaryDirectory() as directory:
+        for name in args.scenario or SCENARIOS:
+            election = SCENARIOS[name]
+            election = SyntheticElection(
+                **{**asdict(election), "reporting_units": max(1, round(election.reporting_units * args.scale))}
+            )
+            sys.stderr.write(f"Running {name} ({election.reporting_units} reporting units)...\n")
+            report["scenarios"][name] = run_scenario(Path(directory), election, args.repeat, args.parse_workers)
+
+    if args.output is not None:
+        args.output.write_text(json.dumps(report, indent=2))
+    else:
+        sys.stdout.write(json.dumps(report, indent=2) + "\n")
+
+    if args.baseline is not None:
+        return compare(json.loads(args.baseline.read_text()), report, args.max_slowdown)
+    return 0
+
+
+def run_scenario(directory: Path, election: SyntheticElection, repeat: int, parse_workers: int) -> dict[str, Any]:
+    counts_path, candidates_path = write_pair(directory, election)
+    counts, candidates = str(counts_path), str(candidates_path)
+    counts_eml = _read_counts_eml(counts)
+    candidates_eml = _read_candidates_eml(candidates)
+
+    def write():
+        with open(os.devnull, "w", encoding="utf-8-sig") as stream:
+            output = _Output(stream)
+            for row in _generate_rows(counts_eml, candidates_eml.candidate_info):
+                output.push(row)
+
+    stages: dict[str, Callable[[], object]] = {
+        "probe": lambda: (probe_eml(counts), probe_eml(candidates)),
+        "read_counts": lambda: _read_counts_eml(counts),
+        "read_counts_sharded": lambda: _read_counts_eml(counts, workers=parse_workers),
+        "read_candidates": lambda: _read_candidates_eml(candidates),
+        "write": write,
+        "validate": lambda: _check(counts_eml, counts_eml.reporting_unit_ids),
+        "convert": lambda: eml2csv(counts, candidates, os.devnull),
+        "convert_long": lambda: eml2csv(counts, candidates, os.devnull, layout="long"),
+    }
+    results = {name: measure(stage, repeat) for name, stage in stages.items()}
+    return {
+        "election": asdict(election),
+        "counts_bytes": counts_path.stat().st_size,
+        "candidates_bytes": candidates_path.stat().st_size,
+        "stages": results,
+        "sharded_speedup": results["read_counts"]["seconds"] / results["read_counts_sharded"]["seconds"],
+    }
+
+
+def available_cpus() -> int:
+    # The cores this process may run on, which can be fewer than the machine has in a container
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def measure(stage: Callable[[], object], repeat: int) -> dict[str, float]:
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        stage()
+        seconds.append(time.perf_counter() - start)
+
+    # Measured separately, because tracing allocations slows the stage down considerably
+    tracemalloc.start()
+    try:
+        stage()
+        peak_bytes = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return {"seconds": min(seconds), "peak_bytes": peak_bytes}
+
+
+def compare(baseline: dict[str, Any], report: dict[str, Any], max_slowdown: float) -> int:
+    regressions = 0
+    differences = [
+        f"{key} {baseline.get(key)} instead of {report[key]}"
+        for key in ("available_cpus", "parse_workers")
+        if baseline.get(key) != report[key]
+    ]
+    if differences:
+        sys.stderr.write(f"The baseline ran with {', '.join(differences)}, so read_counts_sharded is not comparable\n")
+    for name, scenario in report["scenarios"].items():
+        baseline_stages = baseline["scenarios"].get(name, {}).get("stages", {})
+        for stage, result in scenario["stages"].items():
+            if stage not in baseline_stages:
+                continue
+            slowdown = result["seconds"] / baseline_stages[stage]["seconds"]
+            memory = result["peak_bytes"] / max(baseline_stages[stage]["peak_bytes"], 1)
+            regressed = slowdown > max_slowdown
+            regressions += regressed
+            sys.stderr.write(
+                f"{name:>14} {stage:<16} time x{slowdown:.2f} memory x{memory:.2f}"
+                f"{'  REGRESSION' if regressed else ''}\n"
+            )
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
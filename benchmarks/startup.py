@@ -0,0 +1,104 @@
+"""Benchmark how long the eml2csv command takes to start and convert a file, and write a machine-readable report.
+
+Every measurement runs a new Python process, like the packaged binary does. Run from the repository root:
+
+    python -m benchmarks.startup --output startup.json
+    python -m benchmarks.startup --baseline startup.json  # compare against an earlier report
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any
+
+from eml2csv.__about__ import __version__
+from eml2csv.manifest import MANIFEST_FILE_NAME
+
+COUNTS_EML = "tests/Telling_GR2022_WestMaasenWaal.eml.xml"
+CANDIDATES_EML = "tests/Kandidatenlijsten_GR2022_WestMaasenWaal.eml.xml"
+# Modules that take long to import and are not needed for the plain conversion
+HEAVY_MODULES = ["typer", "click", "rich", "concurrent.futures", "sqlite3"]
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=10, help="Runs per stage, the fastest is reported")
+    parser.add_argument("--output", type=Path, help="Write the JSON report to this file instead of stdout")
+    parser.add_argument("--baseline", type=Path, help="Earlier JSON report to compare against")
+    parser.add_argument(
+        "--max-slowdown", type=float, default=1.25, help="Fail if a stage is this many times slower than baseline"
+    )
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as directory:
+        # Without the manifest of the previous run, which would skip the conversion
+        convert = (
+            f"import os, sys; os.path.exists({MANIFEST_FILE_NAME!r}) and os.remove({MANIFEST_FILE_NAME!r}); "
+            "from eml2csv.cli import start; "
+            f"sys.argv = ['eml2csv', {os.path.abspath(COUNTS_EML)!r}, {os.path.abspath(CANDIDATES_EML)!r}]; start()"
+        )
+        stages = {
+            "python": "pass",
+            "import": "import eml2csv",
+            "import_cli": "import eml2csv.cli",
+            "convert": convert,
+            "help": "import sys; from eml2csv.cli import start; sys.argv = ['eml2csv', '--help']; start()",
+        }
+        report: dict[str, Any] = {
+            "eml2csv_version": __version__,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "stages": {name: {"seconds": measure(code, directory, args.repeat)} for name, code in stages.items()},
+            "convert_imports": heavy_imports(convert, directory),
+        }
+
+    if args.output is not None:
+        args.output.write_text(json.dumps(report, indent=2))
+    else:
+        sys.stdout.write(json.dumps(report, indent=2) + "\n")
+
+    if report["convert_imports"]:
+        sys.stderr.write(f"The plain conversion imports {', '.join(report['convert_imports'])}\n")
+        return 1
+    if args.baseline is not None:
+        return compare(json.loads(args.baseline.read_text()), report, args.max_slowdown)
+    return 0
+
+
+def measure(code: str, directory: str, repeat: int) -> float:
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], cwd=directory, check=True, capture_output=True)
+        seconds.append(time.perf_counter() - start)
+    return min(seconds)
+
+
+def heavy_imports(code: str, directory: str) -> list[str]:
+    check = f"{code}; import sys; print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    result = subprocess.run([sys.executable, "-c", check], cwd=directory, check=True, capture_output=True, text=True)
+    return [module for module in result.stdout.strip().split(",") if module]
+
+
+def compare(baseline: dict[str, Any], report: dict[str, Any], max_slowdown: float) -> int:
+    regressions = 0
+    for stage, result in report["stages"].items():
+        if stage not in baseline["stages"]:
+            continue
+        slowdown = result["seconds"] / baseline["stages"][stage]["seconds"]
+        regressed = slowdown > max_slowdown
+        regressions += regressed
+        sys.stderr.write(f"{stage:<16} time x{slowdown:.2f}{'  REGRESSION' if regressed else ''}\n")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
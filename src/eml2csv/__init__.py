@@ -1,6 +1,96 @@
 # SPDX-FileCopyrightText: 2025-present Chris Mostert <15890652+chrismostert@users.noreply.github.com>
 #
 # SPDX-License-Identifier: EUPL-1.2
-from eml2csv.lib import eml2csv
+from importlib import import_module
+from typing import TYPE_CHECKING, Any
 
-__all__ = ["eml2csv"]
+if TYPE_CHECKING:
+    from eml2csv.aggregation import aggregate
+    from eml2csv.batch import BatchReport, ConversionJob, ConversionResult, convert_many
+    from eml2csv.cache import ParseCache
+    from eml2csv.comparison import CellChange, CountsDiff, diff
+    from eml2csv.index import EmlIndex, EmlPair
+    from eml2csv.instrument import Profiler, StageStats
+    from eml2csv.lib import CountsTable, ReportingUnit, convert, eml2csv
+    from eml2csv.manifest import Manifest
+    from eml2csv.probe import EmlProbe, probe_eml
+    from eml2csv.server import ConversionServer
+    from eml2csv.sqlite import SqliteSink
+    from eml2csv.util import set_xml_backend
+    from eml2csv.validation import ValidationReport, Violation, validate, validate_many
+
+# Exported names by the module they are defined in. They are imported on first use, so that importing a
+# single module (like the command line entry point) does not import all of them and their dependencies
+_EXPORTS = {
+    "BatchReport": "eml2csv.batch",
+    "CellChange": "eml2csv.comparison",
+    "ConversionJob": "eml2csv.batch",
+    "ConversionResult": "eml2csv.batch",
+    "ConversionServer": "eml2csv.server",
+    "CountsDiff": "eml2csv.comparison",
+    "CountsTable": "eml2csv.lib",
+    "EmlIndex": "eml2csv.index",
+    "EmlPair": "eml2csv.index",
+    "EmlProbe": "eml2csv.probe",
+    "Manifest": "eml2csv.manifest",
+    "ParseCache": "eml2csv.cache",
+    "Profiler": "eml2csv.instrument",
+    "ReportingUnit": "eml2csv.lib",
+    "SqliteSink": "eml2csv.sqlite",
+    "StageStats": "eml2csv.instrument",
+    "ValidationReport": "eml2csv.validation",
+    "Violation": "eml2csv.validation",
+    "aggregate": "eml2csv.aggregation",
+    "convert": "eml2csv.lib",
+    "convert_many": "eml2csv.batch",
+    "diff": "eml2csv.comparison",
+    "eml2csv": "eml2csv.lib",
+    "probe_eml": "eml2csv.probe",
+    "set_xml_backend": "eml2csv.util",
+    "validate": "eml2csv.validation",
+    "validate_many": "eml2csv.validation",
+}
+
+__all__ = [
+    "BatchReport",
+    "CellChange",
+    "ConversionJob",
+    "ConversionResult",
+    "ConversionServer",
+    "CountsDiff",
+    "CountsTable",
+    "EmlIndex",
+    "EmlPair",
+    "EmlProbe",
+    "Manifest",
+    "ParseCache",
+    "Profiler",
+    "ReportingUnit",
+    "SqliteSink",
+    "StageStats",
+    "ValidationReport",
+    "Violation",
+    "aggregate",
+    "convert",
+    "convert_many",
+    "diff",
+    "eml2csv",
+    "probe_eml",
+    "set_xml_backend",
+    "validate",
+    "validate_many",
+]
+
+
+def __getattr__(name: str) -> Any:
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(module), name)
+    # Cache it, so the next lookup does not go through this function
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted([*globals(), *_EXPORTS])
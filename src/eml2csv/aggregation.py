@@ -0,0 +1,189 @@
+# SPDX-FileCopyrightText: 2025-present Chris Mostert <15890652+chrismostert@users.noreply.github.com>
+#
+# SPDX-License-Identifier: EUPL-1.2
+import os
+from array import array
+from collections.abc import Iterable
+from contextlib import closing
+from dataclasses import dataclass, field
+from typing import IO
+
+from eml2csv.batch import _run
+from eml2csv.lib import (
+    _COUNTER,
+    _END_COLUMN,
+    _HEADER,
+    _VOTES,
+    InvalidInputError,
+    _AffiliationIdentifier,
+    _CandidateIdentifier,
+    _CandidatesIndex,
+    _CountsEml,
+    _generate_table_rows,
+    _index_candidates,
+    _open_output,
+    _Output,
+    _read_counts_events,
+    normalise,
+)
+from eml2csv.matrix import VoteKey
+from eml2csv.probe import probe_eml
+from eml2csv.util import _get_mandatory
+
+
+@dataclass
+class _AuthorityTotals:
+    """The TotalVotes of a counts file, which is all of it an aggregate needs."""
+
+    counts_eml_path: str
+    election_id: str | None = None
+    contest_id: str | None = None
+    election_name: str | None = None
+    election_date: str | None = None
+    authority_id: str | None = None
+    authority_name: str | None = None
+    votes: dict[VoteKey, int] = field(default_factory=dict)
+    counters: dict[tuple[str, str | None], int] = field(default_factory=dict)
+
+
+def aggregate(
+    counts_eml_paths: Iterable[str],
+    candidates_eml_paths: Iterable[str],
+    output_csv_path: str | IO[str] | IO[bytes] | None,
+    workers: int | None = None,
+) -> str | None:
+    """Add up the counts files of many authorities into one csv file (osv4-3) with a column per authority.
+
+    Only the totals at the start of every counts file are read, and they are added to the
+    output as soon as they come in, so only one file is being read at a time per worker.
+
+    Args:
+        counts_eml_paths: Counts EML files (510b) of the same election, one per authority.
+        candidates_eml_paths: Candidates EML files (230b) to take the names of the lists and candidates from,
+            one for every contest of the counts files. Files of other elections or contests are ignored.
+            If the counts files are of more than one contest, only the list totals are written, as the
+            candidates differ per contest.
+        output_csv_path: Path or stream to write the csv to. If None or an existing directory,
+            a filename is generated from the election and contest.
+        workers: Number of worker processes reading the counts files. Defaults to the number of CPUs,
+            1 reads them in the current process.
+
+    Returns:
+        Path of the written csv file, or None when writing to a stream.
+    """
+    counts_eml_paths = list(counts_eml_paths)
+    if not counts_eml_paths:
+        raise InvalidInputError("No counts files to aggregate")
+    workers = workers if workers is not None else os.cpu_count() or 1
+
+    # Column 0 holds the sum of all authorities, column 1 onwards one authority each in the order of the paths
+    n_columns = len(counts_eml_paths) + 1
+    aggregated = _CountsEml(
+        reporting_unit_ids=[""] * len(counts_eml_paths), reporting_unit_names=[""] * len(counts_eml_paths)
+    )
+    for _ in range(n_columns):
+        aggregated.votes.add_column()
+    contest_ids: list[str] = []
+    authority_paths: dict[str, str] = {}
+
+    for idx, totals in _run(_read_totals, list(enumerate(counts_eml_paths)), workers, None):
+        if aggregated.election_id is None:
+            aggregated.election_id = totals.election_id
+            aggregated.election_name = totals.election_name
+            aggregated.election_date = totals.election_date
+        if totals.election_id != aggregated.election_id:
+            raise InvalidInputError(
+                f"Election ids did not match! {totals.counts_eml_path} was {totals.election_id} "
+                f"while the other counts files were {aggregated.election_id}"
+            )
+        authority_id = _get_mandatory(totals.authority_id)
+        if authority_id in authority_paths:
+            raise InvalidInputError(
+                f"{totals.counts_eml_path} and {authority_paths[authority_id]} are both counts files of {authority_id}"
+            )
+        authority_paths[authority_id] = totals.counts_eml_path
+        contest_id = _get_mandatory(totals.contest_id)
+        if contest_id not in contest_ids:
+            contest_ids.append(contest_id)
+
+        column = idx + 1
+        aggregated.reporting_unit_ids[idx] = authority_id
+        aggregated.reporting_unit_names[idx] = _get_mandatory(totals.authority_name)
+        for key, votes in totals.votes.items():
+            aggregated.votes.set(key, column, votes)
+        for counter, value in totals.counters.items():
+            if counter not in aggregated.counters:
+                aggregated.counters[counter] = array("q", bytes(8 * n_columns))
+            aggregated.counters[counter][column] = value
+
+    for values in [*aggregated.votes.rows, *aggregated.counters.values()]:
+        values[0] = sum(values[1:])
+
+    candidate_info = _read_candidate_info(candidates_eml_paths, _get_mandatory(aggregated.election_id), contest_ids)
+
+    # If no output file name is specified, construct one automatically
+    if output_csv_path is None or (isinstance(output_csv_path, str) and os.path.isdir(output_csv_path)):
+        output_csv_path = os.path.join(
+            output_csv_path or "", _default_output_path(_get_mandatory(aggregated.election_id), contest_ids)
+        )
+
+    with _open_output(output_csv_path) as stream:
+        output = _Output(stream)
+        output.push(["Verkiezing", "", _get_mandatory(aggregated.election_name)])
+        output.push(["Datum", "", _get_mandatory(aggregated.election_date)])
+        output.push(["Gebied", "", f"Kieskring {contest_ids[0]}" if len(contest_ids) == 1 else "Alle kieskringen"])
+        output.push(["Nummer", "", contest_ids[0] if len(contest_ids) == 1 else ""])
+        output.push([])
+        for row in _generate_table_rows(aggregated, candidate_info):
+            output.push(row)
+
+    return output_csv_path if isinstance(output_csv_path, str) else None
+
+
+def _read_totals(counts_eml_path: str) -> _AuthorityTotals:
+    totals = _AuthorityTotals(counts_eml_path)
+    with closing(_read_counts_events(counts_eml_path)) as events:
+        for event in events:
+            kind = event[0]
+            if kind is _VOTES:
+                totals.votes[event[2], event[3]] = event[4]
+            elif kind is _COUNTER:
+                totals.counters[event[2]] = event[3]
+            elif kind is _HEADER:
+                setattr(totals, event[1], event[2])
+            elif kind is _END_COLUMN:
+                # The TotalVotes come before the reporting units, which are not needed
+                break
+    return totals
+
+
+def _read_candidate_info(
+    candidates_eml_paths: Iterable[str], election_id: str, contest_ids: list[str]
+) -> dict[_AffiliationIdentifier, list[_CandidateIdentifier]]:
+    # The first candidates file of every contest is used, a national file has all of them
+    contest_indexes: dict[str, _CandidatesIndex] = {}
+    for path in candidates_eml_paths:
+        probe = probe_eml(path)
+        if probe.eml_id == "230b" and probe.election_id == election_id and probe.contest_id is not None:
+            index = _index_candidates(path)
+            for contest_id in index.contests:
+                contest_indexes.setdefault(contest_id, index)
+
+    missing = [contest_id for contest_id in contest_ids if contest_id not in contest_indexes]
+    if missing:
+        raise InvalidInputError(f"No candidates file (230b) of {election_id} found for contest {', '.join(missing)}")
+
+    if len(contest_ids) == 1:
+        return contest_indexes[contest_ids[0]].read(contest_ids[0]).candidate_info
+
+    # Lists are numbered the same in every contest, their candidates are not
+    affiliations: dict[str, _AffiliationIdentifier] = {}
+    for contest_id in contest_ids:
+        for affiliation in contest_indexes[contest_id].read(contest_id).candidate_info:
+            affiliations.setdefault(affiliation.id, affiliation)
+    return {affiliation: [] for affiliation in affiliations.values()}
+
+
+def _default_output_path(election_id: str, contest_ids: list[str]) -> str:
+    area = f"kieskring_{normalise(contest_ids[0])}" if len(contest_ids) == 1 else "alle_kieskringen"
+    return f"osv4-3_telling_{normalise(election_id)[:6]}_{area}.csv"
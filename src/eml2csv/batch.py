@@ -0,0 +1,270 @@
+# SPDX-FileCopyrightText: 2025-present Chris Mostert <15890652+chrismostert@users.noreply.github.com>
+#
+# SPDX-License-Identifier: EUPL-1.2
+import io
+import os
+import time
+import zipfile
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, replace
+from typing import TypeVar
+
+from eml2csv.lib import (
+    _CandidatesEml,
+    _CountsEml,
+    _default_output_path,
+    _read_pair,
+    eml2csv,
+)
+from eml2csv.manifest import Manifest
+from eml2csv.probe import probe_eml
+from eml2csv.sqlite import SqliteSink
+from eml2csv.util import get_xml_backend, split_archive_path
+from eml2csv.worker import init_worker, process_cache
+
+J = TypeVar("J")
+T = TypeVar("T")
+
+
+@dataclass(frozen=True)
+class ConversionJob:
+    counts_eml_path: str
+    candidates_eml_path: str
+    # A file path, a directory to write an automatically named csv to, or None for the current directory
+    output_csv_path: str | None = None
+
+
+@dataclass(frozen=True)
+class ConversionResult:
+    job: ConversionJob
+    output_csv_path: str | None
+    error: str | None
+    duration: float
+    input_bytes: int
+    # Not converted because the output was up to date according to the manifest
+    skipped: bool = False
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+@dataclass(frozen=True)
+class BatchReport:
+    results: list[ConversionResult]
+    duration: float
+
+    @property
+    def succeeded(self) -> list[ConversionResult]:
+        return [result for result in self.results if result.ok]
+
+    @property
+    def failed(self) -> list[ConversionResult]:
+        return [result for result in self.results if not result.ok]
+
+    @property
+    def skipped(self) -> list[ConversionResult]:
+        return [result for result in self.results if result.skipped]
+
+    @property
+    def files_per_second(self) -> float:
+        return len(self.results) / self.duration if self.duration > 0 else 0.0
+
+    @property
+    def megabytes_per_second(self) -> float:
+        input_bytes = sum(result.input_bytes for result in self.results)
+        return input_bytes / 1_000_000 / self.duration if self.duration > 0 else 0.0
+
+
+def convert_many(
+    jobs: Iterable[ConversionJob],
+    workers: int | None = None,
+    on_progress: Callable[[ConversionResult], None] | None = None,
+    cache_dir: str | None = None,
+    output_zip: str | None = None,
+    manifest: Manifest | None = None,
+    output_sqlite: str | None = None,
+) -> BatchReport:
+    """Convert many counts EML files, spreading the work over a pool of processes.
+
+    A failing conversion is recorded in its result and does not abort the other jobs.
+
+    Args:
+        jobs: The conversions to run.
+        workers: Number of worker processes. Defaults to the number of CPUs, 1 runs
+            all jobs in the current process.
+        on_progress: Called with every result as soon as its job has finished.
+        cache_dir: Directory for an on-disk cache of parsed EML files, shared by all workers and later runs.
+        output_zip: Zip archive to write all csv files to instead of the output paths of the jobs. An output
+            path of a job is used as the name in the archive, otherwise the csv file is named automatically.
+            The jobs are run in the current process, as the archive can only be written by one process.
+        manifest: Manifest of earlier conversions. Jobs whose output is up to date are skipped, the
+            others are recorded in it once they succeed. The manifest is not saved.
+        output_sqlite: SQLite database to load all counts into instead of writing csv files, the output
+            paths of the jobs are ignored. The files are parsed by the workers and loaded by the current
+            process in a single transaction.
+
+    Returns:
+        The results in the order of the jobs, together with the total duration.
+    """
+    jobs = list(jobs)
+    workers = workers if workers is not None else os.cpu_count() or 1
+    start = time.perf_counter()
+    results: list[ConversionResult | None] = [None] * len(jobs)
+
+    def finished(idx: int, result: ConversionResult):
+        results[idx] = result
+        if manifest is not None and not result.skipped:
+            job = result.job
+            if result.output_csv_path is not None:
+                manifest.record(
+                    job.counts_eml_path, job.candidates_eml_path, job.output_csv_path, result.output_csv_path
+                )
+            else:
+                manifest.forget(job.counts_eml_path)
+        if on_progress is not None:
+            on_progress(result)
+
+    if output_zip is not None and output_sqlite is not None:
+        raise ValueError("Cannot write to a zip archive and a SQLite database at the same time")
+
+    pending = list(enumerate(jobs))
+    if manifest is not None:
+        if output_zip is not None or output_sqlite is not None:
+            raise ValueError("A manifest can only be used when writing csv files")
+        pending = []
+        for idx, job in enumerate(jobs):
+            output_csv_path = manifest.fresh_output(job.counts_eml_path, job.candidates_eml_path, job.output_csv_path)
+            if output_csv_path is not None:
+                finished(idx, ConversionResult(job, output_csv_path, None, 0.0, 0, skipped=True))
+            else:
+                pending.append((idx, job))
+
+    if output_zip is not None:
+        init_worker(cache_dir, get_xml_backend().name)
+        with zipfile.ZipFile(output_zip, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+            for idx, job in pending:
+                finished(idx, _convert_to_archive(job, archive))
+    elif output_sqlite is not None:
+        with SqliteSink(output_sqlite) as sink:
+            for idx, (result, parsed) in _run(_read, pending, workers, cache_dir):
+                finished(idx, _add_to_sink(result, parsed, sink))
+    else:
+        for idx, result in _run(_convert, pending, workers, cache_dir):
+            finished(idx, result)
+
+    return BatchReport(
+        results=[result for result in results if result is not None],
+        duration=time.perf_counter() - start,
+    )
+
+
+def _run(
+    run_job: Callable[[J], T], pending: list[tuple[int, J]], workers: int, cache_dir: str | None
+) -> Iterator[tuple[int, T]]:
+    # Yields the index of every job with its outcome, in the order the jobs finish
+    if workers <= 1 or len(pending) <= 1:
+        init_worker(cache_dir, get_xml_backend().name)
+        for idx, job in pending:
+            yield idx, run_job(job)
+    else:
+        with ProcessPoolExecutor(
+            max_workers=min(workers, len(pending)),
+            initializer=init_worker,
+            initargs=(cache_dir, get_xml_backend().name),
+        ) as pool:
+            futures = {pool.submit(run_job, job): idx for idx, job in pending}
+            for future in as_completed(futures):
+                yield futures[future], future.result()
+
+
+def _convert(job: ConversionJob) -> ConversionResult:
+    start = time.perf_counter()
+    output_csv_path = None
+    error = None
+    try:
+        output_csv_path = eml2csv(
+            job.counts_eml_path, job.candidates_eml_path, job.output_csv_path, cache=process_cache
+        )
+    except Exception as e:  # noqa: BLE001
+        error = f"{type(e).__name__}: {e}"
+
+    return ConversionResult(
+        job=job,
+        output_csv_path=output_csv_path,
+        error=error,
+        duration=time.perf_counter() - start,
+        input_bytes=_file_size(job.counts_eml_path),
+    )
+
+
+def _read(job: ConversionJob) -> tuple[ConversionResult, tuple[_CountsEml, _CandidatesEml] | None]:
+    start = time.perf_counter()
+    parsed = None
+    error = None
+    try:
+        parsed = _read_pair(job.counts_eml_path, job.candidates_eml_path, cache=process_cache)
+    except Exception as e:  # noqa: BLE001
+        error = f"{type(e).__name__}: {e}"
+
+    result = ConversionResult(
+        job=job,
+        output_csv_path=None,
+        error=error,
+        duration=time.perf_counter() - start,
+        input_bytes=_file_size(job.counts_eml_path),
+    )
+    return result, parsed
+
+
+def _add_to_sink(
+    result: ConversionResult, parsed: tuple[_CountsEml, _CandidatesEml] | None, sink: SqliteSink
+) -> ConversionResult:
+    if parsed is None:
+        return result
+
+    start = time.perf_counter()
+    try:
+        sink.add(*parsed, source=os.path.abspath(result.job.counts_eml_path))
+    except Exception as e:  # noqa: BLE001
+        return replace(result, error=f"{type(e).__name__}: {e}")
+    return replace(result, output_csv_path=sink.database_path, duration=result.duration + time.perf_counter() - start)
+
+
+def _convert_to_archive(job: ConversionJob, archive: zipfile.ZipFile) -> ConversionResult:
+    start = time.perf_counter()
+    output_csv_path = None
+    error = None
+    try:
+        # The csv is only added to the archive once it is complete, so failed conversions leave nothing behind
+        output_csv = io.BytesIO()
+        eml2csv(job.counts_eml_path, job.candidates_eml_path, output_csv, cache=process_cache)
+        if job.output_csv_path is not None:
+            name = job.output_csv_path
+        else:
+            counts_probe = probe_eml(job.counts_eml_path)
+            name = _default_output_path(counts_probe.election_id, counts_probe.authority_name)
+        archive.writestr(name, output_csv.getvalue())
+        output_csv_path = f"{archive.filename}/{name}"
+    except Exception as e:  # noqa: BLE001
+        error = f"{type(e).__name__}: {e}"
+
+    return ConversionResult(
+        job=job,
+        output_csv_path=output_csv_path,
+        error=error,
+        duration=time.perf_counter() - start,
+        input_bytes=_file_size(job.counts_eml_path),
+    )
+
+
+def _file_size(path: str) -> int:
+    try:
+        member = split_archive_path(path)
+        if member is not None:
+            with zipfile.ZipFile(member[0]) as archive:
+                return archive.getinfo(member[1]).file_size
+        return os.path.getsize(path)
+    except (OSError, KeyError):
+        return 0
@@ -0,0 +1,222 @@
+# SPDX-FileCopyrightText: 2025-present Chris Mostert <15890652+chrismostert@users.noreply.github.com>
+#
+# SPDX-License-Identifier: EUPL-1.2
+import contextlib
+import hashlib
+import json
+import os
+import tempfile
+import zlib
+from array import array
+from collections import OrderedDict, defaultdict
+from collections.abc import Callable
+from dataclasses import dataclass
+from functools import partial
+from typing import IO, Any, TypeVar
+
+from eml2csv.lib import (
+    _AffiliationIdentifier,
+    _CandidateIdentifier,
+    _CandidatesEml,
+    _CandidatesIndex,
+    _CountsEml,
+    _index_candidates,
+    _read_candidates_eml,
+    _read_counts_eml,
+)
+from eml2csv.matrix import VoteMatrix
+from eml2csv.util import file_digest
+
+# Bump whenever the parsed structures or the way they are read change, so stale cache entries are not used
+PARSER_VERSION = 2
+
+T = TypeVar("T")
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    disk_hits: int = 0
+    misses: int = 0
+
+
+class ParseCache:
+    """Cache of parsed EML files, keyed by the hash of their contents.
+
+    Parsed files are kept in memory (least recently used are evicted first) and,
+    if a directory is given, also stored on disk as zlib-compressed JSON so that
+    other processes and later runs can skip parsing as well. Counts and candidates
+    files are kept in separate tiers of at most max_entries each, so that reading
+    many counts files does not evict the few candidates files they refer to.
+    """
+
+    def __init__(self, max_entries: int = 32, directory: str | None = None):
+        self.max_entries = max_entries
+        self.directory = directory
+        self.stats = CacheStats()
+        self._entries: dict[str, OrderedDict[str, Any]] = {"counts": OrderedDict(), "candidates": OrderedDict()}
+
+    def counts(self, counts_eml_path: str | IO[bytes], workers: int = 1) -> _CountsEml:
+        read = partial(_read_counts_eml, workers=workers) if workers > 1 else _read_counts_eml
+        return self._get("counts", counts_eml_path, read, _encode_counts, _decode_counts)
+
+    def candidates(self, candidates_eml_path: str | IO[bytes], contest_id: str | None = None) -> _CandidatesEml:
+        """Read the lists and candidates of a candidates file, of all contests or only the given one.
+
+        A single contest is read through the index of the file, which is kept in memory (but not
+        counted in the stats), so the other contests of a national candidates file are read
+        without going through the file again.
+        """
+        if contest_id is None:
+            return self._get(
+                "candidates", candidates_eml_path, _read_candidates_eml, _encode_candidates, _decode_candidates
+            )
+        # Contest ids are taken from the file, so they are hashed rather than put in the name of the cache file
+        contest_digest = hashlib.sha256(contest_id.encode()).hexdigest()[:16]
+        return self._get(
+            f"candidates_{contest_digest}",
+            candidates_eml_path,
+            lambda path: self.candidates_index(path).read(contest_id),
+            _encode_candidates,
+            _decode_candidates,
+        )
+
+    def candidates_index(self, candidates_eml_path: str | IO[bytes]) -> _CandidatesIndex:
+        """Read every contest of a candidates file in a single pass, the index is only kept in memory."""
+        key = f"candidates_index-{PARSER_VERSION}-{file_digest(candidates_eml_path)}"
+        entries = self._entries["candidates"]
+        if key in entries:
+            entries.move_to_end(key)
+            return entries[key]
+        index = _index_candidates(candidates_eml_path)
+        self._remember(entries, key, index)
+        return index
+
+    def clear(self):
+        for entries in self._entries.values():
+            entries.clear()
+
+    def _get(
+        self,
+        kind: str,
+        path: str | IO[bytes],
+        read: Callable[[str | IO[bytes]], T],
+        encode: Callable[[T], Any],
+        decode: Callable[[Any], T],
+    ) -> T:
+        key = f"{kind}-{PARSER_VERSION}-{file_digest(path)}"
+        # The kinds of a single contest (candidates_<digest>) share the tier of their file
+        entries = self._entries[kind.partition("_")[0]]
+
+        if key in entries:
+            entries.move_to_end(key)
+            self.stats.hits += 1
+            return entries[key]
+
+        parsed = self._load(key, decode)
+        if parsed is not None:
+            self.stats.disk_hits += 1
+        else:
+            self.stats.misses += 1
+            parsed = read(path)
+            self._store(key, encode(parsed))
+
+        self._remember(entries, key, parsed)
+        return parsed
+
+    def _remember(self, entries: OrderedDict[str, Any], key: str, parsed: Any):
+        entries[key] = parsed
+        if len(entries) > self.max_entries:
+            entries.popitem(last=False)
+
+    def _load(self, key: str, decode: Callable[[Any], T]) -> T | None:
+        if self.directory is None:
+            return None
+        try:
+            with open(os.path.join(self.directory, f"{key}.bin"), "rb") as file:
+                return decode(json.loads(zlib.decompress(file.read())))
+        except (OSError, ValueError, zlib.error):
+            # Missing or corrupt entries are parsed again
+            return None
+
+    def _store(self, key: str, encoded: Any):
+        if self.directory is None:
+            return
+        tmp_path = None
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            # Write to a temporary file first, so concurrent readers never see a partial entry
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            with os.fdopen(fd, "wb") as file:
+                file.write(zlib.compress(json.dumps(encoded, separators=(",", ":")).encode()))
+            os.replace(tmp_path, os.path.join(self.directory, f"{key}.bin"))
+        except OSError:
+            # A full disk or read-only directory only means the entry is parsed again next time
+            if tmp_path is not None:
+                with contextlib.suppress(OSError):
+                    os.remove(tmp_path)
+
+
+def _encode_counts(counts_eml: _CountsEml) -> dict[str, Any]:
+    return {
+        "election_id": counts_eml.election_id,
+        "contest_id": counts_eml.contest_id,
+        "election_name": counts_eml.election_name,
+        "election_date": counts_eml.election_date,
+        "authority_id": counts_eml.authority_id,
+        "authority_name": counts_eml.authority_name,
+        "reporting_unit_ids": counts_eml.reporting_unit_ids,
+        "reporting_unit_names": counts_eml.reporting_unit_names,
+        "counters": [[*counter, values.tolist()] for counter, values in counts_eml.counters.items()],
+        "n_columns": counts_eml.votes.n_columns,
+        "votes": [[*key, counts_eml.votes.rows[idx].tolist()] for key, idx in counts_eml.votes.row_index.items()],
+    }
+
+
+def _decode_counts(encoded: dict[str, Any]) -> _CountsEml:
+    votes = VoteMatrix()
+    votes.n_columns = encoded["n_columns"]
+    for aff, cand, values in encoded["votes"]:
+        votes.row_index[(aff, cand)] = len(votes.rows)
+        votes.rows.append(array("q", values))
+
+    return _CountsEml(
+        election_id=encoded["election_id"],
+        contest_id=encoded["contest_id"],
+        election_name=encoded["election_name"],
+        election_date=encoded["election_date"],
+        authority_id=encoded["authority_id"],
+        authority_name=encoded["authority_name"],
+        reporting_unit_ids=encoded["reporting_unit_ids"],
+        reporting_unit_names=encoded["reporting_unit_names"],
+        counters=defaultdict(
+            partial(array, "q"), {(tag, reason): array("q", values) for tag, reason, values in encoded["counters"]}
+        ),
+        votes=votes,
+    )
+
+
+def _encode_candidates(candidates_eml: _CandidatesEml) -> dict[str, Any]:
+    return {
+        "eml_id": candidates_eml.eml_id,
+        "election_id": candidates_eml.election_id,
+        "contest_id": candidates_eml.contest_id,
+        "candidate_info": [
+            [affiliation.id, affiliation.name, [[candidate.id, candidate.name] for candidate in candidates]]
+            for affiliation, candidates in candidates_eml.candidate_info.items()
+        ],
+    }
+
+
+def _decode_candidates(encoded: dict[str, Any]) -> _CandidatesEml:
+    return _CandidatesEml(
+        eml_id=encoded["eml_id"],
+        election_id=encoded["election_id"],
+        contest_id=encoded["contest_id"],
+        candidate_info={
+            _AffiliationIdentifier(aff_id, aff_name): [
+                _CandidateIdentifier(cand_id, name) for cand_id, name in candidates
+            ]
+            for aff_id, aff_name, candidates in encoded["candidate_info"]
+        },
+    )
@@ -0,0 +1,106 @@
+# SPDX-FileCopyrightText: 2025-present Chris Mostert <15890652+chrismostert@users.noreply.github.com>
+#
+# SPDX-License-Identifier: EUPL-1.2
+"""Entry point of the eml2csv command.
+
+The plain invocation of the packaged binary, dragging a counts and a candidates file onto it, is
+handled here without importing typer, which takes longer to import than converting a file does.
+Everything else is passed on to eml2csv.main.
+"""
+
+import contextlib
+import os
+import sys
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from eml2csv.instrument import Profiler
+    from eml2csv.manifest import Manifest
+
+# Names of the commands of eml2csv.main, the arguments of any other invocation are converted directly
+COMMANDS = frozenset({"aggregate", "batch", "diff", "serve", "validate", "watch"})
+# The counts and the candidates file, and optionally the output
+_PLAIN_ARGUMENTS = (2, 3)
+
+
+def start() -> None:
+    args = sys.argv[1:]
+    if _is_plain_conversion(args):
+        output_csv_path, up_to_date = convert_file(*args)
+        if up_to_date:
+            sys.stderr.write(f"{output_csv_path} is up to date, use --force to convert again\n")
+        return
+
+    from eml2csv.main import start as start_main  # noqa: PLC0415 typer is only imported when it is needed
+
+    start_main()
+
+
+def convert_file(
+    counts_eml_path: str,
+    candidates_eml_path: str,
+    output: str | None = None,
+    *,
+    force: bool = False,
+    layout: str = "wide",
+    profiler: "Profiler | None" = None,
+    parse_workers: int = 1,
+) -> tuple[str | None, bool]:
+    """Convert a counts file like the eml2csv command does, skipping it if the manifest says it is up to date.
+
+    Args:
+        counts_eml_path: Path to the counts EML file (510b).
+        candidates_eml_path: Path to the candidates EML file (230b).
+        output: Path or directory to write the csv file to, or - for standard output.
+        force: Convert even if the csv file is up to date.
+        layout: Layout of the csv file, see eml2csv.
+        profiler: Profiler to record the conversion in.
+        parse_workers: Number of processes to parse the counts file in, see eml2csv.
+
+    Returns:
+        Path of the csv file, and whether it was up to date so it was not converted.
+    """
+    from eml2csv.instrument import DISABLED  # noqa: PLC0415 imported on use to keep startup fast
+    from eml2csv.lib import eml2csv  # noqa: PLC0415
+
+    # The manifest does not record the layout, so only wide outputs are tracked in it
+    manifest = _load_manifest(output) if layout == "wide" else None
+    if manifest is not None and not force:
+        output_csv_path = manifest.fresh_output(counts_eml_path, candidates_eml_path, output)
+        if output_csv_path is not None:
+            return output_csv_path, True
+
+    output_csv_path = eml2csv(
+        counts_eml_path,
+        candidates_eml_path,
+        sys.stdout.buffer if output == "-" else output,
+        profiler=profiler if profiler is not None else DISABLED,
+        layout=layout,
+        parse_workers=parse_workers,
+    )
+
+    if manifest is not None and output_csv_path is not None:
+        manifest.record(counts_eml_path, candidates_eml_path, output, output_csv_path)
+        with contextlib.suppress(OSError):
+            manifest.save()
+    return output_csv_path, False
+
+
+def _is_plain_conversion(args: list[str]) -> bool:
+    # Only the files, without any options, the output may be - for standard output
+    return (
+        len(args) in _PLAIN_ARGUMENTS
+        and args[0] not in COMMANDS
+        and not any(arg.startswith("-") for arg in args[:2])
+        and all(arg == "-" or not arg.startswith("-") for arg in args[2:])
+    )
+
+
+def _load_manifest(output: str | None) -> "Manifest | None":
+    from eml2csv.manifest import MANIFEST_FILE_NAME, Manifest  # noqa: PLC0415
+
+    # The manifest is kept in the directory of the csv files it describes
+    if output == "-":
+        return None
+    directory = (output or ".") if output is None or os.path.isdir(output) else os.path.dirname(output) or "."
+    return Manifest.load(os.path.join(directory, MANIFEST_FILE_NAME))
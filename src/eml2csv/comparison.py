@@ -0,0 +1,160 @@
+# SPDX-FileCopyrightText: 2025-present Chris Mostert <15890652+chrismostert@users.noreply.github.com>
+#
+# SPDX-License-Identifier: EUPL-1.2
+import hashlib
+import time
+from dataclasses import asdict, dataclass
+from typing import Any
+
+from eml2csv.lib import (
+    _COUNTER,
+    _METADATA_ROWS,
+    _REPORTING_UNIT,
+    _VOTES,
+    InvalidInputError,
+    _CountsBlocks,
+    _extract_reporting_unit_id,
+    _split_counts_blocks,
+)
+from eml2csv.probe import probe_eml
+from eml2csv.util import open_eml
+
+# Reporting unit id used for the totals of the authority, like the column in the csv
+TOTAL = "Totaal"
+
+_COUNTER_NAMES = {counter: name for name, counter in _METADATA_ROWS}
+
+# (affiliation id, candidate id, counter name) of a cell, see CellChange
+_CellKey = tuple[str | None, str | None, str | None]
+
+
+@dataclass(frozen=True)
+class CellChange:
+    reporting_unit_id: str
+    # Set for the votes of a list (without candidate id) or candidate
+    affiliation_id: str | None
+    candidate_id: str | None
+    # Set instead for the metadata rows, by their name in the csv
+    counter: str | None
+    # None if the cell is only in one of the files
+    old: int | None
+    new: int | None
+
+    @property
+    def subject(self) -> str:
+        if self.counter is not None:
+            return self.counter
+        if self.candidate_id is None:
+            return f"list {self.affiliation_id}"
+        return f"list {self.affiliation_id} candidate {self.candidate_id}"
+
+
+@dataclass(frozen=True)
+class CountsDiff:
+    old_counts_eml_path: str
+    new_counts_eml_path: str
+    # In the order of the new file, the totals first
+    changes: list[CellChange]
+    added_reporting_units: list[str]
+    removed_reporting_units: list[str]
+    # Reporting units (and totals) skipped because their blocks are the same in both files
+    unchanged_reporting_units: int
+    duration: float
+
+    @property
+    def identical(self) -> bool:
+        return not self.changes and not self.added_reporting_units and not self.removed_reporting_units
+
+    def to_dict(self) -> dict[str, Any]:
+        return {**asdict(self), "identical": self.identical}
+
+
+def diff(old_counts_eml_path: str, new_counts_eml_path: str) -> CountsDiff:
+    """Find the counts that changed between two versions of a counts EML file (510b), for example after a recount.
+
+    Every TotalVotes and ReportingUnitVotes block is fingerprinted by a hash of its bytes, and only the
+    blocks that are not found unchanged in the other file are parsed, so comparing files that differ in a
+    few reporting units costs little more than reading them.
+
+    Args:
+        old_counts_eml_path: Path to the earlier counts EML file (510b), see open_eml.
+        new_counts_eml_path: Path to the later counts EML file of the same election, contest and authority.
+
+    Returns:
+        The changed cells, in the order of the new file.
+    """
+    start = time.perf_counter()
+    old_probe = probe_eml(old_counts_eml_path)
+    new_probe = probe_eml(new_counts_eml_path)
+    for path, probe in ((old_counts_eml_path, old_probe), (new_counts_eml_path, new_probe)):
+        if probe.eml_id != "510b":
+            raise InvalidInputError(f"{path} was not an EML counts file (510b)!")
+    old_identity = (old_probe.election_id, old_probe.contest_id, old_probe.authority_id)
+    new_identity = (new_probe.election_id, new_probe.contest_id, new_probe.authority_id)
+    if old_identity != new_identity:
+        raise InvalidInputError(
+            f"{old_counts_eml_path} and {new_counts_eml_path} are not counts of the same election, contest and authority"
+        )
+
+    old_blocks = _read_blocks(old_counts_eml_path)
+    new_blocks = _read_blocks(new_counts_eml_path)
+    old_fingerprints = [_fingerprint(block) for block in old_blocks.blocks]
+    new_fingerprints = [_fingerprint(block) for block in new_blocks.blocks]
+    unchanged = set(old_fingerprints) & set(new_fingerprints)
+    old_changed = _read_values(old_blocks, old_fingerprints, unchanged)
+    new_changed = _read_values(new_blocks, new_fingerprints, unchanged)
+
+    changes = []
+    for unit_id, new_values in new_changed.items():
+        old_values = old_changed.get(unit_id, {})
+        # Cells of the new file first, then those that were removed
+        for key in [*new_values, *(key for key in old_values if key not in new_values)]:
+            old, new = old_values.get(key), new_values.get(key)
+            if old != new:
+                changes.append(CellChange(unit_id, *key, old=old, new=new))
+    for unit_id, old_values in old_changed.items():
+        if unit_id not in new_changed:
+            changes.extend(CellChange(unit_id, *key, old=old, new=None) for key, old in old_values.items())
+
+    return CountsDiff(
+        old_counts_eml_path=old_counts_eml_path,
+        new_counts_eml_path=new_counts_eml_path,
+        changes=changes,
+        added_reporting_units=[unit_id for unit_id in new_changed if unit_id not in old_changed],
+        removed_reporting_units=[unit_id for unit_id in old_changed if unit_id not in new_changed],
+        unchanged_reporting_units=len(unchanged),
+        duration=time.perf_counter() - start,
+    )
+
+
+def _read_blocks(counts_eml_path: str) -> _CountsBlocks:
+    with open_eml(counts_eml_path) as counts_eml_file:
+        return _split_counts_blocks(counts_eml_file.read())
+
+
+def _fingerprint(block: bytes) -> bytes:
+    return hashlib.blake2b(block, digest_size=16).digest()
+
+
+def _read_values(
+    blocks: _CountsBlocks, fingerprints: list[bytes], unchanged: set[bytes]
+) -> dict[str, dict[_CellKey, int]]:
+    """Parse the changed blocks into the values of their cells, by reporting unit id."""
+    values: dict[str, dict[_CellKey, int]] = {}
+    for block, fingerprint in zip(blocks.blocks, fingerprints, strict=True):
+        if fingerprint in unchanged:
+            continue
+        unit_id = TOTAL
+        cells: dict[_CellKey, int] = {}
+        for event in blocks.events(block):
+            kind = event[0]
+            if kind is _VOTES:
+                cells[event[2], event[3], None] = event[4]
+            elif kind is _COUNTER:
+                tag, reason_code = event[2]
+                name = _COUNTER_NAMES.get(event[2], f"{tag} {reason_code}" if reason_code is not None else tag)
+                cells[None, None, name] = event[3]
+            elif kind is _REPORTING_UNIT:
+                unit_id = _extract_reporting_unit_id(event[1])
+        values[unit_id] = cells
+    return values
@@ -0,0 +1,154 @@
+# SPDX-FileCopyrightText: 2025-present Chris Mostert <15890652+chrismostert@users.noreply.github.com>
+#
+# SPDX-License-Identifier: EUPL-1.2
+import json
+import os
+import zipfile
+from collections.abc import Mapping
+from dataclasses import asdict, dataclass
+from xml.etree.ElementTree import ParseError
+
+from defusedxml import DefusedXmlException
+
+from eml2csv.probe import EmlProbe, probe_eml
+from eml2csv.util import open_archive_member
+
+INDEX_FILE_NAME = ".eml2csv-index.json"
+# Bump whenever the index entries change, so older index files are rebuilt
+INDEX_VERSION = 1
+# Compressed EML files are read without extracting them
+EML_SUFFIXES = (".xml", ".xml.gz")
+
+
+@dataclass(frozen=True)
+class IndexEntry:
+    mtime_ns: int
+    size: int
+    # Probed header, all None if the file could not be parsed
+    eml_id: str | None = None
+    election_id: str | None = None
+    contest_id: str | None = None
+
+
+@dataclass(frozen=True)
+class EmlPair:
+    counts_eml_path: str
+    # None if no candidates file in the directory matches the election and contest of the counts file
+    candidates_eml_path: str | None
+
+
+class EmlIndex:
+    """Index of the EML files in a directory, used to pair counts files (510b) with candidates files (230b).
+
+    Files are identified by probing their header. The index is stored in the
+    directory, so later scans only probe files whose modification time or size changed.
+    """
+
+    def __init__(self, directory: str, index_path: str | None = None):
+        self.directory = directory
+        self.index_path = index_path if index_path is not None else os.path.join(directory, INDEX_FILE_NAME)
+        self.entries: dict[str, IndexEntry] = {}
+        # Number of files probed by the last scan
+        self.probed = 0
+
+    @classmethod
+    def load(cls, directory: str, index_path: str | None = None) -> "EmlIndex":
+        index = cls(directory, index_path)
+        try:
+            with open(index.index_path, encoding="utf-8") as file:
+                stored = json.load(file)
+        except (OSError, ValueError):
+            return index
+
+        if stored.get("version") == INDEX_VERSION:
+            index.entries = {name: IndexEntry(**entry) for name, entry in stored["entries"].items()}
+        return index
+
+    def save(self):
+        with open(self.index_path, "w", encoding="utf-8") as file:
+            json.dump(
+                {"version": INDEX_VERSION, "entries": {name: asdict(entry) for name, entry in self.entries.items()}},
+                file,
+            )
+
+    def scan(self):
+        """Bring the index up to date with the directory, probing only new or changed files."""
+        entries = {}
+        self.probed = 0
+        with os.scandir(self.directory) as dir_entries:
+            for dir_entry in dir_entries:
+                if not dir_entry.is_file() or not dir_entry.name.endswith(EML_SUFFIXES):
+                    continue
+                stat = dir_entry.stat()
+                entry = self.entries.get(dir_entry.name)
+                if entry is None or entry.mtime_ns != stat.st_mtime_ns or entry.size != stat.st_size:
+                    entry = _probe_entry(dir_entry.path, stat.st_mtime_ns, stat.st_size)
+                    self.probed += 1
+                entries[dir_entry.name] = entry
+        self.entries = dict(sorted(entries.items()))
+
+    def files(self, eml_id: str) -> list[str]:
+        return [self._path(name) for name, entry in self.entries.items() if entry.eml_id == eml_id]
+
+    def pairs(self) -> list[EmlPair]:
+        """Pair every counts file with the candidates file of the same election and contest."""
+        return pair_files({self._path(name): entry for name, entry in self.entries.items()})
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+
+def pair_files(files: Mapping[str, IndexEntry | EmlProbe]) -> list[EmlPair]:
+    """Pair every counts file with the candidates file of the same election and contest.
+
+    If more than one candidates file matches, the first one by path is used.
+
+    Args:
+        files: The identified files by path.
+
+    Returns:
+        A pair for every counts file, in order of their paths.
+    """
+    candidates: dict[tuple[str | None, str | None], str] = {}
+    for path, file in sorted(files.items()):
+        if file.eml_id == "230b":
+            candidates.setdefault((file.election_id, file.contest_id), path)
+
+    return [
+        EmlPair(path, candidates.get((file.election_id, file.contest_id)))
+        for path, file in sorted(files.items())
+        if file.eml_id == "510b"
+    ]
+
+
+def probe_archive(archive_path: str) -> dict[str, EmlProbe]:
+    """Identify every EML file in a zip archive by probing its header, without extracting the archive.
+
+    Args:
+        archive_path: Path to the zip archive.
+
+    Returns:
+        The probe of every EML file by its path inside the archive (archive.zip/name.eml.xml),
+        files that could not be parsed are included with an empty probe.
+    """
+    probes = {}
+    with zipfile.ZipFile(archive_path) as archive:
+        for info in sorted(archive.infolist(), key=lambda info: info.filename):
+            if info.is_dir() or not info.filename.endswith(EML_SUFFIXES):
+                continue
+            try:
+                with open_archive_member(archive, info.filename) as file:
+                    probe = probe_eml(file)
+            except (ParseError, OSError, DefusedXmlException):
+                probe = EmlProbe()
+            probes[f"{archive_path}/{info.filename}"] = probe
+    return probes
+
+
+def _probe_entry(path: str, mtime_ns: int, size: int) -> IndexEntry:
+    try:
+        probe = probe_eml(path)
+    except (ParseError, OSError, DefusedXmlException):
+        # OSError includes gzip files that are corrupt, and files declaring entities are refused
+        return IndexEntry(mtime_ns, size)
+    return IndexEntry(mtime_ns, size, probe.eml_id, probe.election_id, probe.contest_id)
@@ -0,0 +1,105 @@
+# SPDX-FileCopyrightText: 2025-present Chris Mostert <15890652+chrismostert@users.noreply.github.com>
+#
+# SPDX-License-Identifier: EUPL-1.2
+import time
+from collections.abc import Callable, Iterable, Iterator
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from typing import Self
+
+
+@dataclass
+class StageStats:
+    name: str
+    seconds: float = 0.0
+    calls: int = 0
+    # Only measured when tracing memory
+    peak_bytes: int | None = None
+    # What the stage processed, for example the number of reporting units read or bytes written
+    counts: dict[str, int] = field(default_factory=dict)
+
+
+class Profiler:
+    """Collects the duration, peak memory and counts of the named stages of a conversion.
+
+    Use as a context manager to trace memory allocations while it is active.
+    Every hook is called with the stats of a stage as soon as that stage ends.
+    """
+
+    enabled = True
+
+    def __init__(self, hooks: Iterable[Callable[[StageStats], None]] = (), *, trace_memory: bool = False):
+        self.hooks = list(hooks)
+        self.trace_memory = trace_memory
+        self.stages: dict[str, StageStats] = {}
+        self._started_tracing = False
+
+    def __enter__(self) -> "Self":
+        if self.trace_memory:
+            # Imported on use, as it takes a while to import and is only needed when tracing memory
+            import tracemalloc  # noqa: PLC0415
+
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._started_tracing = True
+        return self
+
+    def __exit__(self, *exc_info: object):
+        if self._started_tracing:
+            import tracemalloc  # noqa: PLC0415
+
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[StageStats]:
+        stats = self.stages.setdefault(name, StageStats(name))
+        tracing = False
+        if self.trace_memory:
+            import tracemalloc  # noqa: PLC0415
+
+            tracing = tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+
+        yield stats
+
+        stats.seconds += time.perf_counter() - start
+        stats.calls += 1
+        if tracing:
+            stats.peak_bytes = max(stats.peak_bytes or 0, tracemalloc.get_traced_memory()[1] - baseline)
+        for hook in self.hooks:
+            hook(stats)
+
+    def report(self) -> dict[str, Any]:
+        return {
+            "total_seconds": sum(stats.seconds for stats in self.stages.values()),
+            "stages": [asdict(stats) for stats in self.stages.values()],
+        }
+
+    def format_report(self) -> str:
+        lines = []
+        for stats in self.stages.values():
+            peak = f"{stats.peak_bytes / 1_000_000:8.2f} MB" if stats.peak_bytes is not None else ""
+            counts = ", ".join(f"{name}={count}" for name, count in stats.counts.items())
+            lines.append(f"{stats.name:<16}{stats.seconds * 1000:10.1f} ms{peak}  {counts}".rstrip())
+        lines.append(f"{'total':<16}{self.report()['total_seconds'] * 1000:10.1f} ms")
+        return "\n".join(lines)
+
+
+class _DisabledProfiler(Profiler):
+    """Profiler that measures nothing, used when no profiler is passed."""
+
+    enabled = False
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[StageStats]:
+        yield StageStats(name)
+
+
+DISABLED = _DisabledProfiler()
@@ -1,25 +1,57 @@
 # SPDX-FileCopyrightText: 2025-present Chris Mostert <15890652+chrismostert@users.noreply.github.com>
 #
 # SPDX-License-Identifier: EUPL-1.2
+import io
+import os
 import re
+from array import array
 from collections import defaultdict
-from dataclasses import dataclass
+from collections.abc import Generator, Iterable, Iterator
+from contextlib import contextmanager, suppress
+from dataclasses import dataclass, field
+from functools import partial
+from typing import IO, TYPE_CHECKING, Any, cast
 from xml.etree.ElementTree import Element as XmlElement
 
-from eml2csv.util import NAMESPACE as NS
+from eml2csv.instrument import DISABLED, Profiler
+from eml2csv.matrix import VoteMatrix, add_rows
+from eml2csv.probe import EmlProbe, probe_eml
 from eml2csv.util import (
+    XPath,
     _get_attrib,
+    _get_mandatory,
     _get_mandatory_attrib,
     _get_mandatory_text,
     _get_text,
+    _tag,
+    iterparse_xml,
+    open_eml,
     parse_xml,
+    seekable,
 )
 
+if TYPE_CHECKING:
+    from eml2csv.cache import ParseCache
+
 SB_REGEX = re.compile("^((Stembureau )|(Briefstembureau ))+")
 SB_ID_REGEX = re.compile(r"^\d+::SB")
 ZIP_REGEX = re.compile(r" \(postcode: (\d{4} \w{2})\)")
 NON_LETTERS_REGEX = re.compile(r"[^0-9a-zA-Z]")
 
+# The start tag of the root element and of a votes block with any namespace prefix, attribute values may contain a >
+_ROOT_START_REGEX = re.compile(rb"<(?P<name>[^\s/>!?]+)(?:\s(?:[^\"'>]|\"[^\"]*\"|'[^']*')*)?(?P<empty>/?)>")
+_VOTES_BLOCK_START_REGEX = re.compile(
+    rb"<(?P<name>(?:[\w.-]+:)?(?:TotalVotes|ReportingUnitVotes))(?:\s(?:[^\"'>]|\"[^\"]*\"|'[^']*')*)?(?P<empty>/?)>"
+)
+# Markup that may contain something that looks like a tag
+_SKIPPED_MARKUP_REGEX = re.compile(
+    rb"<!--.*?-->|<!\[CDATA\[.*?\]\]>|<\?.*?\?>|<!DOCTYPE(?:[^\[>]|\[.*?\])*>", re.DOTALL
+)
+
+
+# Wide is the osv4-3 layout with a column per reporting unit, long has a line per reporting unit and count
+LAYOUTS = ("wide", "long")
+
 
 class InvalidInputError(Exception):
     pass
@@ -29,34 +61,67 @@ def normalise(str_to_normalise: str) -> str:
     return NON_LETTERS_REGEX.sub("", str_to_normalise).lower()
 
 
-@dataclass
 class _Output:
-    content: str
-    buffer: list[str]
+    """Writes csv rows (osv4-3) to a text stream as soon as they are pushed."""
 
-    def __init__(self):
-        self.content = ""
-        self.buffer = []
+    def __init__(self, stream: IO[str], *, count_bytes: bool = False):
+        self.stream = stream
+        self.buffer: list[str] = []
+        self.rows_written = 0
+        # Encoding every row again just to count it is only worth it when profiling
+        self.count_bytes = count_bytes
+        self.bytes_written = 0
 
     def append(self, li: list[str]):
         self.buffer += li
 
     def flush(self):
-        for idx, elem in enumerate(self.buffer):
-            elem = elem.replace('"', '""')  # noqa: PLW2901
-            self.content += f'"{elem}"' if elem != "" else ""
-            if idx != len(self.buffer) - 1:
-                self.content += ";"
+        # Rows are separated rather than terminated by a newline, so the file does not end with one
+        if self.rows_written > 0:
+            self.stream.write("\n")
+        line = ";".join(_quote(elem) for elem in self.buffer)
+        self.stream.write(line)
+        if self.count_bytes:
+            self.bytes_written += len(line.encode("utf-8")) + (self.rows_written > 0)
         self.buffer = []
-        self.content += "\n"
+        self.rows_written += 1
 
     def push(self, li: list[str]):
         self.append(li)
         self.flush()
 
-    def write_to_file(self, filename: str):
-        with open(filename, "w", encoding="utf-8-sig") as out:
-            out.write(self.content[:-1])
+
+def _quote(elem: str) -> str:
+    return '"' + elem.replace('"', '""') + '"' if elem != "" else ""
+
+
+@contextmanager
+def _open_output(output_csv: str | IO[str] | IO[bytes]) -> Iterator[IO[str]]:
+    """Open the csv output as a UTF-8 (with BOM) text stream.
+
+    Streams passed in by the caller are written to but left open. Files are written under a
+    temporary name and only replace the output file once complete, so that programs watching the
+    output never read a partially written csv.
+    """
+    if isinstance(output_csv, str):
+        tmp_path = f"{output_csv}.{os.urandom(4).hex()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8-sig") as out:
+                yield out
+            os.replace(tmp_path, output_csv)
+        finally:
+            with suppress(FileNotFoundError):
+                os.remove(tmp_path)
+    elif isinstance(output_csv, io.TextIOBase):
+        output_csv.write("\ufeff")
+        yield cast("IO[str]", output_csv)
+        output_csv.flush()
+    else:
+        out = io.TextIOWrapper(cast("IO[bytes]", output_csv), encoding="utf-8-sig", newline="")
+        yield out
+        out.flush()
+        # Hand the stream back to the caller instead of closing it along with the wrapper
+        out.detach()
 
 
 @dataclass(frozen=True)
@@ -71,231 +136,718 @@ class _CandidateIdentifier:
     name: str
 
 
-def eml2csv(counts_eml_path: str, candidates_eml_path: str, output_csv_path: str | None):
-    ## Init output
-    output = _Output()
+@dataclass
+class _CountsEml:
+    election_id: str | None = None
+    contest_id: str | None = None
+    election_name: str | None = None
+    election_date: str | None = None
+    authority_id: str | None = None
+    authority_name: str | None = None
+    reporting_unit_ids: list[str] = field(default_factory=list)
+    reporting_unit_names: list[str] = field(default_factory=list)
+    # Keyed by (tag, ReasonCode), the first value is the total followed by one value per reporting unit
+    counters: defaultdict[tuple[str, str | None], "array[int]"] = field(
+        # A partial rather than a lambda, so parsed files can be sent between processes
+        default_factory=lambda: defaultdict(partial(array, "q"))
+    )
+    # The first column holds the TotalVotes, followed by one column per reporting unit
+    votes: VoteMatrix = field(default_factory=VoteMatrix)
+
+
+@dataclass
+class _CandidatesEml:
+    # Only set if the root element is an EML element
+    eml_id: str | None = None
+    election_id: str | None = None
+    contest_id: str | None = None
+    candidate_info: dict[_AffiliationIdentifier, list[_CandidateIdentifier]] = field(default_factory=dict)
+
+
+_EML_TAG = _tag("eml", "EML")
+_TOTAL_VOTES_TAG = _tag("eml", "TotalVotes")
+_REPORTING_UNIT_VOTES_TAG = _tag("eml", "ReportingUnitVotes")
+_SELECTION_TAG = _tag("eml", "Selection")
+_REPORTING_UNIT_IDENTIFIER_TAG = _tag("eml", "ReportingUnitIdentifier")
+_ELECTION_IDENTIFIER_TAG = _tag("eml", "ElectionIdentifier")
+_CONTEST_IDENTIFIER_TAG = _tag("eml", "ContestIdentifier")
+_CONTEST_TAG = _tag("eml", "Contest")
+_ELECTION_NAME_TAG = _tag("eml", "ElectionName")
+_ELECTION_DATE_TAG = _tag("kr", "ElectionDate")
+_AUTHORITY_IDENTIFIER_TAG = _tag("eml", "AuthorityIdentifier")
+_VOTES_BLOCK_TAGS = frozenset({_TOTAL_VOTES_TAG, _REPORTING_UNIT_VOTES_TAG})
+_COUNTER_TAGS = frozenset(
+    {_tag("eml", "Cast"), _tag("eml", "TotalCounted"), _tag("eml", "RejectedVotes"), _tag("eml", "UncountedVotes")}
+)
+_HEADER_TAGS = frozenset(
+    {
+        _ELECTION_IDENTIFIER_TAG,
+        _CONTEST_IDENTIFIER_TAG,
+        _ELECTION_NAME_TAG,
+        _ELECTION_DATE_TAG,
+        _AUTHORITY_IDENTIFIER_TAG,
+    }
+)
+
+_AFFILIATION_IDENTIFIER_PATH = XPath("./eml:AffiliationIdentifier")
+_CANDIDATE_IDENTIFIER_PATH = XPath("./eml:CandidateIdentifier")
+_NESTED_CANDIDATE_IDENTIFIER_PATH = XPath(".//eml:CandidateIdentifier")
+_VALID_VOTES_PATH = XPath("./eml:ValidVotes")
+_ELECTION_IDENTIFIER_PATH = XPath(".//eml:ElectionIdentifier")
+_CONTEST_IDENTIFIER_PATH = XPath(".//eml:ContestIdentifier")
+_AFFILIATION_PATH = XPath(".//eml:Affiliation")
+_REGISTERED_NAME_PATH = XPath("./eml:RegisteredName")
+_CANDIDATE_PATH = XPath("./eml:Candidate")
+_INITIALS_PATH = XPath(".//xnl:NameLine[@NameType = 'Initials']")
+_NAME_PREFIX_PATH = XPath(".//xnl:NamePrefix")
+_LAST_NAME_PATH = XPath(".//xnl:LastName")
+
+# Metadata rows of the csv, in order, with the (tag, ReasonCode) of the counter they are read from
+_METADATA_ROWS: list[tuple[str, tuple[str, str | None]]] = [
+    ("opgeroepenen", ("Cast", None)),
+    ("geldige stempas", ("UncountedVotes", "geldige stempassen")),
+    ("geldig volmachtbewijs", ("UncountedVotes", "geldige volmachtbewijzen")),
+    ("geldige kiezerspas", ("UncountedVotes", "geldige kiezerspassen")),
+    ("toegelaten kiezers", ("UncountedVotes", "toegelaten kiezers")),
+    ("geldige stembiljetten", ("TotalCounted", None)),
+    ("blanco stembiljetten", ("RejectedVotes", "blanco")),
+    ("ongeldige stembiljetten", ("RejectedVotes", "ongeldig")),
+    ("meer stembiljetten dan toegelaten kiezers", ("UncountedVotes", "meer getelde stembiljetten")),
+    ("minder stembiljetten dan toegelaten kiezers", ("UncountedVotes", "minder getelde stembiljetten")),
+    ("kiezers met stembiljet hebben niet gestemd", ("UncountedVotes", "meegenomen stembiljetten")),
+    ("er zijn te weinig stembiljetten uitgereikt", ("UncountedVotes", "te weinig uitgereikte stembiljetten")),
+    ("er zijn te veel stembiljetten uitgereikt", ("UncountedVotes", "te veel uitgereikte stembiljetten")),
+    ("geen verklaring", ("UncountedVotes", "geen verklaring")),
+    ("andere verklaring", ("UncountedVotes", "andere verklaring")),
+]
+
+
+def eml2csv(
+    counts_eml_path: str | IO[bytes],
+    candidates_eml_path: str | IO[bytes],
+    output_csv_path: str | IO[str] | IO[bytes] | None,
+    cache: "ParseCache | None" = None,
+    profiler: Profiler = DISABLED,
+    layout: str = "wide",
+    parse_workers: int = 1,
+) -> str | None:
+    """Convert a counts EML file (510b) and its candidates EML file (230b) to a csv file (osv4-3).
+
+    Args:
+        counts_eml_path: Path to the counts EML file (510b) or a binary stream of it. The file may be
+            gzip-compressed (.gz) or inside a zip archive (archive.zip/Telling_EP2024_gemeente_Juinen.eml.xml).
+            Streams that cannot be rewound, like standard input, are read into memory first.
+        candidates_eml_path: Path to the candidates EML file (230b) matching the counts file, like counts_eml_path.
+        output_csv_path: Path or stream to write the csv to. If None or an existing directory,
+            a filename is generated from the election and authority.
+        cache: Cache of parsed EML files to read the input files through.
+        profiler: Profiler to record the duration and size of every stage of the conversion in.
+        layout: "wide" for osv4-3, or "long" for a line per reporting unit and count. The long layout is
+            written while the counts file is read, so its memory use does not grow with the number of
+            reporting units. The parsed counts file is not cached.
+        parse_workers: Number of processes to parse the reporting units of the counts file in, for very
+            large files on machines with more cores. The output is the same. Not used for the long layout.
+
+    Returns:
+        Path of the written csv file, or None when writing to a stream.
+    """
+    if layout not in LAYOUTS:
+        raise ValueError(f"Unknown layout {layout}, choose from {', '.join(LAYOUTS)}")
+    if layout == "long":
+        return _eml2csv_long(counts_eml_path, candidates_eml_path, output_csv_path, cache, profiler)
+
+    return convert(counts_eml_path, candidates_eml_path, cache, profiler, parse_workers).to_csv(
+        output_csv_path, profiler
+    )
+
+
+def convert(
+    counts_eml_path: str | IO[bytes],
+    candidates_eml_path: str | IO[bytes],
+    cache: "ParseCache | None" = None,
+    profiler: Profiler = DISABLED,
+    parse_workers: int = 1,
+) -> "CountsTable":
+    """Read a counts EML file (510b) and its candidates EML file (230b) into the table of the csv file (osv4-3).
+
+    Nothing is written, so callers that use the counts in Python do not have to write and read back a csv file.
+
+    Args:
+        counts_eml_path: Path to the counts EML file (510b) or a binary stream of it, see eml2csv.
+        candidates_eml_path: Path to the candidates EML file (230b) matching the counts file, like counts_eml_path.
+        cache: Cache of parsed EML files to read the input files through.
+        profiler: Profiler to record the duration and size of reading the files in.
+        parse_workers: Number of processes to parse the reporting units of the counts file in, see eml2csv.
+
+    Returns:
+        The table, with the rows of the csv file only formatted when they are iterated over.
+    """
+    counts_eml, candidates_eml = _read_pair(counts_eml_path, candidates_eml_path, cache, profiler, parse_workers)
+    return CountsTable(counts_eml, candidates_eml.candidate_info)
+
+
+@dataclass(frozen=True)
+class ReportingUnit:
+    # Gebiednummer, the id without the prefix of the authority
+    id: str
+    name: str
+    # Empty if the name has no zip code
+    zip: str
+
+
+class CountsTable:
+    """The counts of a counts EML file with the names from its candidates file, as written to a csv file (osv4-3).
+
+    The counts are kept as integers: every row of counts has the total first, followed by one
+    value per reporting unit in the order of reporting_units.
+    """
+
+    def __init__(
+        self, counts_eml: _CountsEml, candidate_info: dict[_AffiliationIdentifier, list[_CandidateIdentifier]]
+    ):
+        self._counts_eml = counts_eml
+        self.candidates = candidate_info
+        self.reporting_units = [
+            ReportingUnit(_extract_reporting_unit_id(unit_id), _clean_name(name), _extract_zip_from_name(name))
+            for unit_id, name in zip(counts_eml.reporting_unit_ids, counts_eml.reporting_unit_names, strict=True)
+        ]
+
+    @property
+    def election_id(self) -> str | None:
+        return self._counts_eml.election_id
+
+    @property
+    def contest_id(self) -> str | None:
+        return self._counts_eml.contest_id
+
+    @property
+    def election_name(self) -> str | None:
+        return self._counts_eml.election_name
+
+    @property
+    def election_date(self) -> str | None:
+        return self._counts_eml.election_date
+
+    @property
+    def authority_id(self) -> str | None:
+        return self._counts_eml.authority_id
+
+    @property
+    def authority_name(self) -> str | None:
+        return self._counts_eml.authority_name
+
+    @property
+    def votes(self) -> VoteMatrix:
+        """Votes of every list (candidate id None) and candidate, by (affiliation id, candidate id)."""
+        return self._counts_eml.votes
+
+    @property
+    def counters(self) -> dict[str, "array[int]"]:
+        """The metadata rows of the csv by their name, in the order of the csv."""
+        return dict(_metadata_rows(self._counts_eml))
+
+    @property
+    def default_file_name(self) -> str:
+        return _default_output_path(self.election_id, self.authority_name)
+
+    def __iter__(self) -> Iterator[list[str]]:
+        return _generate_rows(self._counts_eml, self.candidates)
+
+    def to_rows(self) -> list[list[str]]:
+        """The cells of every row of the csv file."""
+        return list(self)
+
+    def to_csv(self, output_csv_path: str | IO[str] | IO[bytes] | None, profiler: Profiler = DISABLED) -> str | None:
+        """Write the csv file, like eml2csv.
+
+        Args:
+            output_csv_path: Path or stream to write the csv to. If None or an existing directory,
+                default_file_name is used.
+            profiler: Profiler to record the duration and size of writing in.
+
+        Returns:
+            Path of the written csv file, or None when writing to a stream.
+        """
+        # If no output file name is specified, construct one automatically
+        if output_csv_path is None or (isinstance(output_csv_path, str) and os.path.isdir(output_csv_path)):
+            output_csv_path = os.path.join(output_csv_path or "", self.default_file_name)
+        return _write_rows(self, output_csv_path, profiler, "write")
+
+
+def _write_rows(
+    rows: Iterable[list[str]], output_csv_path: str | IO[str] | IO[bytes], profiler: Profiler, stage_name: str
+) -> str | None:
+    with profiler.stage(stage_name) as stage, _open_output(output_csv_path) as stream:
+        output = _Output(stream, count_bytes=profiler.enabled)
+        for row in rows:
+            output.push(row)
+        stage.counts["rows"] = output.rows_written
+        stage.counts["bytes"] = output.bytes_written
+
+    return output_csv_path if isinstance(output_csv_path, str) else None
+
+
+def _read_pair(
+    counts_eml_path: str | IO[bytes],
+    candidates_eml_path: str | IO[bytes],
+    cache: "ParseCache | None" = None,
+    profiler: Profiler = DISABLED,
+    parse_workers: int = 1,
+) -> tuple[_CountsEml, _CandidatesEml]:
+    """Check that the files are a counts file and the candidates file belonging to it, then read both."""
+    # Streams are read after they are probed, so those that cannot be rewound are read into memory
+    counts_eml_path, candidates_eml_path = seekable(counts_eml_path), seekable(candidates_eml_path)
+    counts_probe = _check_pair(counts_eml_path, candidates_eml_path, profiler)
 
     ## Read in file
-    counts_eml = parse_xml(counts_eml_path)
-    candidates_eml = parse_xml(candidates_eml_path)
+    with profiler.stage("read_counts") as stage:
+        counts_eml = (
+            cache.counts(counts_eml_path, parse_workers)
+            if cache is not None
+            else _read_counts_eml(counts_eml_path, parse_workers)
+        )
+        stage.counts["reporting_units"] = len(counts_eml.reporting_unit_ids)
+        stage.counts["selections"] = len(counts_eml.votes.rows) * counts_eml.votes.n_columns
+
+    return counts_eml, _read_candidates(candidates_eml_path, counts_probe.contest_id, cache, profiler)
+
+
+def _eml2csv_long(
+    counts_eml_path: str | IO[bytes],
+    candidates_eml_path: str | IO[bytes],
+    output_csv_path: str | IO[str] | IO[bytes] | None,
+    cache: "ParseCache | None",
+    profiler: Profiler,
+) -> str | None:
+    counts_eml_path, candidates_eml_path = seekable(counts_eml_path), seekable(candidates_eml_path)
+    counts_probe = _check_pair(counts_eml_path, candidates_eml_path, profiler)
+    candidates_eml = _read_candidates(candidates_eml_path, counts_probe.contest_id, cache, profiler)
+
+    # The name is taken from the header, as the output is opened before the counts file is read
+    if output_csv_path is None or (isinstance(output_csv_path, str) and os.path.isdir(output_csv_path)):
+        output_csv_path = os.path.join(
+            output_csv_path or "",
+            _default_output_path(counts_probe.election_id, counts_probe.authority_name, layout="long"),
+        )
 
-    # Check if parsing succeeded
-    if counts_eml is None:
-        raise InvalidInputError(f"Could not parse {counts_eml_path}")
-    if candidates_eml is None:
-        raise InvalidInputError(f"Could not parse {candidates_eml_path}")
+    rows = _generate_long_rows(_read_counts_events(counts_eml_path), candidates_eml.candidate_info)
+    return _write_rows(rows, output_csv_path, profiler, "read_counts_and_write")
+
+
+def _check_pair(counts_eml_path: str | IO[bytes], candidates_eml_path: str | IO[bytes], profiler: Profiler) -> EmlProbe:
+    """Check that the files are a counts file and the candidates file belonging to it, returning the counts header."""
+    ## Check input files
+    # Only the headers are read, so mismatching files fail before any of them is parsed in full
+    with profiler.stage("probe"):
+        counts_probe = probe_eml(counts_eml_path)
+        candidates_probe = probe_eml(candidates_eml_path)
 
     # Check if the supplied files match and are the expected EML id
-    counts_id = _get_attrib(counts_eml, "Id")
-    candidates_id = _get_attrib(candidates_eml, "Id")
-    if counts_id != "510b" or counts_eml.tag != f"{{{NS['eml']}}}EML":
+    if counts_probe.eml_id != "510b":
         raise InvalidInputError(f"{counts_eml_path} was not an EML counts file (510b)!")
-    if candidates_id != "230b" or candidates_eml.tag != f"{{{NS['eml']}}}EML":
+    if candidates_probe.eml_id != "230b":
         raise InvalidInputError(f"{candidates_eml_path} was not an EML candidates file (230b)!")
 
     # Check if election id and contest id match
-    counts_election_id = _get_attrib(counts_eml.find(".//eml:ElectionIdentifier", namespaces=NS), "Id")
-    candidates_election_id = _get_attrib(candidates_eml.find(".//eml:ElectionIdentifier", namespaces=NS), "Id")
+    counts_election_id = counts_probe.election_id
+    candidates_election_id = candidates_probe.election_id
     if counts_election_id is None or candidates_election_id is None or counts_election_id != candidates_election_id:
         raise InvalidInputError(
             f"Election ids did not match! Counts file was {counts_election_id} while candidates file was {candidates_election_id}"
         )
 
-    counts_contest_id = _get_attrib(counts_eml.find(".//eml:ContestIdentifier", namespaces=NS), "Id")
-    candidates_contest_id = _get_attrib(candidates_eml.find(".//eml:ContestIdentifier", namespaces=NS), "Id")
-    if counts_contest_id is None or candidates_contest_id is None or counts_contest_id != candidates_contest_id:
+    # Whether the candidates file has the contest is checked when it is read, as it may have more than one
+    if counts_probe.contest_id is None or candidates_probe.contest_id is None:
         raise InvalidInputError(
-            f"Contest ids did not match! Counts file was {counts_contest_id} while candidates file was {candidates_contest_id}"
+            f"Contest ids did not match! Counts file was {counts_probe.contest_id} while candidates file was "
+            f"{candidates_probe.contest_id}"
         )
 
-    ## HEADER
-    output.push(
-        [
-            "Verkiezing",
-            "",
-            _get_mandatory_text(counts_eml.find(".//eml:ElectionName", namespaces=NS)),
-        ]
-    )
+    return counts_probe
 
-    output.push(
-        [
-            "Datum",
-            "",
-            _get_mandatory_text(counts_eml.find(".//kr:ElectionDate", namespaces=NS)),
-        ]
-    )
 
-    authority_name = _get_mandatory_text(counts_eml.find(".//eml:AuthorityIdentifier", namespaces=NS))
-    authority_type = "Openbaar lichaam" if authority_name in ["Bonaire", "Saba", "Sint Eustatius"] else "Gemeente"
-    output.push(
-        [
-            "Gebied",
-            "",
-            f"{authority_type} {authority_name}",
-        ]
-    )
+def _read_candidates(
+    candidates_eml_path: str | IO[bytes], contest_id: str | None, cache: "ParseCache | None", profiler: Profiler
+) -> _CandidatesEml:
+    with profiler.stage("read_candidates") as stage:
+        candidates_eml = (
+            cache.candidates(candidates_eml_path, contest_id)
+            if cache is not None
+            else _read_candidates_eml(candidates_eml_path, contest_id)
+        )
+        stage.counts["affiliations"] = len(candidates_eml.candidate_info)
+        stage.counts["candidates"] = sum(len(candidates) for candidates in candidates_eml.candidate_info.values())
+    return candidates_eml
 
-    authority_id = _get_mandatory_attrib(counts_eml.find(".//eml:AuthorityIdentifier", namespaces=NS), "Id")
-    output.push(
-        [
-            "Nummer",
-            "",
-            authority_id,
-        ]
+
+def _authority_type(authority_name: str) -> str:
+    return "Openbaar lichaam" if authority_name in ["Bonaire", "Saba", "Sint Eustatius"] else "Gemeente"
+
+
+def _default_output_path(election_id: str | None, authority_name: str | None, layout: str = "wide") -> str:
+    # Normalise the election id and take the first six characters.
+    # This is because for example for GR elections the ID is GR2080_Juinen
+    # and we add the authorityname already.
+    election_id = normalise(_get_mandatory(election_id))[:6]
+    authority_name = _get_mandatory(authority_name)
+    prefix = "osv4-3" if layout == "wide" else layout
+    if election_id.lower().startswith("gr"):
+        return f"{prefix}_telling_{election_id}_{normalise(authority_name)}.csv"
+    return f"{prefix}_telling_{election_id}_{_authority_type(authority_name).lower().replace(' ', '_')}_{normalise(authority_name)}.csv"
+
+
+def _header_rows(
+    election_name: str | None, election_date: str | None, authority_name: str | None, authority_id: str | None
+) -> Iterator[list[str]]:
+    yield ["Verkiezing", "", _get_mandatory(election_name)]
+    yield ["Datum", "", _get_mandatory(election_date)]
+
+    authority_name = _get_mandatory(authority_name)
+    yield ["Gebied", "", f"{_authority_type(authority_name)} {authority_name}"]
+    yield ["Nummer", "", _get_mandatory(authority_id)]
+    yield []
+
+
+def _generate_rows(
+    counts_eml: _CountsEml, candidate_info: dict[_AffiliationIdentifier, list[_CandidateIdentifier]]
+) -> Iterator[list[str]]:
+    ## HEADER
+    yield from _header_rows(
+        counts_eml.election_name, counts_eml.election_date, counts_eml.authority_name, counts_eml.authority_id
     )
-    output.flush()
+    yield from _generate_table_rows(counts_eml, candidate_info)
 
+
+def _generate_table_rows(
+    counts_eml: _CountsEml, candidate_info: dict[_AffiliationIdentifier, list[_CandidateIdentifier]]
+) -> Iterator[list[str]]:
+    """Generate the rows below the header, with a column per reporting unit of the counts file."""
     ## REPORTING UNIT INFO
-    reporting_units = counts_eml.findall(".//eml:ReportingUnitIdentifier", namespaces=NS)
-    reporting_unit_names = [_get_mandatory_text(elem) for elem in reporting_units]
-    reporting_unit_ids = [_extract_reporting_unit_id(_get_mandatory_attrib(elem, "Id")) for elem in reporting_units]
+    reporting_unit_names = counts_eml.reporting_unit_names
+    reporting_unit_ids = [_extract_reporting_unit_id(unit_id) for unit_id in counts_eml.reporting_unit_ids]
     reporting_unit_zips = [_extract_zip_from_name(name) for name in reporting_unit_names]
 
     # Main header with polling stations and zip codes
-    output.push(
+    yield (
         ["Lijstnummer", "Aanduiding", "Volgnummer", "Naam kandidaat", "Totaal"]
         + [_clean_name(name) for name in reporting_unit_names]
     )
-    output.push(["Gebiednummer", "", "", "", "", *reporting_unit_ids])
-    output.push(["Postcode", "", "", "", "", *reporting_unit_zips])
+    yield ["Gebiednummer", "", "", "", "", *reporting_unit_ids]
+    yield ["Postcode", "", "", "", "", *reporting_unit_zips]
 
     ## METADATA INFO
-    output.push(_generate_metadata_row(counts_eml, "opgeroepenen", ".//eml:Cast"))
-    output.push(
-        _generate_metadata_row(
-            counts_eml,
-            "geldige stempas",
-            ".//eml:UncountedVotes[@ReasonCode = 'geldige stempassen']",
-        )
-    )
-    output.push(
-        _generate_metadata_row(
-            counts_eml,
-            "geldig volmachtbewijs",
-            ".//eml:UncountedVotes[@ReasonCode = 'geldige volmachtbewijzen']",
-        )
-    )
-    output.push(
-        _generate_metadata_row(
-            counts_eml,
-            "geldige kiezerspas",
-            ".//eml:UncountedVotes[@ReasonCode = 'geldige kiezerspassen']",
-        )
-    )
-    output.push(
-        _generate_metadata_row(
-            counts_eml,
-            "toegelaten kiezers",
-            ".//eml:UncountedVotes[@ReasonCode = 'toegelaten kiezers']",
-        )
-    )
-    geldig = _generate_metadata_row(
-        counts_eml,
-        "geldige stembiljetten",
-        ".//eml:TotalCounted",
-    )
-    output.push(geldig)
+    for name, values in _metadata_rows(counts_eml):
+        yield ["", name, "", "", *map(str, values)]
 
-    blanco = _generate_metadata_row(
-        counts_eml,
-        "blanco stembiljetten",
-        ".//eml:RejectedVotes[@ReasonCode = 'blanco']",
-    )
-    output.push(blanco)
-
-    ongeldig = _generate_metadata_row(
-        counts_eml,
-        "ongeldige stembiljetten",
-        ".//eml:RejectedVotes[@ReasonCode = 'ongeldig']",
-    )
-    output.push(ongeldig)
-
-    # Calculate total votes
-    aangetroffen = ["", "aangetroffen stembiljetten", "", ""] + [
-        str(int(geldig) + int(ongeldig) + int(blanco))
-        for (geldig, ongeldig, blanco) in zip(geldig[4:], ongeldig[4:], blanco[4:], strict=True)
-    ]
-    output.push(aangetroffen)
-
-    output.push(
-        _generate_metadata_row(
-            counts_eml,
-            "meer stembiljetten dan toegelaten kiezers",
-            ".//eml:UncountedVotes[@ReasonCode = 'meer getelde stembiljetten']",
-        )
-    )
-    output.push(
-        _generate_metadata_row(
-            counts_eml,
-            "minder stembiljetten dan toegelaten kiezers",
-            ".//eml:UncountedVotes[@ReasonCode = 'minder getelde stembiljetten']",
-        )
-    )
-    output.push(
-        _generate_metadata_row(
-            counts_eml,
-            "kiezers met stembiljet hebben niet gestemd",
-            ".//eml:UncountedVotes[@ReasonCode = 'meegenomen stembiljetten']",
-        )
-    )
-    output.push(
-        _generate_metadata_row(
-            counts_eml,
-            "er zijn te weinig stembiljetten uitgereikt",
-            ".//eml:UncountedVotes[@ReasonCode = 'te weinig uitgereikte stembiljetten']",
-        )
-    )
-    output.push(
-        _generate_metadata_row(
-            counts_eml,
-            "er zijn te veel stembiljetten uitgereikt",
-            ".//eml:UncountedVotes[@ReasonCode = 'te veel uitgereikte stembiljetten']",
+    ## CANDIDATE INFO
+    votes = counts_eml.votes
+    # Look up the rows in candidate list order once, vote counts are only formatted while writing
+    row_indexes = iter(
+        votes.row_indexes(
+            key
+            for affiliation, candidates in candidate_info.items()
+            for key in [(affiliation.id, None), *((affiliation.id, candidate.id) for candidate in candidates)]
         )
     )
-    output.push(
-        _generate_metadata_row(
-            counts_eml,
-            "geen verklaring",
-            ".//eml:UncountedVotes[@ReasonCode = 'geen verklaring']",
-        )
-    )
-    output.push(
-        _generate_metadata_row(
-            counts_eml,
-            "andere verklaring",
-            ".//eml:UncountedVotes[@ReasonCode = 'andere verklaring']",
-        )
+    for affiliation, candidates in candidate_info.items():
+        # Affiliation total votes
+        yield [affiliation.id, affiliation.name, "", "", *votes.formatted_row(next(row_indexes))]
+        # Candidate votes
+        for candidate in candidates:
+            yield ["", "", candidate.id, candidate.name, *votes.formatted_row(next(row_indexes))]
+
+
+def _metadata_rows(counts_eml: _CountsEml) -> Iterator[tuple[str, "array[int]"]]:
+    for name, counter in _METADATA_ROWS:
+        yield name, counts_eml.counters[counter]
+
+        if name == "ongeldige stembiljetten":
+            # Calculate total votes
+            aangetroffen = add_rows(
+                counts_eml.counters[("TotalCounted", None)],
+                counts_eml.counters[("RejectedVotes", "ongeldig")],
+                counts_eml.counters[("RejectedVotes", "blanco")],
+            )
+            yield "aangetroffen stembiljetten", aangetroffen
+
+
+# Events of a counts EML file (510b), in the order they appear in the file
+_HEADER = "header"  # (_HEADER, field of _CountsEml, value), once per field
+_COLUMN = "column"  # (_COLUMN, column) at the start of the TotalVotes (column 0) and every ReportingUnitVotes
+_REPORTING_UNIT = "reporting_unit"  # (_REPORTING_UNIT, id, name) of the current column
+_VOTES = "votes"  # (_VOTES, column, affiliation id, candidate id or None, votes)
+_COUNTER = "counter"  # (_COUNTER, column, (tag, ReasonCode), value)
+_END_COLUMN = "end_column"  # (_END_COLUMN, column)
+_CountsEvent = tuple[Any, ...]
+
+
+def _generate_long_rows(
+    events: Iterator[_CountsEvent], candidate_info: dict[_AffiliationIdentifier, list[_CandidateIdentifier]]
+) -> Iterator[list[str]]:
+    """Generate a line per reporting unit and count from the events of a counts file, as they are read.
+
+    Only the counters of the current reporting unit are kept, they follow its votes.
+    """
+    affiliation_names = {affiliation.id: affiliation.name for affiliation in candidate_info}
+    candidate_names = {
+        (affiliation.id, candidate.id): candidate.name
+        for affiliation, candidates in candidate_info.items()
+        for candidate in candidates
+    }
+    header: dict[str, str] = {}
+    header_written = False
+    # Gebiednummer, name and zip code of the current column
+    unit = ["", "Totaal", ""]
+    counters: dict[tuple[str, str | None], int] = {}
+
+    for event in events:
+        kind = event[0]
+        if kind is _VOTES:
+            _, _, affid, candid, votes = event
+            # Like the wide layout, only the affiliations and candidates of the candidates file are written
+            affiliation_name = affiliation_names.get(affid)
+            if affiliation_name is None:
+                continue
+            if candid is None:
+                yield [*unit, affid, affiliation_name, "", "", str(votes)]
+            elif (affid, candid) in candidate_names:
+                yield [*unit, affid, affiliation_name, candid, candidate_names[affid, candid], str(votes)]
+        elif kind is _COUNTER:
+            counters[event[2]] = event[3]
+        elif kind is _REPORTING_UNIT:
+            unit = [_extract_reporting_unit_id(event[1]), _clean_name(event[2]), _extract_zip_from_name(event[2])]
+        elif kind is _END_COLUMN:
+            yield from _long_metadata_rows(unit, counters)
+            counters = {}
+        elif kind is _COLUMN and not header_written:
+            # The header elements all come before the votes
+            yield from _long_header_rows(header)
+            header_written = True
+        elif kind is _HEADER:
+            header[event[1]] = event[2]
+
+    if not header_written:
+        yield from _long_header_rows(header)
+
+
+def _long_header_rows(header: dict[str, str]) -> Iterator[list[str]]:
+    yield from _header_rows(
+        header.get("election_name"),
+        header.get("election_date"),
+        header.get("authority_name"),
+        header.get("authority_id"),
     )
+    yield [
+        "Gebiednummer",
+        "Stembureau",
+        "Postcode",
+        "Lijstnummer",
+        "Aanduiding",
+        "Volgnummer",
+        "Naam kandidaat",
+        "Aantal",
+    ]
 
-    ## CANDIDATE INFO
-    candidate_info = _get_candidate_info(candidates_eml)
-    votes = _get_votecount_matrix(counts_eml)
 
-    for affiliation in candidate_info:
-        # Push affiliation total votes
-        output.push([affiliation.id, affiliation.name, "", ""] + votes[(affiliation.id, None)])
-        # Push candidate votes
-        for candidate in candidate_info[affiliation]:
-            output.push(["", "", candidate.id, candidate.name] + votes[(affiliation.id, candidate.id)])
+def _long_metadata_rows(unit: list[str], counters: dict[tuple[str, str | None], int]) -> Iterator[list[str]]:
+    for name, counter in _METADATA_ROWS:
+        if counter in counters:
+            yield [*unit, "", name, "", "", str(counters[counter])]
+
+        if name == "ongeldige stembiljetten":
+            aangetroffen = (
+                counters.get(("TotalCounted", None), 0)
+                + counters.get(("RejectedVotes", "ongeldig"), 0)
+                + counters.get(("RejectedVotes", "blanco"), 0)
+            )
+            yield [*unit, "", "aangetroffen stembiljetten", "", "", str(aangetroffen)]
+
+
+def _read_counts_eml(counts_eml_path: str | IO[bytes], workers: int = 1) -> _CountsEml:
+    """Read everything needed for the csv from a counts EML file (510b) in a single streaming pass.
+
+    Memory use depends on the number of reporting units rather than on the file size. With more
+    than one worker, the file is read into memory and its reporting units are parsed in that many
+    processes instead, see read_counts_sharded.
+    """
+    if workers > 1:
+        from eml2csv.sharding import read_counts_sharded  # noqa: PLC0415 the process pool is only needed here
+
+        return read_counts_sharded(counts_eml_path, workers)
+
+    counts_eml = _CountsEml()
+    votes = counts_eml.votes
+    counters = counts_eml.counters
+
+    for event in _read_counts_events(counts_eml_path):
+        kind = event[0]
+        if kind is _VOTES:
+            votes.set((event[2], event[3]), event[1], event[4])
+        elif kind is _COUNTER:
+            counters[event[2]].append(event[3])
+        elif kind is _COLUMN:
+            votes.add_column()
+        elif kind is _REPORTING_UNIT:
+            counts_eml.reporting_unit_ids.append(event[1])
+            counts_eml.reporting_unit_names.append(event[2])
+        elif kind is _HEADER:
+            setattr(counts_eml, event[1], event[2])
+
+    return counts_eml
+
+
+def _read_counts_events(counts_eml_path: str | IO[bytes]) -> Generator[_CountsEvent, None, None]:
+    """Read a counts EML file (510b) in a single streaming pass, yielding every value as soon as it is read.
+
+    Elements are released from the tree as soon as they are processed, so memory
+    use does not grow with the file size.
+    """
+    # Open elements from the root down to the element currently being parsed
+    path: list[XmlElement] = []
+    affid_cur = None
+    candid_cur = None
+    column = -1
+    header_fields: set[str] = set()
+    # Compiled for the current XML backend once instead of for every selection
+    find_affiliation_identifier = _AFFILIATION_IDENTIFIER_PATH.finder()
+    find_candidate_identifier = _NESTED_CANDIDATE_IDENTIFIER_PATH.finder()
+    find_valid_votes = _VALID_VOTES_PATH.finder()
+
+    with open_eml(counts_eml_path) as counts_eml_file:
+        for event, elem in iterparse_xml(counts_eml_file):
+            if event == "start":
+                if not path and (_get_attrib(elem, "Id") != "510b" or elem.tag != _EML_TAG):
+                    raise InvalidInputError(f"{counts_eml_path} was not an EML counts file (510b)!")
+                if elem.tag in _VOTES_BLOCK_TAGS:
+                    # The TotalVotes become the first column, every ReportingUnitVotes the next one
+                    column += 1
+                    affid_cur = None
+                    candid_cur = None
+                    yield _COLUMN, column
+                path.append(elem)
+                continue
+
+            path.pop()
+            tag = elem.tag
+            parent = path[-1] if path else None
+
+            if tag == _SELECTION_TAG and parent is not None and parent.tag in _VOTES_BLOCK_TAGS:
+                affid = find_affiliation_identifier(elem)
+                if affid is not None:
+                    affid_cur = _get_mandatory_attrib(affid, "Id")
+                    candid_cur = None
+                else:
+                    candid_cur = _get_mandatory_attrib(find_candidate_identifier(elem), "Id")
+                yield _VOTES, column, affid_cur, candid_cur, int(_get_mandatory_text(find_valid_votes(elem)))
+            elif tag in _COUNTER_TAGS:
+                yield (
+                    _COUNTER,
+                    column,
+                    (tag.rpartition("}")[2], _get_attrib(elem, "ReasonCode")),
+                    int(_get_mandatory_text(elem)),
+                )
+            elif tag == _REPORTING_UNIT_IDENTIFIER_TAG:
+                yield _REPORTING_UNIT, _get_mandatory_attrib(elem, "Id"), _get_mandatory_text(elem)
+            elif tag in _VOTES_BLOCK_TAGS:
+                yield _END_COLUMN, column
+            elif tag in _HEADER_TAGS:
+                # Only the first value found counts, the same elements may be repeated further down
+                for header_field, value in _header_values(tag, elem):
+                    if value is not None and header_field not in header_fields:
+                        header_fields.add(header_field)
+                        yield _HEADER, header_field, value
+
+            # Everything inside the vote blocks has been consumed once it is closed, so drop it
+            if parent is not None and (parent.tag in _VOTES_BLOCK_TAGS or tag in _VOTES_BLOCK_TAGS):
+                parent.remove(elem)
 
-    # If no output file name is specified, construct one automatically
-    if output_csv_path is None:
-        # Normalise the election id and take the first six characters.
-        # This is because for example for GR elections the ID is GR2080_Juinen
-        # and we add the authorityname already.
-        election_id = normalise(
-            _get_mandatory_attrib(counts_eml.find(".//eml:ElectionIdentifier", namespaces=NS), "Id")
-        )[:6]
-        if election_id.lower().startswith("gr"):
-            output_csv_path = f"osv4-3_telling_{election_id}_{normalise(authority_name)}.csv"
-        else:
-            output_csv_path = f"osv4-3_telling_{election_id}_{authority_type.lower().replace(' ', '_')}_{normalise(authority_name)}.csv"
 
-    output.write_to_file(output_csv_path)
+@dataclass(frozen=True)
+class _CountsBlocks:
+    """The TotalVotes and ReportingUnitVotes blocks of a counts EML file (510b) as raw bytes, in file order."""
+
+    # Everything up to and including the start tag of the root element, and its end tag
+    head: bytes
+    tail: bytes
+    blocks: list[bytes]
+
+    def events(self, block: bytes) -> Generator[_CountsEvent, None, None]:
+        """Read a single block, as if it were the only one in the file (so its column is 0)."""
+        return _read_counts_events(io.BytesIO(self.head + block + self.tail))
+
+
+def _split_counts_blocks(content: bytes) -> _CountsBlocks:
+    """Find the votes blocks of a counts file without parsing it, so each can be hashed or parsed on its own."""
+    root = _find_root(content)
+    return _CountsBlocks(
+        head=content[: root.end()],
+        tail=b"</" + root["name"] + b">",
+        blocks=[content[start:end] for start, end in _find_blocks(content, _VOTES_BLOCK_START_REGEX, root.end())],
+    )
 
 
-def _generate_metadata_row(eml: XmlElement, name: str, eml_elem: str) -> list[str]:
-    return ["", name, "", ""] + [_get_mandatory_text(elem) for elem in eml.findall(eml_elem, namespaces=NS)]
+def _find_root(content: bytes) -> re.Match[bytes]:
+    root = _search_markup(content, _ROOT_START_REGEX, 0)
+    if root is None or root["empty"]:
+        raise InvalidInputError("Could not find the root element of the EML file")
+    return root
+
+
+def _find_blocks(content: bytes, start_regex: re.Pattern[bytes], position: int) -> Iterator[tuple[int, int]]:
+    """Find the start and end offsets of the elements whose start tag matches, these elements must not nest."""
+    while (start := _search_markup(content, start_regex, position)) is not None:
+        if start["empty"]:
+            yield start.start(), start.end()
+            position = start.end()
+            continue
+        # The element ends at the first end tag with the same name, not one that only starts with it
+        end = _search_markup(content, re.compile(b"</" + re.escape(start["name"]) + rb"\s*>"), start.end())
+        if end is None:
+            raise InvalidInputError(f"{start['name'].decode()} element is not closed")
+        yield start.start(), end.end()
+        position = end.end()
+
+
+def _search_markup(content: bytes, regex: re.Pattern[bytes], position: int) -> re.Match[bytes] | None:
+    """Search like regex.search, skipping comments, CDATA sections, processing instructions and the document type.
+
+    These are rare in EML files, so the regex is searched for first and only the bytes before
+    the match are checked for them.
+    """
+    while (match := regex.search(content, position)) is not None:
+        skipped = _find_skipped_markup(content, position, match.start())
+        if skipped == -1:
+            return match
+        markup = _SKIPPED_MARKUP_REGEX.match(content, skipped)
+        if markup is None:
+            raise InvalidInputError(f"Could not read the markup at byte {skipped} of the EML file")
+        position = markup.end()
+    return None
+
+
+def _find_skipped_markup(content: bytes, start: int, end: int) -> int:
+    """Find the first <! or <? between start and end, or -1 if there is none."""
+    first = -1
+    # Searching for the rare second byte is much faster than for a < followed by it
+    for char in b"!?":
+        offset = content.find(char, start + 1, end)
+        while offset != -1 and content[offset - 1] != ord("<"):
+            offset = content.find(char, offset + 1, end)
+        if offset != -1 and (first == -1 or offset - 1 < first):
+            first = offset - 1
+    return first
+
+
+def _header_values(tag: str, elem: XmlElement) -> list[tuple[str, str | None]]:
+    if tag == _ELECTION_IDENTIFIER_TAG:
+        return [("election_id", _get_attrib(elem, "Id"))]
+    if tag == _CONTEST_IDENTIFIER_TAG:
+        return [("contest_id", _get_attrib(elem, "Id"))]
+    if tag == _ELECTION_NAME_TAG:
+        return [("election_name", _get_mandatory_text(elem))]
+    if tag == _ELECTION_DATE_TAG:
+        return [("election_date", _get_mandatory_text(elem))]
+    return [("authority_id", _get_mandatory_attrib(elem, "Id")), ("authority_name", _get_mandatory_text(elem))]
 
 
 def _extract_zip_from_name(reporting_unit_name: str | None) -> str:
@@ -318,52 +870,106 @@ def _extract_reporting_unit_id(reporting_unit_id: str) -> str:
     return re.sub(SB_ID_REGEX, "", reporting_unit_id)
 
 
-def _get_candidate_info(candidates_eml: XmlElement):
-    candidate_info = defaultdict(list)
-    for aff in candidates_eml.findall(".//eml:Affiliation", namespaces=NS):
-        aff_identifier = aff.find("./eml:AffiliationIdentifier", namespaces=NS)
+@dataclass(frozen=True)
+class _CandidatesIndex:
+    """The contests of a candidates EML file (230b) by their ContestIdentifier.
+
+    A candidates file of a national election has a contest for every kieskring. All of them are
+    read in a single pass over the file, so reading another contest is a dictionary lookup.
+    """
+
+    eml_id: str | None
+    election_id: str | None
+    contests: dict[str, _CandidatesEml]
+
+    def read(self, contest_id: str | None) -> _CandidatesEml:
+        """Get the lists and candidates of a single contest."""
+        candidates_eml = self.contests.get(contest_id) if contest_id is not None else None
+        if candidates_eml is None:
+            raise InvalidInputError(
+                f"Contest ids did not match! Counts file was {contest_id} while candidates file was "
+                f"{', '.join(self.contests) or None}"
+            )
+        return candidates_eml
+
+
+def _index_candidates(candidates_eml_path: str | IO[bytes]) -> _CandidatesIndex:
+    """Read the lists and candidates of every contest of a candidates file in a single streaming pass.
+
+    Every contest is released from the tree once it has been read, so memory use does
+    not grow with the number of contests.
+    """
+    # Open elements from the root down to the element currently being parsed
+    path: list[XmlElement] = []
+    eml_id = None
+    election_id = None
+    contests: dict[str, _CandidatesEml] = {}
+
+    with open_eml(candidates_eml_path) as candidates_eml_file:
+        for event, elem in iterparse_xml(candidates_eml_file):
+            if event == "start":
+                if not path:
+                    eml_id = _get_attrib(elem, "Id") if elem.tag == _EML_TAG else None
+                path.append(elem)
+                continue
+
+            path.pop()
+            if elem.tag == _ELECTION_IDENTIFIER_TAG and election_id is None:
+                election_id = _get_attrib(elem, "Id")
+            elif elem.tag == _CONTEST_TAG:
+                contest_id = _get_attrib(_CONTEST_IDENTIFIER_PATH.find(elem), "Id")
+                if contest_id is not None and contest_id not in contests:
+                    contests[contest_id] = _CandidatesEml(
+                        eml_id=eml_id,
+                        election_id=election_id,
+                        contest_id=contest_id,
+                        candidate_info=_get_candidate_info(elem) if eml_id == "230b" else {},
+                    )
+                if path:
+                    path[-1].remove(elem)
+
+    return _CandidatesIndex(eml_id=eml_id, election_id=election_id, contests=contests)
+
+
+def _read_candidates_eml(candidates_eml_path: str | IO[bytes], contest_id: str | None = None) -> _CandidatesEml:
+    """Read the lists and candidates of a candidates file, of all contests or only the given one."""
+    if contest_id is not None:
+        return _index_candidates(candidates_eml_path).read(contest_id)
+
+    with open_eml(candidates_eml_path) as candidates_eml_file:
+        root = parse_xml(candidates_eml_file)
+
+    # Check if parsing succeeded
+    if root is None:
+        raise InvalidInputError(f"Could not parse {candidates_eml_path}")
+
+    candidates_eml = _CandidatesEml(
+        eml_id=_get_attrib(root, "Id") if root.tag == _EML_TAG else None,
+        election_id=_get_attrib(_ELECTION_IDENTIFIER_PATH.find(root), "Id"),
+        contest_id=_get_attrib(_CONTEST_IDENTIFIER_PATH.find(root), "Id"),
+    )
+    if candidates_eml.eml_id == "230b":
+        candidates_eml.candidate_info = _get_candidate_info(root)
+    return candidates_eml
+
+
+def _get_candidate_info(candidates_eml: XmlElement) -> dict[_AffiliationIdentifier, list[_CandidateIdentifier]]:
+    candidate_info: dict[_AffiliationIdentifier, list[_CandidateIdentifier]] = defaultdict(list)
+    for aff in _AFFILIATION_PATH.findall(candidates_eml):
+        aff_identifier = _AFFILIATION_IDENTIFIER_PATH.find(aff)
         if aff_identifier is None:
             raise ValueError("Affiliation without identifier in candidate list!")
         aff_identifier_id = _get_mandatory_attrib(aff_identifier, "Id")
-        name = _get_mandatory_text(aff_identifier.find("./eml:RegisteredName", namespaces=NS))
+        name = _get_mandatory_text(_REGISTERED_NAME_PATH.find(aff_identifier))
         aff_key = _AffiliationIdentifier(aff_identifier_id, name)
 
-        for cand in aff.findall("./eml:Candidate", namespaces=NS):
-            cand_id = _get_mandatory_attrib(cand.find("./eml:CandidateIdentifier", namespaces=NS), "Id")
-            cand_initials = _get_mandatory_text(cand.find(".//xnl:NameLine[@NameType = 'Initials']", namespaces=NS))
-            cand_prefix = _get_text(cand.find(".//xnl:NamePrefix", namespaces=NS))
-            cand_lastname = _get_mandatory_text(cand.find(".//xnl:LastName", namespaces=NS))
+        for cand in _CANDIDATE_PATH.findall(aff):
+            cand_id = _get_mandatory_attrib(_CANDIDATE_IDENTIFIER_PATH.find(cand), "Id")
+            cand_initials = _get_mandatory_text(_INITIALS_PATH.find(cand))
+            cand_prefix = _get_text(_NAME_PREFIX_PATH.find(cand))
+            cand_lastname = _get_mandatory_text(_LAST_NAME_PATH.find(cand))
 
             cand_name = (f"{cand_prefix} " if cand_prefix is not None else "") + cand_lastname + f", {cand_initials}"
 
             candidate_info[aff_key].append(_CandidateIdentifier(id=cand_id, name=cand_name))
     return candidate_info
-
-
-def _get_votecount_matrix(counts_eml: XmlElement):
-    votes: defaultdict = defaultdict(list)
-    _votecount_matrix(counts_eml, votes, reporting_units=False)
-    _votecount_matrix(counts_eml, votes, reporting_units=True)
-    return votes
-
-
-def _votecount_matrix(
-    counts_eml: XmlElement,
-    votes,
-    *,
-    reporting_units: bool,
-):
-    affid_cur = None
-    candid_cur = None
-
-    for selection in counts_eml.findall(
-        f".//eml:{'TotalVotes' if not reporting_units else 'ReportingUnitVotes'}/eml:Selection",
-        namespaces=NS,
-    ):
-        affid = selection.find("./eml:AffiliationIdentifier", namespaces=NS)
-        if affid is not None:
-            affid_cur = _get_mandatory_attrib(affid, "Id")
-            candid_cur = None
-        else:
-            candid_cur = _get_mandatory_attrib(selection.find(".//eml:CandidateIdentifier", namespaces=NS), "Id")
-        votes[(affid_cur, candid_cur)].append(_get_mandatory_text(selection.find("./eml:ValidVotes", namespaces=NS)))
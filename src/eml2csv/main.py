@@ -1,8 +1,55 @@
+import contextlib
+import json
+import sys
+import time
+import zipfile
+from enum import Enum
+from pathlib import Path
 from typing import Annotated
 
 import typer
 
-from eml2csv import eml2csv
+from eml2csv.aggregation import aggregate
+from eml2csv.batch import ConversionJob, ConversionResult, convert_many
+from eml2csv.cli import convert_file
+from eml2csv.comparison import CountsDiff, diff
+from eml2csv.index import EmlIndex, EmlPair, pair_files, probe_archive
+from eml2csv.instrument import DISABLED, Profiler
+from eml2csv.lib import InvalidInputError
+from eml2csv.manifest import MANIFEST_FILE_NAME, Manifest
+from eml2csv.server import ConversionServer
+from eml2csv.util import set_xml_backend
+from eml2csv.validation import ValidationReport, validate_many
+from eml2csv.watch import Watcher, WatchResult
+
+
+class XmlBackendName(str, Enum):
+    auto = "auto"
+    lxml = "lxml"
+    defusedxml = "defusedxml"
+
+
+class Layout(str, Enum):
+    wide = "wide"
+    long = "long"
+
+
+class ProfileFormat(str, Enum):
+    text = "text"
+    json = "json"
+
+
+class ReportFormat(str, Enum):
+    text = "text"
+    json = "json"
+
+
+app = typer.Typer(help="Commands for converting many EML files at once")
+
+
+@app.callback()
+def commands():
+    pass
 
 
 def main(
@@ -18,15 +65,498 @@ def main(
         str | None,
         typer.Option(
             help="""CSV file to write to. NOTE: if the file already exists then it will be overwritten!\n
-            If left blank, filename will be automatically generated and written to the current working directory"""
+            If left blank, filename will be automatically generated and written to the current working directory.\n
+            Use - to write to standard output"""
+        ),
+    ] = None,
+    layout: Annotated[
+        Layout,
+        typer.Option(
+            help="wide writes osv4-3 with a column per reporting unit, long writes a line per reporting unit and "
+            "count while the counts file is read, which keeps memory use low for large files"
+        ),
+    ] = Layout.wide,
+    profile: Annotated[
+        ProfileFormat | None,
+        typer.Option(help="Print the duration, peak memory and size of every stage of the conversion"),
+    ] = None,
+    profile_output: Annotated[
+        Path | None,
+        typer.Option(help="File to save the profile to instead of printing it"),
+    ] = None,
+    xml_backend: Annotated[
+        XmlBackendName,
+        typer.Option(help="XML parser to read the EML files with, auto uses lxml when it is installed"),
+    ] = XmlBackendName.auto,
+    force: Annotated[  # noqa: FBT002 typer options are function arguments
+        bool,
+        typer.Option(help="Convert again even if the csv file is up to date with the EML files"),
+    ] = False,
+    parse_workers: Annotated[
+        int,
+        typer.Option(
+            min=1,
+            help="Number of processes to parse the reporting units of the counts file in, which speeds up very "
+            "large files on machines with more cores. The csv file is the same",
+        ),
+    ] = 1,
+):
+    _use_xml_backend(xml_backend)
+    profiler = Profiler(trace_memory=True) if profile is not None or profile_output is not None else DISABLED
+    with profiler:
+        output_csv_path, up_to_date = convert_file(
+            counts_eml,
+            candidates_eml,
+            output,
+            force=force,
+            layout=layout.value,
+            profiler=profiler,
+            parse_workers=parse_workers,
+        )
+    if up_to_date:
+        typer.echo(f"{output_csv_path} is up to date, use --force to convert again", err=True)
+        return
+
+    if not profiler.enabled:
+        return
+    report = profiler.format_report() if profile == ProfileFormat.text else json.dumps(profiler.report(), indent=2)
+    if profile_output is not None:
+        profile_output.write_text(report, encoding="utf-8")
+    else:
+        typer.echo(report, err=True)
+
+
+@app.command(name="batch")
+def batch(
+    directory: Annotated[
+        Path,
+        typer.Argument(
+            help="Directory or zip archive containing the counts EML files (EML-510b) to generate csv files for, "
+            "other files are skipped. Files may be gzip-compressed (.xml.gz)"
+        ),
+    ],
+    candidates_eml: Annotated[
+        Path | None,
+        typer.Option(
+            "--candidates",
+            help="Path to the candidates EML file which corresponds to all counts EML files. "
+            "If left blank, every counts file is paired with the matching candidates file (EML-230b) in the directory "
+            "or archive",
         ),
     ] = None,
+    output_dir: Annotated[
+        Path,
+        typer.Option(help="Directory to write the csv files to, files that already exist will be overwritten!"),
+    ] = Path(),
+    output_zip: Annotated[
+        Path | None,
+        typer.Option(help="Zip archive to write the csv files to instead of --output-dir"),
+    ] = None,
+    output_sqlite: Annotated[
+        Path | None,
+        typer.Option(
+            help="SQLite database to load the counts into instead of writing csv files, "
+            "counts that are already in the database are replaced"
+        ),
+    ] = None,
+    workers: Annotated[
+        int | None,
+        typer.Option(help="Number of worker processes, defaults to the number of CPUs"),
+    ] = None,
+    cache_dir: Annotated[
+        Path | None,
+        typer.Option(help="Directory to cache parsed EML files in, so unchanged files are not parsed again"),
+    ] = None,
+    xml_backend: Annotated[
+        XmlBackendName,
+        typer.Option(help="XML parser to read the EML files with, auto uses lxml when it is installed"),
+    ] = XmlBackendName.auto,
+    force: Annotated[  # noqa: FBT002 typer options are function arguments
+        bool,
+        typer.Option(help="Convert again even if the csv file is up to date with the EML files"),
+    ] = False,
 ):
-    eml2csv(counts_eml, candidates_eml, output)
+    _use_xml_backend(xml_backend)
+    if output_zip is not None and output_sqlite is not None:
+        raise typer.BadParameter("--output-zip and --output-sqlite cannot be used together")
+    pairs = _find_pairs(directory, candidates_eml)
+    unpaired = [pair.counts_eml_path for pair in pairs if pair.candidates_eml_path is None]
+    for counts_eml_path in unpaired:
+        typer.echo(f"{counts_eml_path} FAILED: no matching candidates file (230b) found", err=True)
+
+    writes_csv_files = output_zip is None and output_sqlite is None
+    jobs = [
+        ConversionJob(pair.counts_eml_path, pair.candidates_eml_path, str(output_dir) if writes_csv_files else None)
+        for pair in pairs
+        if pair.candidates_eml_path is not None
+    ]
+    manifest = None
+    if writes_csv_files:
+        output_dir.mkdir(parents=True, exist_ok=True)
+        # The archive and database are written anew every time, so only outputs written to a directory can be up to date
+        manifest = Manifest.load(str(output_dir / MANIFEST_FILE_NAME))
+        if force:
+            for job in jobs:
+                manifest.forget(job.counts_eml_path)
+
+    report = convert_many(
+        jobs,
+        workers=workers,
+        on_progress=_print_result,
+        cache_dir=str(cache_dir) if cache_dir is not None else None,
+        output_zip=str(output_zip) if output_zip is not None else None,
+        manifest=manifest,
+        output_sqlite=str(output_sqlite) if output_sqlite is not None else None,
+    )
+    if manifest is not None:
+        with contextlib.suppress(OSError):
+            manifest.save()
+
+    up_to_date = f", {len(report.skipped)} were up to date" if report.skipped else ""
+    typer.echo(
+        f"Converted {len(report.succeeded) - len(report.skipped)} of {len(report.results)} files{up_to_date} "
+        f"in {report.duration:.2f}s ({report.files_per_second:.1f} files/s, {report.megabytes_per_second:.1f} MB/s)"
+    )
+    if report.failed or unpaired:
+        raise typer.Exit(code=1)
+
+
+@app.command(name="aggregate")
+def aggregate_command(
+    directory: Annotated[
+        Path,
+        typer.Argument(
+            help="Directory or zip archive containing the counts EML files (EML-510b) of one election to add up, "
+            "one per authority"
+        ),
+    ],
+    candidates_eml: Annotated[
+        list[Path] | None,
+        typer.Option(
+            "--candidates",
+            help="Candidates EML file (EML-230b) to take the names from, can be given once per contest. "
+            "If left blank, the candidates files in the directory or archive are used",
+        ),
+    ] = None,
+    output: Annotated[
+        str | None,
+        typer.Option(
+            help="CSV file to write to, files that already exist will be overwritten! "
+            "If left blank, filename will be automatically generated and written to the current working directory"
+        ),
+    ] = None,
+    workers: Annotated[
+        int | None,
+        typer.Option(help="Number of worker processes, defaults to the number of CPUs"),
+    ] = None,
+    xml_backend: Annotated[
+        XmlBackendName,
+        typer.Option(help="XML parser to read the EML files with, auto uses lxml when it is installed"),
+    ] = XmlBackendName.auto,
+):
+    """Add up the counts files of many authorities into one csv file with a column per authority."""
+    _use_xml_backend(xml_backend)
+    counts_eml_paths, candidates_eml_paths = _find_files(directory)
+    if candidates_eml:
+        candidates_eml_paths = [str(path) for path in candidates_eml]
+
+    start = time.perf_counter()
+    try:
+        output_csv_path = aggregate(counts_eml_paths, candidates_eml_paths, output, workers=workers)
+    except InvalidInputError as e:
+        typer.echo(f"FAILED: {e}", err=True)
+        raise typer.Exit(code=1) from e
+    typer.echo(
+        f"Added up {len(counts_eml_paths)} counts files into {output_csv_path} in {time.perf_counter() - start:.2f}s"
+    )
+
+
+@app.command(name="diff")
+def diff_command(
+    old_counts_eml: Annotated[
+        str,
+        typer.Argument(help="Path to the earlier counts EML file (EML-510b)"),
+    ],
+    new_counts_eml: Annotated[
+        str,
+        typer.Argument(help="Path to the later counts EML file of the same election and authority (EML-510b)"),
+    ],
+    output_format: Annotated[
+        ReportFormat,
+        typer.Option("--format", help="text prints a line per changed count, json prints all of them at once"),
+    ] = ReportFormat.text,
+    xml_backend: Annotated[
+        XmlBackendName,
+        typer.Option(help="XML parser to read the EML files with, auto uses lxml when it is installed"),
+    ] = XmlBackendName.auto,
+):
+    """Print the counts that changed between two versions of a counts file, exits with 1 if any did."""
+    _use_xml_backend(xml_backend)
+    try:
+        counts_diff = diff(old_counts_eml, new_counts_eml)
+    except InvalidInputError as e:
+        typer.echo(f"FAILED: {e}", err=True)
+        raise typer.Exit(code=2) from e
+
+    if output_format == ReportFormat.json:
+        typer.echo(json.dumps(counts_diff.to_dict(), indent=2))
+    else:
+        _print_diff(counts_diff)
+    if not counts_diff.identical:
+        raise typer.Exit(code=1)
+
+
+@app.command(name="serve")
+def serve_command(
+    host: Annotated[
+        str,
+        typer.Option(help="Address to listen on, use 0.0.0.0 to accept connections from other machines"),
+    ] = "127.0.0.1",
+    port: Annotated[
+        int,
+        typer.Option(help="Port to listen on"),
+    ] = 8000,
+    workers: Annotated[
+        int | None,
+        typer.Option(help="Number of worker processes, defaults to the number of CPUs"),
+    ] = None,
+    max_pending: Annotated[
+        int | None,
+        typer.Option(
+            help="Conversions that may run or wait at once, more are refused with 503. Defaults to 2 per worker"
+        ),
+    ] = None,
+    root: Annotated[
+        Path | None,
+        typer.Option(
+            help="Directory the paths in JSON requests are relative to. If left blank, only uploads are accepted"
+        ),
+    ] = None,
+    candidates_eml: Annotated[
+        list[Path] | None,
+        typer.Option("--candidates", help="Candidates EML file (EML-230b) to parse in every worker on start"),
+    ] = None,
+    cache_dir: Annotated[
+        Path | None,
+        typer.Option(help="Directory to cache parsed EML files in, so unchanged files are not parsed again"),
+    ] = None,
+    xml_backend: Annotated[
+        XmlBackendName,
+        typer.Option(help="XML parser to read the EML files with, auto uses lxml when it is installed"),
+    ] = XmlBackendName.auto,
+):
+    """Convert files sent over HTTP: POST them to /convert, see /metrics for the latency and throughput."""
+    _use_xml_backend(xml_backend)
+    with ConversionServer(
+        (host, port),
+        workers=workers,
+        max_pending=max_pending,
+        root=str(root) if root is not None else None,
+        candidates_eml_paths=[str(path) for path in candidates_eml or []],
+        cache_dir=str(cache_dir) if cache_dir is not None else None,
+    ) as server:
+        typer.echo(f"Serving on {server.url}, press Ctrl+C to stop", err=True)
+        with contextlib.suppress(KeyboardInterrupt):
+            server.serve_forever()
+
+
+@app.command(name="validate")
+def validate_command(
+    paths: Annotated[
+        list[Path],
+        typer.Argument(
+            help="Counts EML files (EML-510b) to check, or directories and zip archives to check all counts files in"
+        ),
+    ],
+    output_format: Annotated[
+        ReportFormat,
+        typer.Option("--format", help="text prints every violation, json prints a report per counts file"),
+    ] = ReportFormat.text,
+    workers: Annotated[
+        int | None,
+        typer.Option(help="Number of worker processes, defaults to the number of CPUs"),
+    ] = None,
+    xml_backend: Annotated[
+        XmlBackendName,
+        typer.Option(help="XML parser to read the EML files with, auto uses lxml when it is installed"),
+    ] = XmlBackendName.auto,
+):
+    """Check that the votes and counters of counts files add up, for the totals and every reporting unit."""
+    _use_xml_backend(xml_backend)
+    counts_eml_paths = [
+        counts_eml_path
+        for path in paths
+        for counts_eml_path in (_find_files(path)[0] if path.is_dir() or zipfile.is_zipfile(path) else [str(path)])
+    ]
+
+    start = time.perf_counter()
+    reports = validate_many(
+        counts_eml_paths, workers=workers, on_progress=_print_report if output_format == ReportFormat.text else None
+    )
+    failed = [report for report in reports if not report.ok]
+    if output_format == ReportFormat.json:
+        typer.echo(json.dumps([report.to_dict() for report in reports], indent=2))
+    else:
+        typer.echo(
+            f"Validated {len(reports)} counts files in {time.perf_counter() - start:.2f}s, {len(failed)} did not add up"
+        )
+    if failed:
+        raise typer.Exit(code=1)
+
+
+@app.command(name="watch")
+def watch(
+    directory: Annotated[
+        Path,
+        typer.Argument(help="Directory to watch for new or changed counts EML files (EML-510b)"),
+    ],
+    output_dir: Annotated[
+        Path,
+        typer.Argument(help="Directory to write the csv files to, files that already exist will be overwritten!"),
+    ],
+    candidates_eml: Annotated[
+        Path | None,
+        typer.Option(
+            "--candidates",
+            help="Path to the candidates EML file which corresponds to all counts EML files. "
+            "If left blank, every counts file is paired with the matching candidates file (EML-230b) in the directory",
+        ),
+    ] = None,
+    interval: Annotated[
+        float,
+        typer.Option(help="Seconds between checks of the directory"),
+    ] = 1.0,
+    settle: Annotated[
+        float,
+        typer.Option(help="Seconds a file has to remain unchanged before it is considered completely written"),
+    ] = 1.0,
+    cache_dir: Annotated[
+        Path | None,
+        typer.Option(help="Directory to cache parsed EML files in, so unchanged files are not parsed again"),
+    ] = None,
+    xml_backend: Annotated[
+        XmlBackendName,
+        typer.Option(help="XML parser to read the EML files with, auto uses lxml when it is installed"),
+    ] = XmlBackendName.auto,
+    force: Annotated[  # noqa: FBT002 typer options are function arguments
+        bool,
+        typer.Option(help="Convert again even if the csv file is up to date with the EML files"),
+    ] = False,
+):
+    """Convert counts files as soon as they arrive in a directory, until interrupted."""
+    _use_xml_backend(xml_backend)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    manifest = Manifest.load(str(output_dir / MANIFEST_FILE_NAME))
+    if force:
+        manifest.entries.clear()
+    watcher = Watcher(
+        str(directory),
+        str(output_dir),
+        candidates_eml_path=str(candidates_eml) if candidates_eml is not None else None,
+        settle=settle,
+        cache_dir=str(cache_dir) if cache_dir is not None else None,
+        manifest=manifest,
+    )
+    typer.echo(f"Watching {directory} for counts files, press Ctrl+C to stop", err=True)
+    with contextlib.suppress(KeyboardInterrupt):
+        watcher.run(_print_watch_result, interval=interval)
+
+
+def _print_watch_result(watch_result: WatchResult):
+    result = watch_result.result
+    if result.ok and not result.skipped:
+        typer.echo(
+            f"{result.job.counts_eml_path} -> {result.output_csv_path} "
+            f"({result.duration:.2f}s, written {watch_result.latency:.2f}s after arrival)"
+        )
+    else:
+        _print_result(result)
+
+
+def _print_diff(counts_diff: CountsDiff):
+    for unit_id in counts_diff.added_reporting_units:
+        typer.echo(f"{unit_id}: added")
+    for unit_id in counts_diff.removed_reporting_units:
+        typer.echo(f"{unit_id}: removed")
+    for change in counts_diff.changes:
+        old = change.old if change.old is not None else "-"
+        new = change.new if change.new is not None else "-"
+        typer.echo(f"{change.reporting_unit_id}: {change.subject} {old} -> {new}")
+    typer.echo(
+        f"{len(counts_diff.changes)} counts changed, {counts_diff.unchanged_reporting_units} reporting units "
+        f"were unchanged ({counts_diff.duration:.2f}s)",
+        err=True,
+    )
+
+
+def _print_report(report: ValidationReport):
+    if report.error is not None:
+        typer.echo(f"{report.counts_eml_path} FAILED: {report.error}", err=True)
+        return
+    typer.echo(f"{report.counts_eml_path}: {len(report.violations)} violations ({report.duration:.2f}s)")
+    for violation in report.violations:
+        typer.echo(
+            f"  {violation.reporting_unit_id}: {violation.check} {violation.subject} is {violation.actual}, "
+            f"expected {violation.expected}"
+        )
+
+
+def _find_files(directory: Path) -> tuple[list[str], list[str]]:
+    # The counts and candidates files in the directory or archive
+    if directory.is_file():
+        files = probe_archive(str(directory))
+        return (
+            [path for path, probe in files.items() if probe.eml_id == "510b"],
+            [path for path, probe in files.items() if probe.eml_id == "230b"],
+        )
+    index = EmlIndex.load(str(directory))
+    index.scan()
+    with contextlib.suppress(OSError):
+        index.save()
+    return index.files("510b"), index.files("230b")
+
+
+def _find_pairs(directory: Path, candidates_eml: Path | None) -> list[EmlPair]:
+    if directory.is_file():
+        # Archives are probed without extracting them
+        files = probe_archive(str(directory))
+        counts_eml_paths = [path for path, probe in files.items() if probe.eml_id == "510b"]
+        if candidates_eml is None:
+            return pair_files(files)
+    else:
+        index = EmlIndex.load(str(directory))
+        index.scan()
+        with contextlib.suppress(OSError):
+            index.save()
+        counts_eml_paths = index.files("510b")
+        if candidates_eml is None:
+            return index.pairs()
+
+    return [EmlPair(counts_eml_path, str(candidates_eml)) for counts_eml_path in counts_eml_paths]
+
+
+def _use_xml_backend(xml_backend: XmlBackendName):
+    try:
+        set_xml_backend(xml_backend.value)
+    except ImportError as e:
+        raise typer.BadParameter(str(e), param_hint="--xml-backend") from e
+
+
+def _print_result(result: ConversionResult):
+    if result.skipped:
+        typer.echo(f"{result.job.counts_eml_path} -> {result.output_csv_path} (up to date)")
+    elif result.ok:
+        typer.echo(f"{result.job.counts_eml_path} -> {result.output_csv_path} ({result.duration:.2f}s)")
+    else:
+        typer.echo(f"{result.job.counts_eml_path} FAILED: {result.error}", err=True)
 
 
 def start() -> None:
-    typer.run(main)
+    # The plain (drag and drop) invocation has no command name, the other commands do
+    if len(sys.argv) > 1 and sys.argv[1] in {command.name for command in app.registered_commands}:
+        app()
+    else:
+        typer.run(main)
 
 
 if __name__ == "__main__":
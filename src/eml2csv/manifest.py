@@ -0,0 +1,176 @@
+# SPDX-FileCopyrightText: 2025-present Chris Mostert <15890652+chrismostert@users.noreply.github.com>
+#
+# SPDX-License-Identifier: EUPL-1.2
+import json
+import os
+import tempfile
+from dataclasses import asdict, dataclass
+
+from eml2csv.__about__ import __version__
+from eml2csv.util import file_digest, split_archive_path
+
+MANIFEST_FILE_NAME = ".eml2csv-manifest.json"
+# Bump whenever the manifest entries change, so older manifests are ignored
+MANIFEST_VERSION = 1
+
+
+@dataclass(frozen=True)
+class FileDigest:
+    # Modification time and size of a file, or CRC-32 and size of a file inside a zip archive
+    signature: tuple[int, int]
+    sha256: str
+
+
+@dataclass(frozen=True)
+class ManifestEntry:
+    candidates_eml_path: str
+    # Output path the conversion was asked for, which may be a directory or None
+    requested_output_path: str | None
+    output_csv_path: str
+    counts_sha256: str
+    candidates_sha256: str
+    output_sha256: str
+    version: str
+
+
+class Manifest:
+    """Record of the csv files that were written and the contents of the EML files they were converted from.
+
+    Like make, a conversion only has to be run again if one of its input files, the
+    output file or the version of eml2csv changed. Files are only hashed again if
+    their modification time or size changed since they were last hashed.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        # Keyed by the absolute path of the counts file
+        self.entries: dict[str, ManifestEntry] = {}
+        self.files: dict[str, FileDigest] = {}
+        # Files whose digest has been checked against their contents since loading
+        self._checked: set[str] = set()
+
+    @classmethod
+    def load(cls, path: str) -> "Manifest":
+        manifest = cls(path)
+        try:
+            with open(path, encoding="utf-8") as file:
+                stored = json.load(file)
+        except (OSError, ValueError):
+            return manifest
+
+        if stored.get("version") == MANIFEST_VERSION:
+            manifest.entries = {key: ManifestEntry(**entry) for key, entry in stored["entries"].items()}
+            manifest.files = {
+                key: FileDigest(tuple(file["signature"]), file["sha256"]) for key, file in stored["files"].items()
+            }
+        return manifest
+
+    def save(self):
+        # Only keep the digests of files that are still referred to
+        referred = {
+            path
+            for key, entry in self.entries.items()
+            for path in [key, entry.candidates_eml_path, entry.output_csv_path]
+        }
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as file:
+            json.dump(
+                {
+                    "version": MANIFEST_VERSION,
+                    "entries": {key: asdict(entry) for key, entry in self.entries.items()},
+                    "files": {key: asdict(file) for key, file in self.files.items() if key in referred},
+                },
+                file,
+            )
+        os.replace(tmp_path, self.path)
+
+    def fresh_output(
+        self, counts_eml_path: str, candidates_eml_path: str, requested_output_path: str | None
+    ) -> str | None:
+        """Return the path of the csv file converted earlier from the same input files, if it is still up to date.
+
+        The input files are hashed even if there is no earlier conversion, so that the
+        hashes recorded after converting are those of the files before they were converted.
+
+        Args:
+            counts_eml_path: Path to the counts EML file (510b).
+            candidates_eml_path: Path to the candidates EML file (230b).
+            requested_output_path: Path or directory the csv file is to be written to.
+
+        Returns:
+            Path of the up to date csv file, or None if the files have to be converted (again).
+        """
+        try:
+            counts_sha256 = self._digest(counts_eml_path)
+            candidates_sha256 = self._digest(candidates_eml_path)
+        except (OSError, KeyError):
+            return None
+
+        entry = self.entries.get(os.path.abspath(counts_eml_path))
+        if (
+            entry is None
+            or entry.version != __version__
+            or entry.candidates_eml_path != os.path.abspath(candidates_eml_path)
+            or entry.requested_output_path != _abspath(requested_output_path)
+            or entry.counts_sha256 != counts_sha256
+            or entry.candidates_sha256 != candidates_sha256
+        ):
+            return None
+
+        try:
+            if self._digest(entry.output_csv_path) != entry.output_sha256:
+                return None
+        except OSError:
+            return None
+        return entry.output_csv_path
+
+    def record(
+        self, counts_eml_path: str, candidates_eml_path: str, requested_output_path: str | None, output_csv_path: str
+    ):
+        """Record a successful conversion, using the hashes of the input files taken before it was converted."""
+        self.entries[os.path.abspath(counts_eml_path)] = ManifestEntry(
+            candidates_eml_path=os.path.abspath(candidates_eml_path),
+            requested_output_path=_abspath(requested_output_path),
+            output_csv_path=os.path.abspath(output_csv_path),
+            counts_sha256=self._checked_digest(counts_eml_path),
+            candidates_sha256=self._checked_digest(candidates_eml_path),
+            output_sha256=self._digest(output_csv_path, rehash=True),
+            version=__version__,
+        )
+
+    def forget(self, counts_eml_path: str):
+        self.entries.pop(os.path.abspath(counts_eml_path), None)
+
+    def _checked_digest(self, path: str) -> str:
+        # A file that changed while it was being converted keeps the digest of what was converted,
+        # its signature no longer matches so the next run hashes it again and finds it stale
+        path = os.path.abspath(path)
+        return self.files[path].sha256 if path in self._checked else self._digest(path)
+
+    def _digest(self, path: str, *, rehash: bool = False) -> str:
+        path = os.path.abspath(path)
+        signature = _signature(path)
+        known = self.files.get(path)
+        if rehash or known is None or known.signature != signature:
+            known = self.files[path] = FileDigest(signature, file_digest(path))
+        self._checked.add(path)
+        return known.sha256
+
+
+def _signature(path: str) -> tuple[int, int]:
+    member = split_archive_path(path)
+    if member is not None:
+        import zipfile  # noqa: PLC0415 only needed for files inside archives
+
+        with zipfile.ZipFile(member[0]) as archive:
+            info = archive.getinfo(member[1])
+        return info.CRC, info.file_size
+
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _abspath(path: str | None) -> str | None:
+    return os.path.abspath(path) if path is not None else None
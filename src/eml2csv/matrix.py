@@ -0,0 +1,57 @@
+# SPDX-FileCopyrightText: 2025-present Chris Mostert <15890652+chrismostert@users.noreply.github.com>
+#
+# SPDX-License-Identifier: EUPL-1.2
+from array import array
+from collections.abc import Iterable
+from operator import sub
+
+# (affiliation id, candidate id), the candidate id is None for the affiliation total
+VoteKey = tuple[str | None, str | None]
+
+
+class VoteMatrix:
+    """Vote counts as integer arrays, one row per affiliation or candidate and one column per count.
+
+    Rows are added in the order their key is first set. By convention the
+    first column holds the totals and every following column one reporting unit.
+    """
+
+    def __init__(self) -> None:
+        self.row_index: dict[VoteKey, int] = {}
+        self.rows: list[array[int]] = []
+        self.n_columns = 0
+
+    def add_column(self) -> int:
+        """Append a column of zeros and return its index."""
+        for row in self.rows:
+            row.append(0)
+        self.n_columns += 1
+        return self.n_columns - 1
+
+    def set(self, key: VoteKey, column: int, votes: int):
+        idx = self.row_index.get(key)
+        if idx is None:
+            idx = self.row_index[key] = len(self.rows)
+            self.rows.append(array("q", bytes(8 * self.n_columns)))
+        self.rows[idx][column] = votes
+
+    def row(self, key: VoteKey) -> "array[int] | None":
+        idx = self.row_index.get(key)
+        return self.rows[idx] if idx is not None else None
+
+    def row_indexes(self, keys: Iterable[VoteKey]) -> list[int | None]:
+        """Look up the row index of every key at once, None for keys without votes."""
+        return [self.row_index.get(key) for key in keys]
+
+    def formatted_row(self, idx: int | None) -> list[str]:
+        return [str(votes) for votes in self.rows[idx]] if idx is not None else []
+
+
+def add_rows(*rows: "array[int]") -> "array[int]":
+    """Element-wise sum of equally long rows."""
+    return array("q", map(sum, zip(*rows, strict=True)))
+
+
+def subtract_rows(row: "array[int]", other: "array[int]") -> "array[int]":
+    """Element-wise difference of two equally long rows."""
+    return array("q", map(sub, row, other))
@@ -0,0 +1,76 @@
+# SPDX-FileCopyrightText: 2025-present Chris Mostert <15890652+chrismostert@users.noreply.github.com>
+#
+# SPDX-License-Identifier: EUPL-1.2
+from dataclasses import dataclass
+from typing import IO
+
+from eml2csv.util import _get_attrib, _get_text, _tag, iterparse_xml, open_eml
+
+_EML_TAG = _tag("eml", "EML")
+_ELECTION_IDENTIFIER_TAG = _tag("eml", "ElectionIdentifier")
+_CONTEST_IDENTIFIER_TAG = _tag("eml", "ContestIdentifier")
+_AUTHORITY_IDENTIFIER_TAG = _tag("eml", "AuthorityIdentifier")
+# Elements that only occur after the header, reaching one of them means there is nothing left to probe
+_BODY_TAGS = frozenset(_tag("eml", name) for name in ["Affiliation", "TotalVotes", "ReportingUnitVotes", "Selection"])
+
+
+@dataclass(frozen=True)
+class EmlProbe:
+    # Only set if the root element is an EML element
+    eml_id: str | None = None
+    election_id: str | None = None
+    contest_id: str | None = None
+    authority_id: str | None = None
+    authority_name: str | None = None
+
+
+def probe_eml(file_name: str | IO[bytes]) -> EmlProbe:
+    """Read the identifying header of an EML file without parsing the rest of it.
+
+    Parsing stops as soon as the first ContestIdentifier (or the start of the
+    file's body) is reached, which is within the first few kilobytes of an EML file.
+    Streams are rewound to where they were, so they can be parsed in full afterwards.
+
+    Args:
+        file_name: Path to the EML file to probe, see open_eml, or a seekable binary stream of it.
+            Streams that cannot be rewound, like standard input, can be made seekable with util.seekable.
+
+    Returns:
+        The EML id and the election, contest and authority identifiers of the file.
+    """
+    if isinstance(file_name, str):
+        with open_eml(file_name) as file:
+            return _probe(file)
+    if not file_name.seekable():
+        raise ValueError(f"{file_name} cannot be rewound after probing, read it into memory with util.seekable first")
+
+    position = file_name.tell()
+    try:
+        return _probe(file_name)
+    finally:
+        file_name.seek(position)
+
+
+def _probe(file: IO[bytes]) -> EmlProbe:
+    found: dict[str, str | None] = {}
+
+    for event, elem in iterparse_xml(file):
+        if event == "start":
+            if "eml_id" not in found:
+                found["eml_id"] = _get_attrib(elem, "Id") if elem.tag == _EML_TAG else None
+                if found["eml_id"] is None:
+                    break
+            if elem.tag in _BODY_TAGS:
+                break
+            continue
+
+        if elem.tag == _ELECTION_IDENTIFIER_TAG:
+            found.setdefault("election_id", _get_attrib(elem, "Id"))
+        elif elem.tag == _AUTHORITY_IDENTIFIER_TAG and "authority_id" not in found:
+            found["authority_id"] = _get_attrib(elem, "Id")
+            found["authority_name"] = _get_text(elem)
+        elif elem.tag == _CONTEST_IDENTIFIER_TAG:
+            found["contest_id"] = _get_attrib(elem, "Id")
+            break
+
+    return EmlProbe(**found)
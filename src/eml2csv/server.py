@@ -0,0 +1,313 @@
+# SPDX-FileCopyrightText: 2025-present Chris Mostert <15890652+chrismostert@users.noreply.github.com>
+#
+# SPDX-License-Identifier: EUPL-1.2
+"""HTTP service converting EML files on request, see ConversionServer."""
+
+import io
+import json
+import os
+import threading
+import time
+from collections import Counter, deque
+from collections.abc import Iterable
+from concurrent.futures import ProcessPoolExecutor
+from email.message import Message
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+from urllib.parse import parse_qs, urlsplit
+
+from eml2csv.lib import LAYOUTS, InvalidInputError, eml2csv
+from eml2csv.util import get_xml_backend
+from eml2csv.worker import init_worker, process_cache
+
+# Uploads larger than this are refused before they are read
+MAX_BODY_BYTES = 512 * 1024 * 1024
+# Number of latest requests the latency percentiles are computed over
+_LATENCY_WINDOW = 1024
+_CSV_CHUNK_BYTES = 1 << 16
+
+
+class _RequestError(Exception):
+    def __init__(self, status: HTTPStatus, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class _Metrics:
+    """Counters of the requests handled by the server, shared by the request threads."""
+
+    def __init__(self) -> None:
+        self.started = time.monotonic()
+        self.lock = threading.Lock()
+        self.statuses: Counter[int] = Counter()
+        self.in_flight = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.latencies: deque[float] = deque(maxlen=_LATENCY_WINDOW)
+
+    def record(self, status: int, latency: float, bytes_in: int, bytes_out: int):
+        with self.lock:
+            self.statuses[status] += 1
+            self.bytes_in += bytes_in
+            self.bytes_out += bytes_out
+            self.latencies.append(latency)
+
+    def report(self) -> dict[str, Any]:
+        with self.lock:
+            uptime = time.monotonic() - self.started
+            requests = sum(self.statuses.values())
+            latencies = sorted(self.latencies)
+            return {
+                "uptime": uptime,
+                "requests": requests,
+                "requests_per_second": requests / uptime if uptime > 0 else 0.0,
+                "megabytes_in_per_second": self.bytes_in / 1_000_000 / uptime if uptime > 0 else 0.0,
+                "in_flight": self.in_flight,
+                # 503 responses are the conversions refused because the pool was full
+                "statuses": {str(status): count for status, count in sorted(self.statuses.items())},
+                "latency": {
+                    "count": len(latencies),
+                    "mean": sum(latencies) / len(latencies) if latencies else 0.0,
+                    "p50": _percentile(latencies, 0.5),
+                    "p95": _percentile(latencies, 0.95),
+                    "p99": _percentile(latencies, 0.99),
+                    "max": latencies[-1] if latencies else 0.0,
+                },
+            }
+
+
+def _percentile(values: list[float], fraction: float) -> float:
+    return values[min(int(len(values) * fraction), len(values) - 1)] if values else 0.0
+
+
+class ConversionServer(ThreadingHTTPServer):
+    """HTTP server converting counts (510b) and candidates (230b) files to csv (osv4-3) on request.
+
+    Requests are handled in threads, the conversions themselves run in a pool of worker
+    processes that keep the files they parsed in memory, so a candidates file is only parsed
+    once per worker. At most `max_pending` conversions are running or waiting for a worker,
+    more are refused with 503 Service Unavailable so clients can back off and retry.
+
+    Endpoints:
+        POST /convert: the files as multipart/form-data fields `counts` and `candidates`, or as
+            JSON {"counts": path, "candidates": path} with paths relative to `root`. Pass
+            `?layout=long` for the long layout. Responds with the csv file.
+        GET /metrics: request counts, latency and throughput as JSON.
+        GET /health: 200 OK while the server is running.
+    """
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        address: tuple[str, int],
+        workers: int | None = None,
+        max_pending: int | None = None,
+        root: str | None = None,
+        candidates_eml_paths: Iterable[str] = (),
+        cache_dir: str | None = None,
+        *,
+        log_requests: bool = True,
+    ):
+        """Start listening and start the worker processes.
+
+        Args:
+            address: Host and port to listen on, port 0 picks a free port.
+            workers: Number of worker processes. Defaults to the number of CPUs.
+            max_pending: Number of conversions that may run or wait at once. Defaults to twice the workers.
+            root: Directory the paths in JSON requests are relative to. If None, only uploads are accepted.
+            candidates_eml_paths: Candidates files every worker parses on start, so the first requests
+                using them do not wait for it.
+            cache_dir: Directory for an on-disk cache of parsed EML files, shared by all workers and later runs.
+            log_requests: Log every request to stderr.
+        """
+        workers = workers if workers is not None else os.cpu_count() or 1
+        self.root = os.path.realpath(root) if root is not None else None
+        self.log_requests = log_requests
+        self.metrics = _Metrics()
+        self.pending = threading.BoundedSemaphore(max_pending if max_pending is not None else 2 * workers)
+        self.pool = ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_server_worker,
+            initargs=(cache_dir, get_xml_backend().name, list(candidates_eml_paths)),
+        )
+        try:
+            super().__init__(address, _Handler)
+        except BaseException:
+            self.pool.shutdown(cancel_futures=True)
+            raise
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host!s}:{port}"
+
+    def server_close(self):
+        super().server_close()
+        self.pool.shutdown(cancel_futures=True)
+
+    def resolve(self, path: str) -> str:
+        """Resolve a path of a request within the root directory."""
+        if self.root is None:
+            raise _RequestError(HTTPStatus.FORBIDDEN, "Paths are not accepted by this server, upload the files")
+        resolved = os.path.realpath(os.path.join(self.root, path))
+        if os.path.commonpath([self.root, resolved]) != self.root:
+            raise _RequestError(HTTPStatus.FORBIDDEN, f"{path} is outside of the root directory of the server")
+        return resolved
+
+
+def _init_server_worker(cache_dir: str | None, xml_backend: str, candidates_eml_paths: list[str]):
+    init_worker(cache_dir, xml_backend)
+    for candidates_eml_path in candidates_eml_paths:
+        # Conversions read the contest of their counts file, a national candidates file has many
+        for contest_id in process_cache.candidates_index(candidates_eml_path).contests:
+            process_cache.candidates(candidates_eml_path, contest_id)
+
+
+def _convert(counts_eml: str | bytes, candidates_eml: str | bytes, layout: str) -> bytes:
+    # Runs in a worker process, uploaded files are passed as bytes
+    output = io.BytesIO()
+    eml2csv(
+        counts_eml if isinstance(counts_eml, str) else io.BytesIO(counts_eml),
+        candidates_eml if isinstance(candidates_eml, str) else io.BytesIO(candidates_eml),
+        output,
+        cache=process_cache,
+        layout=layout,
+    )
+    return output.getvalue()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: ConversionServer
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self) -> None:
+        path = urlsplit(self.path).path
+        if path == "/metrics":
+            self._respond(
+                HTTPStatus.OK, json.dumps(self.server.metrics.report(), indent=2).encode(), "application/json"
+            )
+        elif path == "/health":
+            self._respond(HTTPStatus.OK, b"OK\n", "text/plain")
+        else:
+            self._respond(HTTPStatus.NOT_FOUND, b"Not found\n", "text/plain")
+
+    def do_POST(self) -> None:
+        start = time.monotonic()
+        metrics = self.server.metrics
+        with metrics.lock:
+            metrics.in_flight += 1
+        bytes_in = 0
+        headers: dict[str, str] = {}
+        try:
+            layout = self._layout()
+            body = self._read_body()
+            bytes_in = len(body)
+            counts_eml, candidates_eml = self._files(body)
+            status, response, content_type = HTTPStatus.OK, self._run(counts_eml, candidates_eml, layout), "text/csv"
+        except _RequestError as e:
+            status, response, content_type = e.status, f"{e}\n".encode(), "text/plain"
+            if status == HTTPStatus.SERVICE_UNAVAILABLE:
+                headers["Retry-After"] = "1"
+        except Exception as e:  # noqa: BLE001 the client gets an answer and the server keeps running
+            self.log_error("Conversion failed: %r", e)
+            status = HTTPStatus.INTERNAL_SERVER_ERROR
+            response, content_type = f"{type(e).__name__}: {e}\n".encode(), "text/plain"
+        finally:
+            with metrics.lock:
+                metrics.in_flight -= 1
+        # Recorded before responding, so a client that asks for the metrics next sees its own request
+        metrics.record(status, time.monotonic() - start, bytes_in, len(response) if status == HTTPStatus.OK else 0)
+        self._respond(status, response, f"{content_type}; charset=utf-8", headers)
+
+    def log_message(self, format: str, *args: Any):  # noqa: A002 name of the overridden argument
+        if self.server.log_requests:
+            super().log_message(format, *args)
+
+    def _layout(self) -> str:
+        url = urlsplit(self.path)
+        if url.path != "/convert":
+            raise _RequestError(HTTPStatus.NOT_FOUND, "Not found")
+        layout = parse_qs(url.query).get("layout", ["wide"])[0]
+        if layout not in LAYOUTS:
+            raise _RequestError(HTTPStatus.BAD_REQUEST, f"Unknown layout {layout}, choose from {', '.join(LAYOUTS)}")
+        return layout
+
+    def _read_body(self) -> bytes:
+        length = self.headers.get("Content-Length")
+        if length is None:
+            raise _RequestError(HTTPStatus.LENGTH_REQUIRED, "Content-Length is required")
+        try:
+            size = int(length)
+        except ValueError:
+            size = -1
+        # The body is not read if it is refused, so the connection cannot be used for another request
+        if size < 0:
+            self.close_connection = True
+            raise _RequestError(HTTPStatus.BAD_REQUEST, "Content-Length must be a non-negative integer")
+        if size > MAX_BODY_BYTES:
+            self.close_connection = True
+            raise _RequestError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, f"Bodies are limited to {MAX_BODY_BYTES} bytes")
+        return self.rfile.read(size)
+
+    def _files(self, body: bytes) -> tuple[str | bytes, str | bytes]:
+        content_type = self.headers.get("Content-Type", "")
+        if content_type.startswith("application/json"):
+            try:
+                request = json.loads(body)
+                return self.server.resolve(request["counts"]), self.server.resolve(request["candidates"])
+            except (ValueError, KeyError, TypeError) as e:
+                raise _RequestError(HTTPStatus.BAD_REQUEST, "Expected a JSON object with counts and candidates") from e
+        if content_type.startswith("multipart/form-data"):
+            fields = _parse_multipart(content_type, body)
+            if "counts" not in fields or "candidates" not in fields:
+                raise _RequestError(HTTPStatus.BAD_REQUEST, "Expected the form fields counts and candidates")
+            return fields["counts"], fields["candidates"]
+        raise _RequestError(HTTPStatus.UNSUPPORTED_MEDIA_TYPE, "Expected multipart/form-data or application/json")
+
+    def _run(self, counts_eml: str | bytes, candidates_eml: str | bytes, layout: str) -> bytes:
+        # Refuse instead of queueing without limit, the request threads would pile up otherwise
+        if not self.server.pending.acquire(blocking=False):
+            raise _RequestError(HTTPStatus.SERVICE_UNAVAILABLE, "All workers are busy, try again later")
+        try:
+            return self.server.pool.submit(_convert, counts_eml, candidates_eml, layout).result()
+        except (InvalidInputError, ValueError, SyntaxError, OSError) as e:
+            # Files that are not EML, do not match or do not exist
+            raise _RequestError(HTTPStatus.UNPROCESSABLE_ENTITY, f"{type(e).__name__}: {e}") from e
+        finally:
+            self.server.pending.release()
+
+    def _respond(self, status: HTTPStatus, body: bytes, content_type: str, headers: dict[str, str] | None = None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        view = memoryview(body)
+        for offset in range(0, len(body), _CSV_CHUNK_BYTES):
+            self.wfile.write(view[offset : offset + _CSV_CHUNK_BYTES])
+
+
+def _parse_multipart(content_type: str, body: bytes) -> dict[str, bytes]:
+    """Split a multipart/form-data body into its fields, without copying the files more than once."""
+    header = Message()
+    header["Content-Type"] = content_type
+    boundary = header.get_param("boundary")
+    if not isinstance(boundary, str):
+        raise _RequestError(HTTPStatus.BAD_REQUEST, "multipart/form-data without boundary")
+
+    fields = {}
+    # The first part is the preamble and the last one the epilogue after the closing boundary
+    for part in body.split(b"--" + boundary.encode())[1:-1]:
+        headers, _, content = part.partition(b"\r\n\r\n")
+        disposition = Message()
+        for line in headers.decode("latin-1").strip().splitlines():
+            header_name, _, value = line.partition(":")
+            disposition[header_name.strip()] = value.strip()
+        name = disposition.get_param("name", header="Content-Disposition")
+        if isinstance(name, str):
+            # The line break before the next boundary belongs to the boundary
+            fields[name] = content.removesuffix(b"\r\n")
+    return fields
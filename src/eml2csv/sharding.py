@@ -0,0 +1,107 @@
+# SPDX-FileCopyrightText: 2025-present Chris Mostert <15890652+chrismostert@users.noreply.github.com>
+#
+# SPDX-License-Identifier: EUPL-1.2
+import io
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from typing import IO, TYPE_CHECKING
+
+from eml2csv.lib import (
+    _VOTES_BLOCK_START_REGEX,
+    InvalidInputError,
+    _CountsEml,
+    _find_blocks,
+    _find_root,
+    _read_counts_eml,
+)
+from eml2csv.probe import probe_eml
+from eml2csv.util import get_xml_backend, open_eml
+from eml2csv.worker import init_worker
+
+if TYPE_CHECKING:
+    from eml2csv.matrix import VoteKey
+
+# Fields of _CountsEml read from the elements around the votes blocks
+_HEADER_FIELDS = ("election_id", "contest_id", "election_name", "election_date", "authority_id", "authority_name")
+
+
+def read_counts_sharded(counts_eml_path: str | IO[bytes], workers: int) -> _CountsEml:
+    """Read a counts EML file (510b) like _read_counts_eml, parsing its votes blocks in a pool of processes.
+
+    The file is split at the boundaries of its TotalVotes and ReportingUnitVotes elements into
+    contiguous shards of about the same size. Every shard is parsed in a worker process as if it
+    were a counts file of its own, and the partial results are joined in the order of the file,
+    so the result is the same as reading the file in a single pass.
+    """
+    with open_eml(counts_eml_path) as counts_eml_file:
+        content = counts_eml_file.read()
+    if probe_eml(io.BytesIO(content)).eml_id != "510b":
+        raise InvalidInputError(f"{counts_eml_path} was not an EML counts file (510b)!")
+    root = _find_root(content)
+    head, tail = content[: root.end()], b"</" + root["name"] + b">"
+    blocks = list(_find_blocks(content, _VOTES_BLOCK_START_REGEX, root.end()))
+    if workers <= 1 or len(blocks) < 2:  # noqa: PLR2004 a single block cannot be split
+        return _read_counts_eml(io.BytesIO(content))
+
+    shards = _split_shards(blocks, workers)
+    with ProcessPoolExecutor(
+        max_workers=len(shards), initializer=init_worker, initargs=(None, get_xml_backend().name)
+    ) as pool:
+        futures = [
+            pool.submit(_read_shard, head + b"".join(content[start:end] for start, end in shard) + tail)
+            for shard in shards
+        ]
+        # The headers are read from the rest of the file while the shards are parsed
+        gaps = [0, *(offset for block in blocks for offset in block), len(content)]
+        skeleton = _read_counts_eml(
+            io.BytesIO(b"".join(content[start:end] for start, end in zip(gaps[::2], gaps[1::2], strict=True)))
+        )
+        return _merge(skeleton, [future.result() for future in futures])
+
+
+def _split_shards(blocks: list[tuple[int, int]], workers: int) -> list[list[tuple[int, int]]]:
+    """Divide the blocks into at most workers runs of consecutive blocks with about the same number of bytes."""
+    remaining = blocks[-1][1] - blocks[0][0]
+    shards: list[list[tuple[int, int]]] = [[]]
+    for block in blocks:
+        shard = shards[-1]
+        # Start the next shard once this one has its share of the bytes that are left
+        if shard and len(shards) < workers and block[0] - shard[0][0] >= remaining / (workers - len(shards) + 1):
+            remaining -= block[0] - shard[0][0]
+            shards.append([])
+        shards[-1].append(block)
+    return shards
+
+
+def _read_shard(shard: bytes) -> _CountsEml:
+    # Runs in a worker process, the first block of the shard becomes its first column
+    return _read_counts_eml(io.BytesIO(shard))
+
+
+def _merge(skeleton: _CountsEml, parts: list[_CountsEml]) -> _CountsEml:
+    """Join the columns of the shards, adding rows and counters in the order a single pass would have."""
+    counts_eml = _CountsEml(**{name: getattr(skeleton, name) for name in _HEADER_FIELDS})
+    for name in _HEADER_FIELDS:
+        # The headers are outside the votes blocks, unless the file is unusual
+        if getattr(counts_eml, name) is None:
+            setattr(counts_eml, name, next((getattr(part, name) for part in parts if getattr(part, name)), None))
+
+    keys: dict[VoteKey, None] = {}
+    for part in parts:
+        counts_eml.reporting_unit_ids.extend(part.reporting_unit_ids)
+        counts_eml.reporting_unit_names.extend(part.reporting_unit_names)
+        for counter, values in part.counters.items():
+            counts_eml.counters[counter].extend(values)
+        keys.update(dict.fromkeys(part.votes.row_index))
+
+    votes = counts_eml.votes
+    zeros = [array("q", bytes(8 * part.votes.n_columns)) for part in parts]
+    for key in keys:
+        row = array("q")
+        for part, part_zeros in zip(parts, zeros, strict=True):
+            part_row = part.votes.row(key)
+            row.extend(part_row if part_row is not None else part_zeros)
+        votes.row_index[key] = len(votes.rows)
+        votes.rows.append(row)
+    votes.n_columns = sum(part.votes.n_columns for part in parts)
+    return counts_eml
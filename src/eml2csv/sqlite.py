@@ -0,0 +1,232 @@
+# SPDX-FileCopyrightText: 2025-present Chris Mostert <15890652+chrismostert@users.noreply.github.com>
+#
+# SPDX-License-Identifier: EUPL-1.2
+import sqlite3
+from collections.abc import Iterator
+from types import TracebackType
+from typing import TYPE_CHECKING
+
+from eml2csv.lib import (
+    _CandidatesEml,
+    _clean_name,
+    _CountsEml,
+    _extract_reporting_unit_id,
+    _extract_zip_from_name,
+)
+from eml2csv.util import _get_mandatory
+
+if TYPE_CHECKING:
+    from typing import Self
+
+# Position 0 of the per reporting unit tables holds the totals of the authority, position 1 the first reporting unit
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS counts (
+    id INTEGER PRIMARY KEY,
+    election_id TEXT NOT NULL,
+    contest_id TEXT NOT NULL,
+    authority_id TEXT NOT NULL,
+    authority_name TEXT NOT NULL,
+    election_name TEXT,
+    election_date TEXT,
+    source TEXT NOT NULL,
+    UNIQUE (election_id, contest_id, authority_id)
+);
+CREATE INDEX IF NOT EXISTS counts_contest ON counts (contest_id);
+CREATE INDEX IF NOT EXISTS counts_authority ON counts (authority_id);
+
+CREATE TABLE IF NOT EXISTS reporting_units (
+    counts_id INTEGER NOT NULL REFERENCES counts (id),
+    position INTEGER NOT NULL,
+    reporting_unit_id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    zip TEXT,
+    PRIMARY KEY (counts_id, position)
+);
+
+CREATE TABLE IF NOT EXISTS counters (
+    counts_id INTEGER NOT NULL REFERENCES counts (id),
+    position INTEGER NOT NULL,
+    tag TEXT NOT NULL,
+    reason_code TEXT,
+    value INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS counters_counts ON counters (counts_id, tag, reason_code);
+
+CREATE TABLE IF NOT EXISTS affiliations (
+    election_id TEXT NOT NULL,
+    contest_id TEXT NOT NULL,
+    affiliation_id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    PRIMARY KEY (election_id, contest_id, affiliation_id)
+);
+
+CREATE TABLE IF NOT EXISTS candidates (
+    election_id TEXT NOT NULL,
+    contest_id TEXT NOT NULL,
+    affiliation_id TEXT NOT NULL,
+    candidate_id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    PRIMARY KEY (election_id, contest_id, affiliation_id, candidate_id)
+);
+
+-- The candidate id is NULL for the votes of the affiliation as a whole
+CREATE TABLE IF NOT EXISTS votes (
+    counts_id INTEGER NOT NULL REFERENCES counts (id),
+    position INTEGER NOT NULL,
+    affiliation_id TEXT,
+    candidate_id TEXT,
+    votes INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS votes_counts ON votes (counts_id, affiliation_id, candidate_id);
+"""
+
+_COUNTS_TABLES = ["reporting_units", "counters", "votes"]
+
+
+class SqliteSink:
+    """Loads parsed EML files into normalised tables of a SQLite database, as an alternative to the csv output.
+
+    Everything added while the sink is open is written in a single transaction, which
+    is committed when the sink is closed (or rolled back if an exception is raised).
+    Adding a counts file for an election, contest and authority that is already in the
+    database replaces it.
+    """
+
+    def __init__(self, database_path: str):
+        self.database_path = database_path
+        self.connection: sqlite3.Connection | None = None
+        # Candidate lists added since opening, which only have to be written once
+        self._contests: set[tuple[str, str]] = set()
+
+    def __enter__(self) -> "Self":
+        # Transactions are managed explicitly instead of by the sqlite3 module
+        self.connection = sqlite3.connect(self.database_path, isolation_level=None)
+        self.connection.executescript(SCHEMA)
+        self.connection.execute("BEGIN")
+        return self
+
+    def __exit__(
+        self, exc_type: type[BaseException] | None, exc: BaseException | None, traceback: TracebackType | None
+    ):
+        connection = self._connection()
+        connection.execute("COMMIT" if exc_type is None else "ROLLBACK")
+        connection.close()
+        self.connection = None
+
+    def add(self, counts_eml: _CountsEml, candidates_eml: _CandidatesEml, source: str):
+        """Add a counts file and its candidates file.
+
+        Args:
+            counts_eml: The parsed counts file (510b).
+            candidates_eml: The parsed candidates file (230b) belonging to the counts file.
+            source: Path of the counts file, stored to trace the rows back to it.
+        """
+        connection = self._connection()
+        # A file that fails to load leaves no rows behind, without rolling back the files added before it
+        connection.execute("SAVEPOINT add_counts")
+        try:
+            self._add(counts_eml, candidates_eml, source)
+        except BaseException:
+            connection.execute("ROLLBACK TO add_counts")
+            raise
+        finally:
+            connection.execute("RELEASE add_counts")
+
+    def _add(self, counts_eml: _CountsEml, candidates_eml: _CandidatesEml, source: str):
+        connection = self._connection()
+        election_id = _get_mandatory(counts_eml.election_id)
+        contest_id = _get_mandatory(counts_eml.contest_id)
+        authority_id = _get_mandatory(counts_eml.authority_id)
+        authority_name = _get_mandatory(counts_eml.authority_name)
+
+        existing = connection.execute(
+            "SELECT id FROM counts WHERE election_id = ? AND contest_id = ? AND authority_id = ?",
+            (election_id, contest_id, authority_id),
+        ).fetchone()
+        if existing is not None:
+            for table in _COUNTS_TABLES:
+                connection.execute(f"DELETE FROM {table} WHERE counts_id = ?", existing)  # noqa: S608
+            connection.execute("DELETE FROM counts WHERE id = ?", existing)
+
+        counts_id = connection.execute(
+            "INSERT INTO counts (election_id, contest_id, authority_id, authority_name, election_name, election_date,"
+            " source) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (
+                election_id,
+                contest_id,
+                authority_id,
+                authority_name,
+                counts_eml.election_name,
+                counts_eml.election_date,
+                source,
+            ),
+        ).lastrowid
+
+        connection.executemany(
+            "INSERT INTO reporting_units (counts_id, position, reporting_unit_id, name, zip) VALUES (?, ?, ?, ?, ?)",
+            (
+                (
+                    counts_id,
+                    column,
+                    _extract_reporting_unit_id(unit_id),
+                    _clean_name(name),
+                    _extract_zip_from_name(name) or None,
+                )
+                for column, (unit_id, name) in enumerate(
+                    zip(counts_eml.reporting_unit_ids, counts_eml.reporting_unit_names, strict=True), start=1
+                )
+            ),
+        )
+        connection.executemany(
+            "INSERT INTO counters (counts_id, position, tag, reason_code, value) VALUES (?, ?, ?, ?, ?)",
+            (
+                (counts_id, column, tag, reason_code, value)
+                for (tag, reason_code), values in counts_eml.counters.items()
+                for column, value in enumerate(values)
+            ),
+        )
+        connection.executemany(
+            "INSERT INTO votes (counts_id, position, affiliation_id, candidate_id, votes) VALUES (?, ?, ?, ?, ?)",
+            _vote_rows(counts_id, counts_eml),
+        )
+
+        if (election_id, contest_id) not in self._contests:
+            self._add_candidates(election_id, contest_id, candidates_eml)
+            self._contests.add((election_id, contest_id))
+
+    def _add_candidates(self, election_id: str, contest_id: str, candidates_eml: _CandidatesEml):
+        connection = self._connection()
+        for table in ["affiliations", "candidates"]:
+            connection.execute(
+                f"DELETE FROM {table} WHERE election_id = ? AND contest_id = ?",  # noqa: S608
+                (election_id, contest_id),
+            )
+        connection.executemany(
+            "INSERT INTO affiliations (election_id, contest_id, affiliation_id, name) VALUES (?, ?, ?, ?)",
+            (
+                (election_id, contest_id, affiliation.id, affiliation.name)
+                for affiliation in candidates_eml.candidate_info
+            ),
+        )
+        connection.executemany(
+            "INSERT INTO candidates (election_id, contest_id, affiliation_id, candidate_id, name) VALUES (?, ?, ?, ?, ?)",
+            (
+                (election_id, contest_id, affiliation.id, candidate.id, candidate.name)
+                for affiliation, candidates in candidates_eml.candidate_info.items()
+                for candidate in candidates
+            ),
+        )
+
+    def _connection(self) -> sqlite3.Connection:
+        if self.connection is None:
+            raise RuntimeError("The sink has to be opened with a with statement first")
+        return self.connection
+
+
+def _vote_rows(
+    counts_id: int | None, counts_eml: _CountsEml
+) -> Iterator[tuple[int | None, int, str | None, str | None, int]]:
+    votes = counts_eml.votes
+    for (affiliation_id, candidate_id), idx in votes.row_index.items():
+        for column, value in enumerate(votes.rows[idx]):
+            yield counts_id, column, affiliation_id, candidate_id, value
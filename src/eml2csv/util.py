@@ -1,10 +1,21 @@
 # SPDX-FileCopyrightText: 2025-present Chris Mostert <15890652+chrismostert@users.noreply.github.com>
 #
 # SPDX-License-Identifier: EUPL-1.2
-from typing import IO
+import hashlib
+import os
+import re
+from abc import ABC, abstractmethod
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from typing import IO, TYPE_CHECKING, Any, cast
 from xml.etree.ElementTree import Element as XmlElement
+from xml.etree.ElementTree import ParseError
 
 from defusedxml import ElementTree
+from defusedxml.common import EntitiesForbidden
+
+if TYPE_CHECKING:
+    import zipfile
 
 NAMESPACE = {
     "eml": "urn:oasis:names:tc:evs:schema:eml",
@@ -15,6 +26,237 @@ NAMESPACE = {
 }
 
 
+# A file inside a zip archive is addressed as path/to/archive.zip/name/in/archive
+_ARCHIVE_MEMBER_REGEX = re.compile(r"^(.+?\.zip)[/\\](.+)$", re.IGNORECASE)
+
+
+def _tag(prefix: str, name: str) -> str:
+    return f"{{{NAMESPACE[prefix]}}}{name}"
+
+
+def split_archive_path(path: str) -> tuple[str, str] | None:
+    """Split the path of a file inside a zip archive into the path of the archive and the name in the archive.
+
+    Args:
+        path: Path to split, for example results.zip/Telling_TK2025_gemeente_Juinen.eml.xml.
+
+    Returns:
+        The archive path and member name, or None if the path does not point into a zip archive.
+    """
+    if os.path.exists(path):
+        return None
+    match = _ARCHIVE_MEMBER_REGEX.match(path)
+    if match is None or not os.path.isfile(match[1]):
+        return None
+    return match[1], match[2].replace("\\", "/")
+
+
+@contextmanager
+def open_eml(file_name: str | IO[bytes]) -> Iterator[IO[bytes]]:
+    """Open an EML file for reading, decompressing it while it is read.
+
+    Args:
+        file_name: Path to an EML file, a gzip-compressed EML file (.gz) or a file inside a zip
+            archive (archive.zip/name.eml.xml). Binary streams are returned as is.
+
+    Returns:
+        Binary stream of the uncompressed EML file.
+    """
+    if not isinstance(file_name, str):
+        yield file_name
+        return
+
+    member = split_archive_path(file_name)
+    if member is None:
+        with open(file_name, "rb") as file, _decompressed(file, file_name) as eml:
+            yield eml
+    else:
+        # Archives and compressed files are rare, so their modules are only imported when needed
+        import zipfile  # noqa: PLC0415
+
+        with zipfile.ZipFile(member[0]) as archive, open_archive_member(archive, member[1]) as eml:
+            yield eml
+
+
+@contextmanager
+def open_archive_member(archive: "zipfile.ZipFile", name: str) -> Iterator[IO[bytes]]:
+    """Open a file inside an open zip archive, decompressing it as well if it is gzip-compressed."""
+    with archive.open(name) as file, _decompressed(file, name) as eml:
+        yield eml
+
+
+@contextmanager
+def _decompressed(file: IO[bytes], name: str) -> Iterator[IO[bytes]]:
+    if name.endswith(".gz"):
+        import gzip  # noqa: PLC0415
+
+        with gzip.GzipFile(fileobj=file, mode="rb") as gzip_file:
+            yield cast("IO[bytes]", gzip_file)
+    else:
+        yield file
+
+
+class XmlBackend(ABC):
+    """XML parser implementation used to read EML files."""
+
+    name: str
+
+    @abstractmethod
+    def parse(self, file_name: str | IO[bytes]) -> XmlElement | None: ...
+
+    @abstractmethod
+    def iterparse(self, file_name: str | IO[bytes], events: tuple[str, ...]) -> Iterator[tuple[str, XmlElement]]: ...
+
+    @abstractmethod
+    def compile_find(self, path: str) -> Callable[[XmlElement], XmlElement | None]:
+        """Compile a path into a function returning the first element it matches."""
+
+    @abstractmethod
+    def compile_findall(self, path: str) -> Callable[[XmlElement], list[XmlElement]]:
+        """Compile a path into a function returning every element it matches."""
+
+
+class _DefusedXmlBackend(XmlBackend):
+    name = "defusedxml"
+
+    def parse(self, file_name: str | IO[bytes]) -> XmlElement | None:
+        return ElementTree.parse(file_name).getroot()
+
+    def iterparse(self, file_name: str | IO[bytes], events: tuple[str, ...]) -> Iterator[tuple[str, XmlElement]]:
+        return ElementTree.iterparse(file_name, events=events)
+
+    def compile_find(self, path: str) -> Callable[[XmlElement], XmlElement | None]:
+        # ElementPath caches the compiled path itself
+        return lambda elem: elem.find(path, NAMESPACE)
+
+    def compile_findall(self, path: str) -> Callable[[XmlElement], list[XmlElement]]:
+        return lambda elem: elem.findall(path, NAMESPACE)
+
+
+class _LxmlBackend(XmlBackend):
+    name = "lxml"
+
+    def __init__(self) -> None:
+        from lxml import etree  # noqa: PLC0415 lxml is optional
+
+        self.etree = etree
+        self.parser_options: dict[str, Any] = {
+            # Never expand entities or fetch anything, which is what defusedxml protects against
+            "resolve_entities": False,
+            "no_network": True,
+            "load_dtd": False,
+            "huge_tree": False,
+        }
+
+    def parse(self, file_name: str | IO[bytes]) -> XmlElement | None:
+        parser = self.etree.XMLParser(**self.parser_options)
+        try:
+            tree = self.etree.parse(file_name, parser)
+        except self.etree.XMLSyntaxError as e:
+            raise _parse_error(e) from e
+        _forbid_entities(tree.docinfo)
+        return cast("XmlElement", tree.getroot())
+
+    def iterparse(self, file_name: str | IO[bytes], events: tuple[str, ...]) -> Iterator[tuple[str, XmlElement]]:
+        try:
+            checked = False
+            for event, elem in self.etree.iterparse(file_name, events=events, **self.parser_options):
+                if not checked:
+                    # The doctype comes before the root element, so it is complete by the first event
+                    _forbid_entities(elem.getroottree().docinfo)
+                    checked = True
+                yield event, elem
+        except self.etree.XMLSyntaxError as e:
+            raise _parse_error(e) from e
+
+    def compile_find(self, path: str) -> Callable[[XmlElement], XmlElement | None]:
+        xpath = cast("Callable[[XmlElement], list[XmlElement]]", self.etree.XPath(f"({path})[1]", namespaces=NAMESPACE))
+        return lambda elem: next(iter(xpath(elem)), None)
+
+    def compile_findall(self, path: str) -> Callable[[XmlElement], list[XmlElement]]:
+        return cast("Callable[[XmlElement], list[XmlElement]]", self.etree.XPath(path, namespaces=NAMESPACE))
+
+
+def _forbid_entities(docinfo: Any):
+    # lxml leaves entity references unexpanded, which silently drops text, so refuse
+    # documents declaring entities like defusedxml does
+    dtd = docinfo.internalDTD
+    for entity in dtd.iterentities() if dtd is not None else ():
+        raise EntitiesForbidden(entity.name, entity.content, docinfo.URL, entity.system_url, None, None)
+
+
+def _parse_error(error: SyntaxError) -> ParseError:
+    # Raise the same exception whichever backend is used
+    parse_error = ParseError(str(error))
+    parse_error.position = getattr(error, "position", (0, 0))
+    return parse_error
+
+
+XML_BACKENDS = ("lxml", "defusedxml")
+_backend: XmlBackend | None = None
+
+
+def set_xml_backend(name: str = "auto") -> XmlBackend:
+    """Select the XML parser used to read EML files.
+
+    Args:
+        name: "lxml", "defusedxml" or "auto" to use lxml when it is installed and defusedxml otherwise.
+
+    Returns:
+        The selected backend.
+    """
+    global _backend  # noqa: PLW0603
+    if name == "auto":
+        try:
+            _backend = _LxmlBackend()
+        except ImportError:
+            _backend = _DefusedXmlBackend()
+    elif name == "lxml":
+        try:
+            _backend = _LxmlBackend()
+        except ImportError as e:
+            raise ImportError("The lxml XML backend requires lxml, install eml2csv[lxml]") from e
+    elif name == "defusedxml":
+        _backend = _DefusedXmlBackend()
+    else:
+        raise ValueError(f"Unknown XML backend {name}, expected one of auto, {', '.join(XML_BACKENDS)}")
+    return _backend
+
+
+def get_xml_backend() -> XmlBackend:
+    return _backend if _backend is not None else set_xml_backend()
+
+
+class XPath:
+    """Element path that is compiled once for every XML backend it is evaluated with.
+
+    Only the subset of XPath understood by ElementTree can be used.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._find: dict[str, Callable[[XmlElement], XmlElement | None]] = {}
+        self._findall: dict[str, Callable[[XmlElement], list[XmlElement]]] = {}
+
+    def finder(self) -> Callable[[XmlElement], XmlElement | None]:
+        """Return the compiled function finding the first match, for use in loops."""
+        backend = get_xml_backend()
+        find = self._find.get(backend.name)
+        if find is None:
+            find = self._find[backend.name] = backend.compile_find(self.path)
+        return find
+
+    def find(self, elem: XmlElement) -> XmlElement | None:
+        return self.finder()(elem)
+
+    def findall(self, elem: XmlElement) -> list[XmlElement]:
+        backend = get_xml_backend()
+        findall = self._findall.get(backend.name)
+        if findall is None:
+            findall = self._findall[backend.name] = backend.compile_findall(self.path)
+        return findall(elem)
+
+
 def parse_xml(file_name: str | IO[bytes]) -> XmlElement | None:
     """Fetch the root node of an EML XML DOM-tree given a filepath.
 
@@ -24,8 +266,67 @@ def parse_xml(file_name: str | IO[bytes]) -> XmlElement | None:
     Returns:
         Root node of the EML file.
     """
-    tree = ElementTree.parse(file_name)
-    return tree.getroot()
+    return get_xml_backend().parse(file_name)
+
+
+def iterparse_xml(
+    file_name: str | IO[bytes], events: tuple[str, ...] = ("start", "end")
+) -> Iterator[tuple[str, XmlElement]]:
+    """Incrementally parse an EML XML file, yielding (event, element) pairs.
+
+    Elements are only guaranteed to be complete on their "end" event. Callers
+    are responsible for releasing elements they no longer need.
+
+    Args:
+        file_name: Path to the EML file to parse.
+        events: The iterparse events to report.
+
+    Returns:
+        Iterator over (event, element) pairs in document order.
+    """
+    return get_xml_backend().iterparse(file_name, events)
+
+
+def seekable(file_name: str | IO[bytes]) -> str | IO[bytes]:
+    """Make a binary stream seekable by reading it into memory, so it can be probed before it is read.
+
+    Args:
+        file_name: Path to an EML file, returned as is, or a binary stream such as standard input.
+
+    Returns:
+        The path or stream itself if it can be rewound, otherwise an in-memory copy of the rest of the stream.
+    """
+    if isinstance(file_name, str) or file_name.seekable():
+        return file_name
+    import io  # noqa: PLC0415 only needed for streams that cannot be rewound
+
+    return io.BytesIO(file_name.read())
+
+
+def file_digest(file_name: str | IO[bytes]) -> str:
+    """Compute the SHA-256 hex digest of a file's (uncompressed) contents.
+
+    Args:
+        file_name: Path to the file to hash, see open_eml, or a binary stream which is rewound afterwards.
+
+    Returns:
+        Hex digest of the file's contents.
+    """
+    digest = hashlib.sha256()
+    position = file_name.tell() if not isinstance(file_name, str) else 0
+    with open_eml(file_name) as file:
+        while chunk := file.read(1 << 20):
+            digest.update(chunk)
+    if not isinstance(file_name, str):
+        file_name.seek(position)
+    return digest.hexdigest()
+
+
+def _get_mandatory(value: str | None) -> str:
+    if value is None:
+        raise ValueError("Could not find specified XML element")
+
+    return value
 
 
 def _get_text(xml_element: XmlElement | None) -> str | None:
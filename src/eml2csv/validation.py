@@ -0,0 +1,222 @@
+# SPDX-FileCopyrightText: 2025-present Chris Mostert <15890652+chrismostert@users.noreply.github.com>
+#
+# SPDX-License-Identifier: EUPL-1.2
+import os
+import time
+from array import array
+from collections.abc import Callable, Iterable
+from dataclasses import asdict, dataclass
+from typing import IO, TYPE_CHECKING, Any
+
+from eml2csv.batch import _run
+from eml2csv.instrument import DISABLED, Profiler
+from eml2csv.lib import (
+    _METADATA_ROWS,
+    _CountsEml,
+    _extract_reporting_unit_id,
+    _read_counts_eml,
+)
+from eml2csv.matrix import add_rows, subtract_rows
+from eml2csv.worker import process_cache
+
+if TYPE_CHECKING:
+    from eml2csv.cache import ParseCache
+
+# The votes of the candidates of a list add up to the votes of the list
+CANDIDATE_VOTES = "candidate_votes"
+# The votes of the lists add up to the valid ballots
+VALID_VOTES = "valid_votes"
+# The ballots found (valid, blank and invalid) equal the admitted voters, apart from the explained differences
+ADMITTED_VOTERS = "admitted_voters"
+# The reporting units add up to the totals of the authority
+TOTALS = "totals"
+
+# Reporting unit id used for the totals of the authority, like the column in the csv
+TOTAL = "Totaal"
+
+_COUNTER_NAMES = {counter: name for name, counter in _METADATA_ROWS}
+_TOTAL_COUNTED = ("TotalCounted", None)
+_BLANK = ("RejectedVotes", "blanco")
+_INVALID = ("RejectedVotes", "ongeldig")
+_ADMITTED = ("UncountedVotes", "toegelaten kiezers")
+_MORE = ("UncountedVotes", "meer getelde stembiljetten")
+_FEWER = ("UncountedVotes", "minder getelde stembiljetten")
+# Only the authority counts the voters that were called up, the reporting units leave it empty
+_UNCOUNTED_BY_REPORTING_UNITS = frozenset({("Cast", None)})
+
+
+@dataclass(frozen=True)
+class Violation:
+    check: str
+    # 0 for the totals of the authority, 1 onwards the reporting units in the order of the csv columns
+    column: int
+    reporting_unit_id: str
+    # The list, candidate or counter that does not add up
+    subject: str
+    # The value computed from the other counts, and the value in the counts file
+    expected: int
+    actual: int
+
+
+@dataclass(frozen=True)
+class ValidationReport:
+    counts_eml_path: str | None
+    # Gebiednummer of every reporting unit, in the order of the csv columns
+    reporting_unit_ids: list[str]
+    violations: list[Violation]
+    error: str | None
+    duration: float
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None and not self.violations
+
+    def by_reporting_unit(self) -> dict[str, list[Violation]]:
+        """The violations of every reporting unit by its id, with the totals of the authority first."""
+        report: dict[str, list[Violation]] = {TOTAL: [], **{unit_id: [] for unit_id in self.reporting_unit_ids}}
+        for violation in self.violations:
+            report[violation.reporting_unit_id].append(violation)
+        return report
+
+    def to_dict(self) -> dict[str, Any]:
+        """Plain types for JSON, listing only the reporting units with violations."""
+        return {
+            "counts_eml_path": self.counts_eml_path,
+            "ok": self.ok,
+            "error": self.error,
+            "duration": self.duration,
+            "reporting_units": len(self.reporting_unit_ids),
+            "violations": {
+                unit_id: [asdict(violation) for violation in violations]
+                for unit_id, violations in self.by_reporting_unit().items()
+                if violations
+            },
+        }
+
+
+def validate(
+    counts_eml_path: str | IO[bytes], cache: "ParseCache | None" = None, profiler: Profiler = DISABLED
+) -> ValidationReport:
+    """Check that the counts of a counts EML file (510b) add up, for the totals and every reporting unit.
+
+    Every check is computed over whole rows of counts (one value per column) at once, so
+    validating takes a fraction of the time reading the file does.
+
+    Args:
+        counts_eml_path: Path to the counts EML file (510b) or a binary stream of it.
+        cache: Cache of parsed EML files to read the counts file through.
+        profiler: Profiler to record the duration of reading and validating in.
+
+    Returns:
+        The violations of every check, see CANDIDATE_VOTES, VALID_VOTES, ADMITTED_VOTERS and TOTALS.
+    """
+    start = time.perf_counter()
+    with profiler.stage("read_counts") as stage:
+        counts_eml = cache.counts(counts_eml_path) if cache is not None else _read_counts_eml(counts_eml_path)
+        stage.counts["reporting_units"] = len(counts_eml.reporting_unit_ids)
+
+    with profiler.stage("validate") as stage:
+        reporting_unit_ids = [_extract_reporting_unit_id(unit_id) for unit_id in counts_eml.reporting_unit_ids]
+        violations = _check(counts_eml, reporting_unit_ids)
+        stage.counts["violations"] = len(violations)
+
+    return ValidationReport(
+        counts_eml_path=counts_eml_path if isinstance(counts_eml_path, str) else None,
+        reporting_unit_ids=reporting_unit_ids,
+        violations=violations,
+        error=None,
+        duration=time.perf_counter() - start,
+    )
+
+
+def validate_many(
+    counts_eml_paths: Iterable[str],
+    workers: int | None = None,
+    on_progress: Callable[[ValidationReport], None] | None = None,
+    cache_dir: str | None = None,
+) -> list[ValidationReport]:
+    """Validate many counts EML files, spreading them over a pool of processes like convert_many.
+
+    A file that cannot be read gets a report with the error and does not abort the others.
+
+    Returns:
+        The reports in the order of the paths.
+    """
+    pending = list(enumerate(counts_eml_paths))
+    workers = workers if workers is not None else os.cpu_count() or 1
+    reports: list[ValidationReport | None] = [None] * len(pending)
+    for idx, report in _run(_validate, pending, workers, cache_dir):
+        reports[idx] = report
+        if on_progress is not None:
+            on_progress(report)
+    return [report for report in reports if report is not None]
+
+
+def _validate(counts_eml_path: str) -> ValidationReport:
+    start = time.perf_counter()
+    try:
+        return validate(counts_eml_path, cache=process_cache)
+    except Exception as e:  # noqa: BLE001
+        return ValidationReport(counts_eml_path, [], [], f"{type(e).__name__}: {e}", time.perf_counter() - start)
+
+
+def _check(counts_eml: _CountsEml, reporting_unit_ids: list[str]) -> list[Violation]:
+    votes = counts_eml.votes
+    n_columns = votes.n_columns
+    column_ids = [TOTAL, *reporting_unit_ids]
+    # Counters missing from some of the columns cannot be lined up with the votes, so they are not checked
+    counters = {
+        counter: row
+        for counter in _COUNTER_NAMES
+        if len(row := counts_eml.counters.get(counter, array("q"))) == n_columns
+    }
+    violations: list[Violation] = []
+
+    def compare(check: str, subject: str, expected: "array[int]", actual: "array[int]"):
+        # Comparing the whole arrays is a single C loop, the columns are only looked at when they differ
+        if expected != actual:
+            violations.extend(
+                Violation(check, column, column_ids[column], subject, expected_value, actual_value)
+                for column, (expected_value, actual_value) in enumerate(zip(expected, actual, strict=True))
+                if expected_value != actual_value
+            )
+
+    list_rows: dict[str | None, array[int]] = {}
+    candidate_rows: dict[str | None, list[array[int]]] = {}
+    for (affid, candid), idx in votes.row_index.items():
+        if candid is None:
+            list_rows[affid] = votes.rows[idx]
+        else:
+            candidate_rows.setdefault(affid, []).append(votes.rows[idx])
+
+    zeros = array("q", bytes(8 * n_columns))
+    for affid, rows in candidate_rows.items():
+        compare(CANDIDATE_VOTES, f"list {affid}", add_rows(*rows), list_rows.get(affid, zeros))
+
+    if list_rows and _TOTAL_COUNTED in counters:
+        compare(VALID_VOTES, _COUNTER_NAMES[_TOTAL_COUNTED], add_rows(*list_rows.values()), counters[_TOTAL_COUNTED])
+
+    if all(counter in counters for counter in (_TOTAL_COUNTED, _BLANK, _INVALID, _ADMITTED)):
+        # More ballots than admitted voters are explained by "meer", fewer by "minder"
+        explained = subtract_rows(
+            add_rows(counters[_ADMITTED], counters.get(_MORE, zeros)), counters.get(_FEWER, zeros)
+        )
+        found = add_rows(counters[_TOTAL_COUNTED], counters[_BLANK], counters[_INVALID])
+        compare(ADMITTED_VOTERS, "aangetroffen stembiljetten", explained, found)
+
+    if n_columns > 1:
+        subjects = [
+            *(
+                (f"list {affid}" if candid is None else f"list {affid} candidate {candid}", votes.rows[idx])
+                for (affid, candid), idx in votes.row_index.items()
+            ),
+            *(
+                (_COUNTER_NAMES[counter], row)
+                for counter, row in counters.items()
+                if counter not in _UNCOUNTED_BY_REPORTING_UNITS
+            ),
+        ]
+        for subject, row in subjects:
+            compare(TOTALS, subject, array("q", [sum(row[1:])]), row[:1])
+
+    return violations
@@ -0,0 +1,159 @@
+# SPDX-FileCopyrightText: 2025-present Chris Mostert <15890652+chrismostert@users.noreply.github.com>
+#
+# SPDX-License-Identifier: EUPL-1.2
+import contextlib
+import os
+import threading
+import time
+from collections.abc import Callable
+from dataclasses import dataclass
+
+from eml2csv.batch import ConversionJob, ConversionResult, _convert
+from eml2csv.index import EML_SUFFIXES, EmlIndex, pair_files
+from eml2csv.manifest import Manifest
+from eml2csv.util import get_xml_backend
+from eml2csv.worker import init_worker
+
+
+@dataclass(frozen=True)
+class WatchResult:
+    result: ConversionResult
+    # Seconds from the moment the counts file was first seen until its csv was written
+    latency: float
+
+
+@dataclass
+class _SeenFile:
+    signature: tuple[int, int]
+    # Monotonic time the file was first seen and the time its size or modification time last changed
+    arrived: float
+    changed: float
+    done: bool = False
+
+
+class Watcher:
+    """Converts every new or changed counts file (510b) in a directory as soon as it has been written completely.
+
+    The directory is polled, a file is complete once its size and modification time
+    have not changed for `settle` seconds. Counts files are paired with the complete
+    candidates file (230b) of the same election and contest in the directory, or
+    with `candidates_eml_path`. Counts files without a candidates file wait for one
+    to arrive. Parsed files are kept in the memory of the watching process, so
+    every candidates file is only parsed once. If a manifest is given, counts files
+    whose csv file is up to date are not converted again, for example after a restart.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        output_dir: str,
+        candidates_eml_path: str | None = None,
+        settle: float = 1.0,
+        cache_dir: str | None = None,
+        manifest: Manifest | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.directory = directory
+        self.output_dir = output_dir
+        self.candidates_eml_path = candidates_eml_path
+        self.settle = settle
+        self.manifest = manifest
+        self.clock = clock
+        self.index = EmlIndex.load(directory)
+        self._seen: dict[str, _SeenFile] = {}
+        # Complete counts files that still have to be converted, by name
+        self._waiting: set[str] = set()
+        init_worker(cache_dir, get_xml_backend().name)
+
+    def poll(self) -> list[WatchResult]:
+        """Check the directory once and convert the counts files that have been completed since the last poll."""
+        now = self.clock()
+        signatures = {}
+        with os.scandir(self.directory) as dir_entries:
+            for dir_entry in dir_entries:
+                if dir_entry.is_file() and dir_entry.name.endswith(EML_SUFFIXES):
+                    stat = dir_entry.stat()
+                    signatures[dir_entry.name] = (stat.st_mtime_ns, stat.st_size)
+
+        for name in self._seen.keys() - signatures.keys():
+            del self._seen[name]
+            self._waiting.discard(name)
+        completed = []
+        for name, signature in signatures.items():
+            seen = self._seen.get(name)
+            if seen is None or seen.signature != signature:
+                # A file that is still being written keeps the time it arrived
+                arrived = seen.arrived if seen is not None and not seen.done else now
+                self._seen[name] = _SeenFile(signature, arrived, now)
+            elif not seen.done and now - seen.changed >= self.settle:
+                # Only files found unchanged by a later poll are complete, however short the settle time
+                seen.done = True
+                completed.append(name)
+
+        if not completed:
+            return []
+        self.index.scan()
+        with contextlib.suppress(OSError):
+            self.index.save()
+        self._waiting.update(name for name in completed if self._entry_id(name) == "510b")
+        return self._convert_waiting()
+
+    def run(self, on_result: Callable[[WatchResult], None], interval: float = 1.0, stop: threading.Event | None = None):
+        """Poll the directory every `interval` seconds until `stop` is set."""
+        stop = stop if stop is not None else threading.Event()
+        while not stop.is_set():
+            for result in self.poll():
+                on_result(result)
+            stop.wait(interval)
+
+    def _entry_id(self, name: str) -> str | None:
+        entry = self.index.entries.get(name)
+        return entry.eml_id if entry is not None else None
+
+    def _convert_waiting(self) -> list[WatchResult]:
+        if self.candidates_eml_path is not None:
+            candidates = {self._path(name): self.candidates_eml_path for name in self._waiting}
+        else:
+            # Only pair with candidates files that have been written completely
+            complete = {
+                self._path(name): entry
+                for name, entry in self.index.entries.items()
+                if name in self._seen and self._seen[name].done
+            }
+            candidates = {
+                pair.counts_eml_path: pair.candidates_eml_path
+                for pair in pair_files(complete)
+                if pair.candidates_eml_path is not None
+            }
+
+        results = []
+        for name in sorted(self._waiting):
+            candidates_eml_path = candidates.get(self._path(name))
+            if candidates_eml_path is None:
+                continue
+            self._waiting.discard(name)
+            job = ConversionJob(self._path(name), candidates_eml_path, self.output_dir)
+            results.append(WatchResult(self._convert(job), self.clock() - self._seen[name].arrived))
+        return results
+
+    def _convert(self, job: ConversionJob) -> ConversionResult:
+        if self.manifest is None:
+            return _convert(job)
+
+        output_csv_path = self.manifest.fresh_output(job.counts_eml_path, job.candidates_eml_path, job.output_csv_path)
+        if output_csv_path is not None:
+            return ConversionResult(job, output_csv_path, None, 0.0, 0, skipped=True)
+
+        result = _convert(job)
+        if result.output_csv_path is not None:
+            self.manifest.record(
+                job.counts_eml_path, job.candidates_eml_path, job.output_csv_path, result.output_csv_path
+            )
+        else:
+            self.manifest.forget(job.counts_eml_path)
+        with contextlib.suppress(OSError):
+            self.manifest.save()
+        return result
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
@@ -0,0 +1,23 @@
+# SPDX-FileCopyrightText: 2025-present Chris Mostert <15890652+chrismostert@users.noreply.github.com>
+#
+# SPDX-License-Identifier: EUPL-1.2
+from eml2csv.cache import ParseCache
+from eml2csv.util import get_xml_backend, set_xml_backend
+
+# Cache of the current (worker) process, so a candidates file is parsed once per process instead of once per job
+process_cache = ParseCache()
+
+
+def init_worker(cache_dir: str | None, xml_backend: str):
+    """Prepare a process of a pool, or the current process, to convert files.
+
+    Args:
+        cache_dir: Directory to store parsed files in, shared by the processes, or None to only keep them in memory.
+        xml_backend: Name of the XML backend selected in the process that started the pool.
+    """
+    # Workers that are not forked do not inherit the XML backend selected in this process
+    if get_xml_backend().name != xml_backend:
+        set_xml_backend(xml_backend)
+    if process_cache.directory != cache_dir:
+        process_cache.directory = cache_dir
+        process_cache.clear()
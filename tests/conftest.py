@@ -0,0 +1,17 @@
+from pathlib import Path
+
+import pytest
+
+tests_path = Path("tests")
+
+
+@pytest.fixture
+def national_candidates_eml(tmp_path):
+    # Candidates file with the contests of both kieskringen, like the national file of a TK election
+    haarlem = (tests_path / "Kandidatenlijsten_TK2025_Haarlem.eml.xml").read_bytes()
+    nijmegen = (tests_path / "Kandidatenlijsten_TK2025_Nijmegen.eml.xml").read_bytes()
+    contest = nijmegen[nijmegen.index(b"<Contest>") : nijmegen.index(b"</Contest>") + len(b"</Contest>")]
+    end = haarlem.index(b"</Contest>") + len(b"</Contest>")
+    path = tmp_path / "Kandidatenlijsten_TK2025.eml.xml"
+    path.write_bytes(haarlem[:end] + contest + haarlem[end:])
+    return str(path)
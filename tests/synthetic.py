@@ -0,0 +1,195 @@
+"""Deterministic generator of synthetic, internally consistent EML 510b/230b pairs.
+
+Every vote count is derived from the seed and the position in the file, so files
+of any size can be written in a single pass without keeping them in memory.
+"""
+
+import random
+from collections.abc import Iterator
+from dataclasses import dataclass
+from pathlib import Path
+from typing import IO
+from xml.sax.saxutils import escape
+
+from eml2csv.util import NAMESPACE
+
+_ROOT_ATTRIBUTES = " ".join(
+    f'xmlns="{uri}"' if prefix == "eml" else f'xmlns:{prefix}="{uri}"' for prefix, uri in NAMESPACE.items()
+)
+_SYLLABLES = ["ba", "de", "ker", "lo", "man", "ne", "ri", "sen", "ta", "vel", "wij", "zon"]
+_UNCOUNTED_REASONS = [
+    "meer getelde stembiljetten",
+    "minder getelde stembiljetten",
+    "meegenomen stembiljetten",
+    "te weinig uitgereikte stembiljetten",
+    "te veel uitgereikte stembiljetten",
+    "geen verklaring",
+    "andere verklaring",
+]
+
+
+@dataclass(frozen=True)
+class SyntheticElection:
+    seed: int = 0
+    reporting_units: int = 20
+    affiliations: int = 10
+    candidates: int = 20
+    election_id: str = "TK2025"
+    election_name: str = "Tweede Kamer der Staten-Generaal 2025"
+    contest_id: str = "1"
+    authority_id: str = "0001"
+    authority_name: str = "Juinen"
+
+
+@dataclass(frozen=True)
+class _Counts:
+    # Per affiliation: (affiliation total, votes per candidate)
+    votes: list[tuple[int, list[int]]]
+    metadata: dict[tuple[str, str | None], int]
+
+
+def write_pair(directory: Path, election: SyntheticElection) -> tuple[Path, Path]:
+    """Write a counts (510b) and candidates (230b) file for the election to the directory."""
+    counts_path = directory / f"Telling_{election.election_id}_{election.authority_name}.eml.xml"
+    candidates_path = directory / f"Kandidatenlijsten_{election.election_id}_{election.contest_id}.eml.xml"
+    with open(counts_path, "w", encoding="utf-8") as file:
+        write_counts_eml(file, election)
+    with open(candidates_path, "w", encoding="utf-8") as file:
+        write_candidates_eml(file, election)
+    return counts_path, candidates_path
+
+
+def write_candidates_eml(file: IO[str], election: SyntheticElection):
+    file.write(
+        f'<?xml version="1.0" encoding="UTF-8"?><EML {_ROOT_ATTRIBUTES} Id="230b" SchemaVersion="5">'
+        "<TransactionId>1</TransactionId><ManagingAuthority>"
+        '<AuthorityIdentifier Id="CSB">De Kiesraad</AuthorityIdentifier><AuthorityAddress></AuthorityAddress>'
+        "</ManagingAuthority><CandidateList><Election>"
+        f"{_election_identifier(election)}<Contest>{_contest_identifier(election)}"
+    )
+    rng = random.Random(f"{election.seed}-candidates")
+    for aff in range(1, election.affiliations + 1):
+        file.write(
+            f'<Affiliation><AffiliationIdentifier Id="{aff}">'
+            f"<RegisteredName>{escape(_affiliation_name(aff))}</RegisteredName></AffiliationIdentifier>"
+            "<Type>lijstengroep</Type>"
+        )
+        for cand in range(1, election.candidates + 1):
+            prefix = "<xnl:NamePrefix>van der</xnl:NamePrefix>" if rng.random() < 0.1 else ""
+            file.write(
+                f'<Candidate><CandidateIdentifier Id="{cand}"></CandidateIdentifier><CandidateFullName>'
+                f'<xnl:PersonName><xnl:NameLine NameType="Initials">{_name(rng, 1)[0].upper()}.</xnl:NameLine>'
+                f"<xnl:FirstName>{_name(rng, 2).capitalize()}</xnl:FirstName>{prefix}"
+                f"<xnl:LastName>{_name(rng, 3).capitalize()}</xnl:LastName></xnl:PersonName></CandidateFullName>"
+                "</Candidate>"
+            )
+        file.write("</Affiliation>")
+    file.write("</Contest></Election></CandidateList></EML>")
+
+
+def write_counts_eml(file: IO[str], election: SyntheticElection):
+    file.write(
+        f'<?xml version="1.0" encoding="UTF-8"?><EML {_ROOT_ATTRIBUTES} Id="510b" SchemaVersion="5">'
+        "<TransactionId>1</TransactionId><ManagingAuthority>"
+        f'<AuthorityIdentifier Id="{election.authority_id}">{escape(election.authority_name)}</AuthorityIdentifier>'
+        "<AuthorityAddress></AuthorityAddress></ManagingAuthority><Count><EventIdentifier></EventIdentifier>"
+        f"<Election>{_election_identifier(election)}<Contests><Contest>{_contest_identifier(election)}"
+    )
+
+    # The totals precede the reporting units, so generate every reporting unit twice instead of keeping them
+    total = _Counts(
+        votes=[(0, [0] * election.candidates) for _ in range(election.affiliations)],
+        metadata={},
+    )
+    for counts in _reporting_units(election):
+        for aff, (aff_total, cand_votes) in enumerate(counts.votes):
+            total_aff, total_cand = total.votes[aff]
+            total.votes[aff] = (total_aff + aff_total, [a + b for a, b in zip(total_cand, cand_votes, strict=True)])
+        for counter, value in counts.metadata.items():
+            total.metadata[counter] = total.metadata.get(counter, 0) + value
+
+    file.write(f"<TotalVotes>{_votes(total)}</TotalVotes>")
+    for idx, counts in enumerate(_reporting_units(election), start=1):
+        file.write(
+            f'<ReportingUnitVotes><ReportingUnitIdentifier Id="{election.authority_id}::SB{idx}">'
+            f"Stembureau {_name(random.Random(f'{election.seed}-ru-{idx}'), 3).capitalize()} "
+            f"(postcode: {1000 + idx % 9000} AB)</ReportingUnitIdentifier>"
+            f"{_votes(counts)}</ReportingUnitVotes>"
+        )
+    file.write("</Contest></Contests></Election></Count></EML>")
+
+
+def _reporting_units(election: SyntheticElection) -> Iterator[_Counts]:
+    for idx in range(1, election.reporting_units + 1):
+        rng = random.Random(f"{election.seed}-votes-{idx}")
+        votes = []
+        for _ in range(election.affiliations):
+            popularity = rng.randint(0, 60)
+            # The list puller gets most of the votes, the rest get fewer the lower they are on the list
+            cand_votes = [
+                rng.randint(0, popularity) if cand == 0 else rng.randint(0, popularity // (cand + 1))
+                for cand in range(election.candidates)
+            ]
+            votes.append((sum(cand_votes), cand_votes))
+
+        geldig = sum(aff_total for aff_total, _ in votes)
+        blanco = rng.randint(0, 3)
+        ongeldig = rng.randint(0, 3)
+        aangetroffen = geldig + blanco + ongeldig
+        toegelaten = aangetroffen + rng.choice([-1, 0, 0, 0, 1])
+        volmacht = rng.randint(0, toegelaten // 10)
+        kiezerspas = rng.randint(0, 2) if toegelaten - volmacht > 2 else 0
+        metadata = {
+            ("Cast", None): toegelaten + rng.randint(100, 600),
+            ("TotalCounted", None): geldig,
+            ("RejectedVotes", "ongeldig"): ongeldig,
+            ("RejectedVotes", "blanco"): blanco,
+            ("UncountedVotes", "geldige stempassen"): toegelaten - volmacht - kiezerspas,
+            ("UncountedVotes", "geldige volmachtbewijzen"): volmacht,
+            ("UncountedVotes", "geldige kiezerspassen"): kiezerspas,
+            ("UncountedVotes", "toegelaten kiezers"): toegelaten,
+        }
+        for reason in _UNCOUNTED_REASONS:
+            metadata[("UncountedVotes", reason)] = 0
+        metadata[("UncountedVotes", "meer getelde stembiljetten")] = max(aangetroffen - toegelaten, 0)
+        metadata[("UncountedVotes", "minder getelde stembiljetten")] = max(toegelaten - aangetroffen, 0)
+        metadata[("UncountedVotes", "geen verklaring")] = abs(toegelaten - aangetroffen)
+        yield _Counts(votes, metadata)
+
+
+def _votes(counts: _Counts) -> str:
+    parts = []
+    for aff, (aff_total, cand_votes) in enumerate(counts.votes, start=1):
+        parts.append(
+            f'<Selection><AffiliationIdentifier Id="{aff}"><RegisteredName>{escape(_affiliation_name(aff))}'
+            f"</RegisteredName></AffiliationIdentifier><ValidVotes>{aff_total}</ValidVotes></Selection>"
+        )
+        parts.extend(
+            f'<Selection><Candidate><CandidateIdentifier Id="{cand}"></CandidateIdentifier></Candidate>'
+            f"<ValidVotes>{votes}</ValidVotes></Selection>"
+            for cand, votes in enumerate(cand_votes, start=1)
+        )
+    for (tag, reason), value in counts.metadata.items():
+        reason_code = f' ReasonCode="{reason}"' if reason is not None else ""
+        parts.append(f"<{tag}{reason_code}>{value}</{tag}>")
+    return "".join(parts)
+
+
+def _election_identifier(election: SyntheticElection) -> str:
+    return (
+        f'<ElectionIdentifier Id="{election.election_id}"><ElectionName>{escape(election.election_name)}'
+        f"</ElectionName><ElectionCategory>{election.election_id[:2]}</ElectionCategory>"
+        "<kr:ElectionDate>2025-10-29</kr:ElectionDate></ElectionIdentifier>"
+    )
+
+
+def _contest_identifier(election: SyntheticElection) -> str:
+    return f'<ContestIdentifier Id="{election.contest_id}"><ContestName>Kieskring</ContestName></ContestIdentifier>'
+
+
+def _affiliation_name(aff: int) -> str:
+    return f"Partij {_name(random.Random(f'affiliation-{aff}'), 2).capitalize()} & Co"
+
+
+def _name(rng: random.Random, syllables: int) -> str:
+    return "".join(rng.choice(_SYLLABLES) for _ in range(syllables))
@@ -0,0 +1,91 @@
+import csv
+from dataclasses import replace
+from pathlib import Path
+
+import pytest
+from typer.testing import CliRunner
+
+from eml2csv import aggregate, eml2csv
+from eml2csv.lib import InvalidInputError
+from eml2csv.main import app
+from tests.synthetic import SyntheticElection, write_pair
+
+election = SyntheticElection(reporting_units=4, affiliations=3, candidates=4)
+authorities = [
+    replace(election, seed=seed, authority_id=f"000{seed}", authority_name=name)
+    for seed, name in enumerate(["Juinen", "Heemdamseburg", "Kerkvliet"], start=1)
+]
+
+
+def _read_csv(path: str) -> list[list[str]]:
+    with open(path, encoding="utf-8-sig", newline="") as file:
+        return list(csv.reader(file, delimiter=";"))
+
+
+@pytest.fixture
+def pairs(tmp_path) -> list[tuple[Path, Path]]:
+    return [write_pair(tmp_path, authority) for authority in authorities]
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_aggregate_has_a_column_per_authority(tmp_path, pairs, workers):
+    output_csv_path = aggregate(
+        [str(counts) for counts, _ in pairs], [str(pairs[0][1])], str(tmp_path), workers=workers
+    )
+
+    assert output_csv_path == str(tmp_path / "osv4-3_telling_tk2025_kieskring_1.csv")
+    rows = _read_csv(output_csv_path)
+    assert rows[2] == ["Gebied", "", "Kieskring 1"]
+    assert rows[5][4:] == ["Totaal", "Juinen", "Heemdamseburg", "Kerkvliet"]
+    assert rows[6][5:] == ["0001", "0002", "0003"]
+    # Every column holds the totals of the authority, as in its own csv
+    for column, (counts, candidates) in enumerate(pairs, start=5):
+        authority_rows = _read_csv(eml2csv(str(counts), str(candidates), str(tmp_path / f"{counts.name}.csv")))
+        assert [row[column] if row else None for row in rows[8:]] == [
+            row[4] if row else None for row in authority_rows[8:]
+        ]
+    for row in rows[8:]:
+        if row:
+            assert int(row[4]) == sum(int(value) for value in row[5:])
+
+
+def test_aggregate_across_contests_only_has_list_totals(tmp_path, pairs):
+    other_contest = replace(authorities[0], contest_id="2", authority_id="0004", authority_name="Oosterdam")
+    counts, candidates = write_pair(tmp_path, other_contest)
+
+    output_csv_path = aggregate(
+        [*(str(counts) for counts, _ in pairs), str(counts)], [str(pairs[0][1]), str(candidates)], str(tmp_path)
+    )
+
+    assert output_csv_path == str(tmp_path / "osv4-3_telling_tk2025_alle_kieskringen.csv")
+    rows = _read_csv(output_csv_path)
+    assert rows[2] == ["Gebied", "", "Alle kieskringen"]
+    list_rows = rows[24:]
+    assert [row[0] for row in list_rows] == ["1", "2", "3"]
+
+
+def test_aggregate_needs_candidates_of_every_contest(tmp_path, pairs):
+    counts, _ = write_pair(
+        tmp_path, replace(authorities[0], contest_id="2", authority_id="0004", authority_name="Oosterdam")
+    )
+
+    with pytest.raises(InvalidInputError, match="contest 2"):
+        aggregate([str(pairs[0][0]), str(counts)], [str(pairs[0][1])], str(tmp_path), workers=1)
+
+
+def test_aggregate_rejects_other_elections(tmp_path, pairs):
+    counts, _ = write_pair(tmp_path, replace(authorities[0], election_id="EP2024", authority_id="0004"))
+
+    with pytest.raises(InvalidInputError, match="Election ids did not match!"):
+        aggregate([str(pairs[0][0]), str(counts)], [str(pairs[0][1])], str(tmp_path), workers=1)
+
+
+@pytest.mark.usefixtures("pairs")
+def test_aggregate_command(tmp_path):
+    result = CliRunner().invoke(
+        app, ["aggregate", str(tmp_path), "--output", str(tmp_path / "totaal.csv"), "--workers", "1"]
+    )
+
+    assert result.exit_code == 0, result.output
+    assert "Added up 3 counts files" in result.output
+    assert _read_csv(str(tmp_path / "totaal.csv"))[5][5:] == ["Heemdamseburg", "Juinen", "Kerkvliet"]
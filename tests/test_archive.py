@@ -0,0 +1,98 @@
+import gzip
+import io
+import shutil
+import zipfile
+from pathlib import Path
+
+import pytest
+from typer.testing import CliRunner
+
+from eml2csv import EmlIndex, EmlPair, ParseCache, eml2csv
+from eml2csv.index import pair_files, probe_archive
+from eml2csv.main import app
+
+tests_path = Path("tests")
+gr_counts = "Telling_GR2022_WestMaasenWaal.eml.xml"
+gr_candidates = "Kandidatenlijsten_GR2022_WestMaasenWaal.eml.xml"
+gr_oracle = "osv4-3_telling_gr2022_westmaasenwaal.csv"
+tk_oracle = "osv4-3_telling_tk2025_gemeente_westmaasenwaal.csv"
+
+
+@pytest.fixture
+def archive(tmp_path):
+    archive_path = tmp_path / "results.zip"
+    with zipfile.ZipFile(archive_path, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for path in tests_path.glob("*.eml.xml"):
+            # Compressed files inside the archive are read as well
+            name = f"uitslagen/{path.name}.gz" if path.name == gr_counts else f"uitslagen/{path.name}"
+            archive.writestr(name, gzip.compress(path.read_bytes()) if name.endswith(".gz") else path.read_bytes())
+        archive.writestr("uitslagen/readme.txt", "not an EML file")
+    return archive_path
+
+
+def test_gzip_compressed_files_are_read(tmp_path):
+    for name in [gr_counts, gr_candidates]:
+        (tmp_path / f"{name}.gz").write_bytes(gzip.compress((tests_path / name).read_bytes()))
+    output_csv = io.BytesIO()
+
+    eml2csv(str(tmp_path / f"{gr_counts}.gz"), str(tmp_path / f"{gr_candidates}.gz"), output_csv)
+
+    assert output_csv.getvalue() == (tests_path / gr_oracle).read_bytes()
+
+
+def test_files_are_read_from_archive(archive):
+    output_csv = io.BytesIO()
+    cache = ParseCache()
+
+    eml2csv(f"{archive}/uitslagen/{gr_counts}.gz", f"{archive}/uitslagen/{gr_candidates}", output_csv, cache=cache)
+    # The cache is keyed by the uncompressed contents, wherever the file is read from
+    eml2csv(str(tests_path / gr_counts), str(tests_path / gr_candidates), io.BytesIO(), cache=cache)
+
+    assert output_csv.getvalue() == (tests_path / gr_oracle).read_bytes()
+    assert cache.stats.hits == 2
+
+
+def test_archive_files_are_paired(archive):
+    files = probe_archive(str(archive))
+
+    assert files[f"{archive}/uitslagen/{gr_counts}.gz"].eml_id == "510b"
+    assert pair_files(files) == [
+        EmlPair(f"{archive}/uitslagen/{gr_counts}.gz", f"{archive}/uitslagen/{gr_candidates}"),
+        EmlPair(
+            f"{archive}/uitslagen/Telling_TK2025_gemeente_West_Maas_en_Waal.eml.xml",
+            f"{archive}/uitslagen/Kandidatenlijsten_TK2025_Nijmegen.eml.xml",
+        ),
+    ]
+
+
+def test_archive_file_declaring_entities_is_not_recognised(tmp_path):
+    archive_path = tmp_path / "results.zip"
+    with zipfile.ZipFile(archive_path, "w") as archive:
+        archive.write(tests_path / gr_counts, gr_counts)
+        archive.writestr("hostile.eml.xml", b'<!DOCTYPE EML [<!ENTITY a "a">]><EML Id="510b">&a;</EML>')
+
+    files = probe_archive(str(archive_path))
+
+    assert files[f"{archive_path}/hostile.eml.xml"].eml_id is None
+    assert files[f"{archive_path}/{gr_counts}"].eml_id == "510b"
+
+
+def test_index_includes_gzip_compressed_files(tmp_path):
+    shutil.copy(tests_path / gr_candidates, tmp_path)
+    (tmp_path / f"{gr_counts}.gz").write_bytes(gzip.compress((tests_path / gr_counts).read_bytes()))
+    index = EmlIndex(str(tmp_path))
+    index.scan()
+
+    assert index.pairs() == [EmlPair(str(tmp_path / f"{gr_counts}.gz"), str(tmp_path / gr_candidates))]
+
+
+def test_batch_command_converts_archive_to_archive(tmp_path, archive):
+    output_zip = tmp_path / "output.zip"
+
+    result = CliRunner().invoke(app, ["batch", str(archive), "--output-zip", str(output_zip)])
+
+    assert result.exit_code == 0, result.output
+    with zipfile.ZipFile(output_zip) as output:
+        assert sorted(output.namelist()) == [gr_oracle, tk_oracle]
+        for name in [gr_oracle, tk_oracle]:
+            assert output.read(name) == (tests_path / name).read_bytes()
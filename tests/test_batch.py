@@ -0,0 +1,84 @@
+import os
+from pathlib import Path
+
+import pytest
+from typer.testing import CliRunner
+
+from eml2csv import ConversionJob, convert_many
+from eml2csv.main import app
+
+tests_path = Path("tests")
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_convert_many_reports_every_job_without_aborting(tmp_path, workers):
+    jobs = [
+        ConversionJob(
+            "tests/Telling_TK2025_gemeente_West_Maas_en_Waal.eml.xml",
+            "tests/Kandidatenlijsten_TK2025_Haarlem.eml.xml",
+            str(tmp_path / "mismatch.csv"),
+        ),
+        ConversionJob(
+            "tests/Telling_GR2022_WestMaasenWaal.eml.xml",
+            "tests/Kandidatenlijsten_GR2022_WestMaasenWaal.eml.xml",
+            str(tmp_path),
+        ),
+    ]
+    progress = []
+
+    report = convert_many(jobs, workers=workers, on_progress=progress.append)
+
+    assert [result.job for result in report.results] == jobs
+    assert len(progress) == len(jobs)
+    assert report.failed == [report.results[0]]
+    assert report.results[0].error is not None
+    assert report.results[0].error.startswith("InvalidInputError: Contest ids did not match!")
+    assert report.succeeded == [report.results[1]]
+    assert report.results[1].output_csv_path == str(tmp_path / "osv4-3_telling_gr2022_westmaasenwaal.csv")
+    assert (tmp_path / "osv4-3_telling_gr2022_westmaasenwaal.csv").read_bytes() == (
+        tests_path / "osv4-3_telling_gr2022_westmaasenwaal.csv"
+    ).read_bytes()
+    assert report.files_per_second > 0
+
+
+def test_batch_command_converts_directory(tmp_path):
+    input_dir = tmp_path / "input"
+    input_dir.mkdir()
+    for name in [
+        "Telling_GR2022_WestMaasenWaal.eml.xml",
+        "Kandidatenlijsten_GR2022_WestMaasenWaal.eml.xml",
+        "Kandidatenlijsten_TK2025_Haarlem.eml.xml",
+    ]:
+        (input_dir / name).write_bytes((tests_path / name).read_bytes())
+
+    result = CliRunner().invoke(
+        app,
+        [
+            "batch",
+            str(input_dir),
+            "--candidates",
+            str(input_dir / "Kandidatenlijsten_GR2022_WestMaasenWaal.eml.xml"),
+            "--output-dir",
+            str(tmp_path / "output"),
+            "--workers",
+            "1",
+        ],
+    )
+
+    assert result.exit_code == 0, result.output
+    assert "Converted 1 of 1 files" in result.output
+    assert (tmp_path / "output" / "osv4-3_telling_gr2022_westmaasenwaal.csv").exists()
+
+
+def test_batch_command_pairs_candidates_files(tmp_path):
+    for path in tests_path.glob("*.eml.xml"):
+        (tmp_path / path.name).write_bytes(path.read_bytes())
+
+    result = CliRunner().invoke(app, ["batch", str(tmp_path), "--output-dir", str(tmp_path / "output")])
+
+    assert result.exit_code == 0, result.output
+    assert sorted(os.listdir(tmp_path / "output")) == [
+        ".eml2csv-manifest.json",
+        "osv4-3_telling_gr2022_westmaasenwaal.csv",
+        "osv4-3_telling_tk2025_gemeente_westmaasenwaal.csv",
+    ]
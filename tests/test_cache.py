@@ -0,0 +1,93 @@
+import io
+import shutil
+from pathlib import Path
+
+import pytest
+
+from eml2csv import ParseCache, eml2csv
+from eml2csv import cache as cache_module
+
+tests_path = Path("tests")
+counts_eml = "tests/Telling_GR2022_WestMaasenWaal.eml.xml"
+candidates_eml = "tests/Kandidatenlijsten_GR2022_WestMaasenWaal.eml.xml"
+expected_csv = (tests_path / "osv4-3_telling_gr2022_westmaasenwaal.csv").read_bytes()
+
+
+def _convert(cache: ParseCache, counts: str = counts_eml) -> bytes:
+    output = io.BytesIO()
+    eml2csv(counts, candidates_eml, output, cache=cache)
+    return output.getvalue()
+
+
+def test_repeated_conversion_is_served_from_memory():
+    cache = ParseCache()
+
+    assert _convert(cache) == expected_csv
+    assert _convert(cache) == expected_csv
+    assert (cache.stats.misses, cache.stats.hits, cache.stats.disk_hits) == (2, 2, 0)
+
+
+def test_disk_cache_skips_parsing_in_a_new_cache(tmp_path, monkeypatch):
+    assert _convert(ParseCache(directory=str(tmp_path))) == expected_csv
+
+    def fail(path):
+        pytest.fail(f"{path} should not have been parsed")
+
+    monkeypatch.setattr(cache_module, "_read_counts_eml", fail)
+    monkeypatch.setattr(cache_module, "_read_candidates_eml", fail)
+    cache = ParseCache(directory=str(tmp_path))
+
+    assert _convert(cache) == expected_csv
+    assert (cache.stats.misses, cache.stats.hits, cache.stats.disk_hits) == (0, 0, 2)
+
+
+def test_changed_file_is_parsed_again(tmp_path):
+    counts = tmp_path / "counts.eml.xml"
+    shutil.copy(counts_eml, counts)
+    cache = ParseCache()
+    _convert(cache, str(counts))
+
+    counts.write_bytes(counts.read_bytes().replace(b"<Cast>16202</Cast>", b"<Cast>16203</Cast>"))
+
+    assert b'"16203"' in _convert(cache, str(counts))
+    # Only the unchanged candidates file is served from the cache
+    assert (cache.stats.misses, cache.stats.hits) == (3, 1)
+
+
+def test_other_contests_are_read_from_the_indexed_candidates_file(national_candidates_eml, monkeypatch):
+    cache = ParseCache()
+
+    haarlem_candidates = cache.candidates(national_candidates_eml, "10")
+    monkeypatch.setattr(cache_module, "_index_candidates", lambda path: pytest.fail(f"{path} was indexed again"))
+    nijmegen_candidates = cache.candidates(national_candidates_eml, "6")
+
+    assert haarlem_candidates.contest_id == "10"
+    assert nijmegen_candidates.contest_id == "6"
+    assert (
+        nijmegen_candidates.candidate_info
+        == cache.candidates("tests/Kandidatenlijsten_TK2025_Nijmegen.eml.xml").candidate_info
+    )
+    assert haarlem_candidates.candidate_info != nijmegen_candidates.candidate_info
+
+
+def test_contest_ids_do_not_escape_the_cache_directory(tmp_path):
+    haarlem = Path("tests/Kandidatenlijsten_TK2025_Haarlem.eml.xml").read_bytes()
+    candidates = tmp_path / "candidates.eml.xml"
+    candidates.write_bytes(haarlem.replace(b'ContestIdentifier Id="10"', b'ContestIdentifier Id="../../10"'))
+    directory = tmp_path / "cache" / "entries"
+
+    assert ParseCache(directory=str(directory)).candidates(str(candidates), "../../10").contest_id == "../../10"
+
+    assert {path.parent for path in tmp_path.rglob("*.bin")} == {directory}
+    cache = ParseCache(directory=str(directory))
+    assert cache.candidates(str(candidates), "../../10").contest_id == "../../10"
+    assert cache.stats.disk_hits == 1
+
+
+def test_unwritable_cache_directory_does_not_fail_the_conversion(tmp_path):
+    # A file where the directory should be makes every write fail
+    (tmp_path / "cache").write_text("not a directory")
+    cache = ParseCache(directory=str(tmp_path / "cache"))
+
+    assert _convert(cache) == expected_csv
+    assert (cache.stats.misses, cache.stats.disk_hits) == (2, 0)
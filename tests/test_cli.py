@@ -0,0 +1,47 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from eml2csv.cli import COMMANDS, _is_plain_conversion
+from eml2csv.main import app
+
+tests_path = Path("tests").absolute()
+
+
+@pytest.mark.parametrize("output", [None, "converted.csv"])
+def test_plain_conversion_does_not_import_typer(tmp_path, output):
+    arguments = [
+        str(tests_path / "Telling_GR2022_WestMaasenWaal.eml.xml"),
+        str(tests_path / "Kandidatenlijsten_GR2022_WestMaasenWaal.eml.xml"),
+        *([output] if output is not None else []),
+    ]
+    code = (
+        f"import sys; from eml2csv.cli import start; sys.argv = ['eml2csv', *{arguments!r}]; start(); "
+        "print('typer' in sys.modules)"
+    )
+    environment = {**os.environ, "PYTHONPATH": str(Path("src").absolute())}
+    result = subprocess.run(
+        [sys.executable, "-c", code], cwd=tmp_path, env=environment, check=True, capture_output=True, text=True
+    )
+
+    assert result.stdout.strip() == "False"
+    oracle_csv = "osv4-3_telling_gr2022_westmaasenwaal.csv"
+    assert (tmp_path / (output or oracle_csv)).read_text() == (tests_path / oracle_csv).read_text()
+
+
+def test_commands_match_typer_app():
+    assert {command.name for command in app.registered_commands} == COMMANDS
+
+
+def test_plain_conversion_is_only_files():
+    assert _is_plain_conversion(["counts.xml", "candidates.xml"])
+    assert _is_plain_conversion(["counts.xml", "candidates.xml", "output.csv"])
+    assert _is_plain_conversion(["counts.xml", "candidates.xml", "-"])
+    assert not _is_plain_conversion(["counts.xml", "candidates.xml", "--force"])
+    assert not _is_plain_conversion(["counts.xml", "-", "output.csv"])
+    assert not _is_plain_conversion(["counts.xml", "candidates.xml", "output.csv", "extra.csv"])
+    assert not _is_plain_conversion(["batch", "directory"])
+    assert not _is_plain_conversion(["--help"])
@@ -0,0 +1,86 @@
+import json
+import re
+from pathlib import Path
+
+import pytest
+from typer.testing import CliRunner
+
+from eml2csv.comparison import TOTAL, diff
+from eml2csv.lib import InvalidInputError
+from eml2csv.main import app
+
+COUNTS_EML = "tests/Telling_GR2022_WestMaasenWaal.eml.xml"
+UNIT_REGEX = re.compile(r"<ReportingUnitVotes><ReportingUnitIdentifier Id=\"0668::SB(\d+)\".*?</ReportingUnitVotes>")
+
+
+def recount(content: str, unit: int) -> str:
+    """Move 2 votes from the first to the second candidate of list 1 in a reporting unit."""
+    block = next(match for match in UNIT_REGEX.finditer(content) if match[1] == str(unit))
+
+    def move(match: re.Match[str]) -> str:
+        votes = int(match[2]) + (-2 if match[1] == "1" else 2)
+        return f'<CandidateIdentifier Id="{match[1]}"></CandidateIdentifier></Candidate><ValidVotes>{votes}'
+
+    recounted = re.sub(
+        r'<CandidateIdentifier Id="([12])"></CandidateIdentifier></Candidate><ValidVotes>(\d+)', move, block[0], count=2
+    )
+    return content[: block.start()] + recounted + content[block.end() :]
+
+
+@pytest.fixture
+def old_content():
+    return Path(COUNTS_EML).read_text(encoding="utf-8")
+
+
+def test_identical_files_have_no_changes():
+    counts_diff = diff(COUNTS_EML, COUNTS_EML)
+
+    assert counts_diff.identical
+    assert counts_diff.unchanged_reporting_units == 22
+
+
+def test_only_the_changed_cells_are_reported(tmp_path, old_content):
+    new_path = tmp_path / "Telling_recount.eml.xml"
+    new_path.write_text(recount(old_content, 3), encoding="utf-8")
+
+    counts_diff = diff(COUNTS_EML, str(new_path))
+
+    assert counts_diff.unchanged_reporting_units == 21
+    assert [(change.reporting_unit_id, change.subject) for change in counts_diff.changes] == [
+        ("3", "list 1 candidate 1"),
+        ("3", "list 1 candidate 2"),
+    ]
+    first, second = counts_diff.changes
+    assert first.new == first.old - 2
+    assert second.new == second.old + 2
+
+
+def test_removed_reporting_units_are_reported(tmp_path, old_content):
+    new_path = tmp_path / "Telling_removed.eml.xml"
+    block = next(match for match in UNIT_REGEX.finditer(old_content) if match[1] == "5")
+    new_path.write_text(old_content[: block.start()] + old_content[block.end() :], encoding="utf-8")
+
+    counts_diff = diff(COUNTS_EML, str(new_path))
+
+    assert counts_diff.removed_reporting_units == ["5"]
+    assert counts_diff.added_reporting_units == []
+    assert all(change.reporting_unit_id == "5" and change.new is None for change in counts_diff.changes)
+    assert "toegelaten kiezers" in {change.counter for change in counts_diff.changes}
+
+
+def test_files_of_different_authorities_are_not_compared():
+    with pytest.raises(InvalidInputError):
+        diff(COUNTS_EML, "tests/Telling_TK2025_gemeente_West_Maas_en_Waal.eml.xml")
+
+
+def test_diff_command_exits_with_1_on_changes(tmp_path, old_content):
+    new_path = tmp_path / "Telling_recount.eml.xml"
+    new_path.write_text(recount(old_content, 1), encoding="utf-8")
+    runner = CliRunner()
+
+    assert runner.invoke(app, ["diff", COUNTS_EML, COUNTS_EML]).exit_code == 0
+    result = runner.invoke(app, ["diff", COUNTS_EML, str(new_path), "--format", "json"])
+    assert result.exit_code == 1
+    changes = json.loads(result.stdout)["changes"]
+    assert {change["reporting_unit_id"] for change in changes} == {"1"}
+    assert TOTAL not in {change["reporting_unit_id"] for change in changes}
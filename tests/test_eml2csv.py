@@ -1,9 +1,11 @@
+import csv
+import io
 import os
 from pathlib import Path
 
 import pytest
 
-from eml2csv import eml2csv
+from eml2csv import convert, eml2csv
 from eml2csv.lib import InvalidInputError
 
 tests_path = Path("tests")
@@ -118,3 +120,211 @@ def test_election_ids_do_not_match():
             candidates_eml_path="tests/Kandidatenlijsten_GR2022_WestMaasenWaal.eml.xml",
             output_csv_path=None,
         )
+
+
+def test_counts_root_is_checked_before_reading_the_rest_of_the_file():
+    # Everything after the header is malformed, so the id check has to happen before the rest is read
+    counts_eml = io.BytesIO(
+        b'<EML xmlns="urn:oasis:names:tc:evs:schema:eml" Id="230b"><ElectionIdentifier Id="TK2025"/>'
+        b'<ContestIdentifier Id="6"/><</EML>'
+    )
+    with pytest.raises(InvalidInputError, match=r"was not an EML counts file \(510b\)"):
+        eml2csv(
+            counts_eml_path=counts_eml,  # type: ignore[arg-type]
+            candidates_eml_path="tests/Kandidatenlijsten_TK2025_Nijmegen.eml.xml",
+            output_csv_path=None,
+        )
+
+
+def test_output_can_be_written_to_a_binary_stream():
+    output_csv = io.BytesIO()
+    eml2csv(
+        counts_eml_path="tests/Telling_GR2022_WestMaasenWaal.eml.xml",
+        candidates_eml_path="tests/Kandidatenlijsten_GR2022_WestMaasenWaal.eml.xml",
+        output_csv_path=output_csv,
+    )
+
+    assert not output_csv.closed
+    assert output_csv.getvalue() == (tests_path / "osv4-3_telling_gr2022_westmaasenwaal.csv").read_bytes()
+
+
+class UnseekableStream(io.RawIOBase):
+    # Like standard input or an HTTP request body
+    def __init__(self, content):
+        self.content = io.BytesIO(content)
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        return self.content.readinto(buffer)
+
+
+@pytest.mark.parametrize("layout", ["wide", "long"])
+def test_input_can_be_read_from_streams_that_cannot_be_rewound(layout):
+    def stream(name):
+        return io.BufferedReader(UnseekableStream((tests_path / name).read_bytes()))
+
+    output_csv = io.BytesIO()
+    eml2csv(
+        stream("Telling_GR2022_WestMaasenWaal.eml.xml"),
+        stream("Kandidatenlijsten_GR2022_WestMaasenWaal.eml.xml"),
+        output_csv,
+        layout=layout,
+    )
+
+    expected = io.BytesIO()
+    eml2csv(
+        "tests/Telling_GR2022_WestMaasenWaal.eml.xml",
+        "tests/Kandidatenlijsten_GR2022_WestMaasenWaal.eml.xml",
+        expected,
+        layout=layout,
+    )
+    assert output_csv.getvalue() == expected.getvalue()
+
+
+def test_output_can_be_written_to_a_text_stream():
+    output_csv = io.StringIO()
+    eml2csv(
+        counts_eml_path="tests/Telling_GR2022_WestMaasenWaal.eml.xml",
+        candidates_eml_path="tests/Kandidatenlijsten_GR2022_WestMaasenWaal.eml.xml",
+        output_csv_path=output_csv,
+    )
+
+    expected = (tests_path / "osv4-3_telling_gr2022_westmaasenwaal.csv").read_text(encoding="utf-8-sig")
+    assert output_csv.getvalue() == "\ufeff" + expected
+
+
+@pytest.mark.parametrize(
+    ("counts_eml_filename", "candidates_eml_filename", "oracle_filename"),
+    [
+        (
+            "Telling_GR2022_WestMaasenWaal.eml.xml",
+            "Kandidatenlijsten_GR2022_WestMaasenWaal.eml.xml",
+            "osv4-3_telling_gr2022_westmaasenwaal.csv",
+        ),
+        (
+            "Telling_TK2025_gemeente_West_Maas_en_Waal.eml.xml",
+            "Kandidatenlijsten_TK2025_Nijmegen.eml.xml",
+            "osv4-3_telling_tk2025_gemeente_westmaasenwaal.csv",
+        ),
+    ],
+)
+def test_long_layout_has_every_value_of_the_wide_layout(
+    tmp_path, counts_eml_filename, candidates_eml_filename, oracle_filename
+):
+    output_csv_path = eml2csv(
+        str(tests_path / counts_eml_filename), str(tests_path / candidates_eml_filename), str(tmp_path), layout="long"
+    )
+
+    assert output_csv_path == str(tmp_path / oracle_filename.replace("osv4-3_", "long_"))
+    with open(output_csv_path, encoding="utf-8-sig", newline="") as file:
+        long_rows = list(csv.reader(file, delimiter=";"))
+    with open(tests_path / oracle_filename, encoding="utf-8-sig", newline="") as file:
+        wide_rows = list(csv.reader(file, delimiter=";"))
+
+    assert long_rows[:5] == wide_rows[:5]
+    # Every value of the wide layout is found by its reporting unit and list, candidate or metadata name
+    wide_values = {}
+    affiliation_id = ""
+    for row in wide_rows[8:]:
+        affiliation_id = row[0] or affiliation_id
+        key = (affiliation_id, row[2]) if row[2] or row[0] else ("", row[1])
+        for unit, value in zip(["Totaal", *wide_rows[6][5:]], row[4:], strict=True):
+            wide_values[(unit, *key)] = value
+    long_values = {}
+    for unit_id, unit_name, _, list_id, name, candidate_id, _, value in long_rows[6:]:
+        key = (list_id, candidate_id) if list_id else ("", name)
+        long_values[(unit_id or unit_name, *key)] = value
+    assert long_values == wide_values
+
+
+def test_converted_table_matches_oracle_file():
+    table = convert(
+        "tests/Telling_GR2022_WestMaasenWaal.eml.xml", "tests/Kandidatenlijsten_GR2022_WestMaasenWaal.eml.xml"
+    )
+
+    with open(tests_path / "osv4-3_telling_gr2022_westmaasenwaal.csv", encoding="utf-8-sig", newline="") as file:
+        oracle_rows = list(csv.reader(file, delimiter=";"))
+    assert table.to_rows() == oracle_rows
+    stream = io.StringIO()
+    assert table.to_csv(stream) is None
+    assert stream.getvalue() == (tests_path / "osv4-3_telling_gr2022_westmaasenwaal.csv").read_text(encoding="utf-8")
+    assert table.default_file_name == "osv4-3_telling_gr2022_westmaasenwaal.csv"
+
+
+def test_converted_table_has_the_counts_as_integers():
+    table = convert(
+        "tests/Telling_GR2022_WestMaasenWaal.eml.xml", "tests/Kandidatenlijsten_GR2022_WestMaasenWaal.eml.xml"
+    )
+
+    assert table.authority_name == "West Maas en Waal"
+    assert len(table.reporting_units) == table.votes.n_columns - 1
+    assert table.reporting_units[0].id == oracle_row(6)[5]
+    assert table.reporting_units[0].zip == oracle_row(7)[5]
+    valid = table.counters["geldige stembiljetten"]
+    assert valid[0] == sum(valid[1:])
+    assert table.counters["aangetroffen stembiljetten"][0] == (
+        valid[0] + table.counters["blanco stembiljetten"][0] + table.counters["ongeldige stembiljetten"][0]
+    )
+    list_votes = table.votes.row(("1", None))
+    assert list_votes is not None
+    assert list(map(str, list_votes)) == oracle_row(24)[4:]
+
+
+def oracle_row(idx):
+    with open(tests_path / "osv4-3_telling_gr2022_westmaasenwaal.csv", encoding="utf-8-sig", newline="") as file:
+        return list(csv.reader(file, delimiter=";"))[idx]
+
+
+def test_contest_is_read_from_a_candidates_file_with_more_contests(tmp_path, national_candidates_eml):
+    output_csv = "osv4-3_telling_tk2025_gemeente_westmaasenwaal.csv"
+    eml2csv(
+        counts_eml_path="tests/Telling_TK2025_gemeente_West_Maas_en_Waal.eml.xml",
+        candidates_eml_path=national_candidates_eml,
+        output_csv_path=str(tmp_path / output_csv),
+    )
+
+    assert (tmp_path / output_csv).read_bytes() == (tests_path / output_csv).read_bytes()
+
+
+@pytest.mark.parametrize(
+    ("original", "replacement"),
+    [
+        # Whitespace around the = of the attribute
+        (b'<ContestIdentifier Id="6"', b'<ContestIdentifier Id = "6"'),
+        # A comment that looks like the start of a contest
+        (b"<CandidateList>", b"<CandidateList><!-- <Contest> <ContestIdentifier Id='6'/> -->"),
+    ],
+    ids=["spaced_attribute", "comment"],
+)
+def test_contest_is_found_in_unusual_candidates_files(tmp_path, national_candidates_eml, original, replacement):
+    national = Path(national_candidates_eml)
+    content = national.read_bytes()
+    assert original in content
+    national.write_bytes(content.replace(original, replacement))
+    output_csv = "osv4-3_telling_tk2025_gemeente_westmaasenwaal.csv"
+    eml2csv(
+        counts_eml_path="tests/Telling_TK2025_gemeente_West_Maas_en_Waal.eml.xml",
+        candidates_eml_path=national_candidates_eml,
+        output_csv_path=str(tmp_path / output_csv),
+    )
+
+    assert (tmp_path / output_csv).read_bytes() == (tests_path / output_csv).read_bytes()
+
+
+def test_contest_missing_from_a_candidates_file_with_more_contests(tmp_path):
+    haarlem = (tests_path / "Kandidatenlijsten_TK2025_Haarlem.eml.xml").read_bytes()
+    contest = haarlem[haarlem.index(b"<Contest>") : haarlem.index(b"</Contest>") + len(b"</Contest>")]
+    path = tmp_path / "Kandidatenlijsten_TK2025.eml.xml"
+    path.write_bytes(haarlem.replace(contest, contest + contest.replace(b'Id="10"', b'Id="11"', 1)))
+
+    with pytest.raises(
+        InvalidInputError,
+        match=r"Contest ids did not match! Counts file was 6 while candidates file was 10, 11",
+    ):
+        eml2csv(
+            counts_eml_path="tests/Telling_TK2025_gemeente_West_Maas_en_Waal.eml.xml",
+            candidates_eml_path=str(path),
+            output_csv_path=None,
+        )
@@ -0,0 +1,69 @@
+import os
+import shutil
+from pathlib import Path
+
+import pytest
+
+from eml2csv import EmlIndex, EmlPair
+
+tests_path = Path("tests")
+
+
+@pytest.fixture
+def eml_dir(tmp_path):
+    for path in tests_path.glob("*.eml.xml"):
+        shutil.copy(path, tmp_path)
+    (tmp_path / "notes.xml").write_text("<notes>not an EML file")
+    return tmp_path
+
+
+def test_counts_files_are_paired_with_matching_candidates_file(eml_dir):
+    index = EmlIndex(str(eml_dir))
+    index.scan()
+
+    assert index.pairs() == [
+        EmlPair(
+            str(eml_dir / "Telling_GR2022_WestMaasenWaal.eml.xml"),
+            str(eml_dir / "Kandidatenlijsten_GR2022_WestMaasenWaal.eml.xml"),
+        ),
+        EmlPair(
+            str(eml_dir / "Telling_TK2025_gemeente_West_Maas_en_Waal.eml.xml"),
+            str(eml_dir / "Kandidatenlijsten_TK2025_Nijmegen.eml.xml"),
+        ),
+    ]
+
+
+def test_counts_file_without_candidates_file_is_unpaired(eml_dir):
+    os.remove(eml_dir / "Kandidatenlijsten_TK2025_Nijmegen.eml.xml")
+    index = EmlIndex(str(eml_dir))
+    index.scan()
+
+    assert EmlPair(str(eml_dir / "Telling_TK2025_gemeente_West_Maas_en_Waal.eml.xml"), None) in index.pairs()
+
+
+def test_rescan_only_probes_changed_files(eml_dir):
+    index = EmlIndex(str(eml_dir))
+    index.scan()
+    index.save()
+    assert index.probed == 6
+
+    index = EmlIndex.load(str(eml_dir))
+    index.scan()
+    assert index.probed == 0
+
+    with open(eml_dir / "Telling_GR2022_WestMaasenWaal.eml.xml", "a") as file:
+        file.write("\n")
+    index.scan()
+    assert index.probed == 1
+    assert len(index.pairs()) == 2
+
+
+def test_file_declaring_entities_does_not_stop_the_scan(eml_dir):
+    (eml_dir / "hostile.eml.xml").write_bytes(
+        b'<!DOCTYPE EML [<!ENTITY a "aaaaaaaaaa">]><EML xmlns="urn:oasis:names:tc:evs:schema:eml" Id="510b">&a;</EML>'
+    )
+    index = EmlIndex(str(eml_dir))
+    index.scan()
+
+    assert index.entries["hostile.eml.xml"].eml_id is None
+    assert len(index.pairs()) == 2
@@ -0,0 +1,45 @@
+import json
+
+import typer
+from typer.testing import CliRunner
+
+from eml2csv import Profiler, eml2csv
+from eml2csv.main import main
+
+counts_eml_path = "tests/Telling_GR2022_WestMaasenWaal.eml.xml"
+candidates_eml_path = "tests/Kandidatenlijsten_GR2022_WestMaasenWaal.eml.xml"
+
+
+def test_every_stage_is_recorded(tmp_path):
+    ended = []
+    with Profiler([ended.append], trace_memory=True) as profiler:
+        eml2csv(counts_eml_path, candidates_eml_path, str(tmp_path), profiler=profiler)
+
+    assert [stats.name for stats in ended] == ["probe", "read_counts", "read_candidates", "write"]
+    assert all(stats.calls == 1 and stats.peak_bytes is not None for stats in ended)
+    assert profiler.stages["read_candidates"].counts["affiliations"] > 0
+    write = profiler.stages["write"]
+    # The written bytes exclude the byte order mark
+    assert write.counts["bytes"] == (tmp_path / "osv4-3_telling_gr2022_westmaasenwaal.csv").stat().st_size - 3
+
+
+def test_memory_is_not_traced_by_default(tmp_path):
+    profiler = Profiler()
+    eml2csv(counts_eml_path, candidates_eml_path, str(tmp_path), profiler=profiler)
+
+    assert profiler.stages["read_counts"].peak_bytes is None
+    assert profiler.stages["read_counts"].counts["reporting_units"] > 0
+
+
+def test_profile_option_saves_json_report(tmp_path):
+    cli = typer.Typer()
+    cli.command()(main)
+
+    result = CliRunner().invoke(
+        cli,
+        [counts_eml_path, candidates_eml_path, "--output", str(tmp_path), "--profile-output", str(tmp_path / "p.json")],
+    )
+
+    assert result.exit_code == 0, result.output
+    report = json.loads((tmp_path / "p.json").read_text(encoding="utf-8"))
+    assert [stage["name"] for stage in report["stages"]] == ["probe", "read_counts", "read_candidates", "write"]
@@ -0,0 +1,75 @@
+import os
+import shutil
+from pathlib import Path
+
+import pytest
+from typer.testing import CliRunner
+
+from eml2csv import ConversionJob, Manifest, convert_many
+from eml2csv.main import app
+from eml2csv.manifest import MANIFEST_FILE_NAME
+
+tests_path = Path("tests")
+gr_counts = "Telling_GR2022_WestMaasenWaal.eml.xml"
+gr_candidates = "Kandidatenlijsten_GR2022_WestMaasenWaal.eml.xml"
+gr_oracle = "osv4-3_telling_gr2022_westmaasenwaal.csv"
+
+
+@pytest.fixture
+def job(tmp_path):
+    for name in [gr_counts, gr_candidates]:
+        shutil.copy(tests_path / name, tmp_path)
+    (tmp_path / "output").mkdir()
+    return ConversionJob(str(tmp_path / gr_counts), str(tmp_path / gr_candidates), str(tmp_path / "output"))
+
+
+def convert(job: ConversionJob):
+    manifest = Manifest.load(os.path.join(str(job.output_csv_path), MANIFEST_FILE_NAME))
+    report = convert_many([job], manifest=manifest)
+    manifest.save()
+    return report.results[0]
+
+
+def test_unchanged_files_are_not_converted_again(job):
+    first = convert(job)
+    # Touching a file without changing its contents does not make the output stale
+    os.utime(job.candidates_eml_path, ns=(1, 1))
+    second = convert(job)
+
+    assert first.ok
+    assert not first.skipped
+    assert second.skipped
+    assert second.output_csv_path == first.output_csv_path
+
+
+def test_changed_input_is_converted_again(job):
+    convert(job)
+    counts = Path(job.counts_eml_path)
+    counts.write_bytes(counts.read_bytes().replace(b"<Cast>", b"<Cast> "))
+
+    assert not convert(job).skipped
+
+
+@pytest.mark.parametrize("change", ["modify", "remove"])
+def test_changed_output_is_converted_again(job, change):
+    output_csv_path = Path(convert(job).output_csv_path or "")
+    if change == "modify":
+        output_csv_path.write_text("edited", encoding="utf-8")
+    else:
+        output_csv_path.unlink()
+
+    assert not convert(job).skipped
+    assert output_csv_path.read_bytes() == (tests_path / gr_oracle).read_bytes()
+
+
+def test_batch_command_skips_up_to_date_outputs(tmp_path, job):
+    args = ["batch", str(tmp_path), "--output-dir", str(tmp_path / "output")]
+
+    CliRunner().invoke(app, args)
+    result = CliRunner().invoke(app, args)
+    forced = CliRunner().invoke(app, [*args, "--force"])
+
+    assert result.exit_code == 0, result.output
+    assert "Converted 0 of 1 files, 1 were up to date" in result.output
+    assert "Converted 1 of 1 files in" in forced.output
+    assert job.output_csv_path is not None
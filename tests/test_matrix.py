@@ -0,0 +1,30 @@
+from array import array
+
+from eml2csv.matrix import VoteMatrix, add_rows
+
+
+def test_rows_are_created_on_first_vote():
+    votes = VoteMatrix()
+    votes.add_column()
+    votes.set(("1", None), 0, 10)
+    votes.add_column()
+    votes.set(("1", "1"), 1, 7)
+
+    assert votes.row(("1", None)) == array("q", [10, 0])
+    assert votes.row(("1", "1")) == array("q", [0, 7])
+    assert votes.row(("2", None)) is None
+
+
+def test_row_indexes_follow_requested_order():
+    votes = VoteMatrix()
+    column = votes.add_column()
+    votes.set(("1", None), column, 3)
+    votes.set(("2", None), column, 5)
+
+    indexes = votes.row_indexes([("2", None), ("3", None), ("1", None)])
+
+    assert [votes.formatted_row(idx) for idx in indexes] == [["5"], [], ["3"]]
+
+
+def test_add_rows():
+    assert add_rows(array("q", [1, 2]), array("q", [10, 20]), array("q", [100, 200])) == array("q", [111, 222])
@@ -0,0 +1,56 @@
+import io
+from pathlib import Path
+
+import pytest
+
+from eml2csv import EmlProbe, probe_eml
+
+tests_path = Path("tests")
+
+
+def test_probe_counts_file():
+    assert probe_eml("tests/Telling_TK2025_gemeente_West_Maas_en_Waal.eml.xml") == EmlProbe(
+        eml_id="510b",
+        election_id="TK2025",
+        contest_id="6",
+        authority_id="0668",
+        authority_name="West Maas en Waal",
+    )
+
+
+def test_probe_candidates_file():
+    assert probe_eml("tests/Kandidatenlijsten_TK2025_Haarlem.eml.xml") == EmlProbe(
+        eml_id="230b",
+        election_id="TK2025",
+        contest_id="10",
+        authority_id="CSB",
+        authority_name="De Kiesraad",
+    )
+
+
+def test_probe_only_reads_the_header():
+    counts = (tests_path / "Telling_GR2022_WestMaasenWaal.eml.xml").read_bytes()
+    # Truncating the file after the header makes it malformed, which the probe never notices
+    truncated = counts[: counts.index(b"<TotalVotes>") + 100]
+
+    assert probe_eml(io.BytesIO(truncated)).contest_id == "geen"
+
+
+def test_probe_rewinds_stream():
+    stream = io.BytesIO((tests_path / "Kandidatenlijsten_GR2022_WestMaasenWaal.eml.xml").read_bytes())
+
+    assert probe_eml(stream).eml_id == "230b"
+    assert stream.tell() == 0
+
+
+def test_probe_non_eml_file():
+    assert probe_eml(io.BytesIO(b"<Other Id='510b'><ContestIdentifier Id='1'/></Other>")) == EmlProbe()
+
+
+def test_probe_refuses_streams_that_cannot_be_rewound():
+    class Unseekable(io.BytesIO):
+        def seekable(self):
+            return False
+
+    with pytest.raises(ValueError, match="cannot be rewound"):
+        probe_eml(Unseekable(Path("tests/Telling_GR2022_WestMaasenWaal.eml.xml").read_bytes()))
@@ -0,0 +1,146 @@
+import http.client
+import json
+import threading
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+import pytest
+
+from eml2csv.server import ConversionServer, _convert, _init_server_worker
+from eml2csv.util import get_xml_backend
+from eml2csv.worker import process_cache
+
+tests_path = Path("tests")
+COUNTS_EML = tests_path / "Telling_GR2022_WestMaasenWaal.eml.xml"
+CANDIDATES_EML = tests_path / "Kandidatenlijsten_GR2022_WestMaasenWaal.eml.xml"
+ORACLE_CSV = tests_path / "osv4-3_telling_gr2022_westmaasenwaal.csv"
+
+
+@pytest.fixture
+def start_server():
+    servers = []
+
+    def start(**kwargs):
+        server = ConversionServer(("127.0.0.1", 0), workers=1, log_requests=False, **kwargs)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def post(url, body, content_type):
+    request = urllib.request.Request(url, data=body, headers={"Content-Type": content_type}, method="POST")
+    try:
+        with urllib.request.urlopen(request) as response:
+            return response.status, response.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.read()
+
+
+def upload(url, counts_eml, candidates_eml):
+    boundary = "eml2csv-test-boundary"
+    body = b""
+    for name, path in (("counts", counts_eml), ("candidates", candidates_eml)):
+        body += (
+            (
+                f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{path.name}"\r\n'
+                "Content-Type: application/xml\r\n\r\n"
+            ).encode()
+            + path.read_bytes()
+            + b"\r\n"
+        )
+    body += f"--{boundary}--\r\n".encode()
+    return post(url, body, f"multipart/form-data; boundary={boundary}")
+
+
+def test_uploaded_files_are_converted(start_server):
+    server = start_server()
+
+    status, csv = upload(f"{server.url}/convert", COUNTS_EML, CANDIDATES_EML)
+
+    assert status == 200
+    assert csv == ORACLE_CSV.read_bytes()
+    # The candidates file is parsed once and then served from the cache of the worker
+    assert upload(f"{server.url}/convert", COUNTS_EML, CANDIDATES_EML) == (200, csv)
+
+
+def test_paths_are_resolved_within_the_root(start_server):
+    server = start_server(root=str(tests_path))
+    url = f"{server.url}/convert"
+
+    request = {"counts": COUNTS_EML.name, "candidates": CANDIDATES_EML.name}
+    assert post(url, json.dumps(request).encode(), "application/json") == (200, ORACLE_CSV.read_bytes())
+    request["counts"] = "../pyproject.toml"
+    assert post(url, json.dumps(request).encode(), "application/json")[0] == 403
+
+
+def test_files_that_do_not_match_are_unprocessable(start_server):
+    server = start_server()
+
+    status, message = upload(
+        f"{server.url}/convert", COUNTS_EML, tests_path / "Kandidatenlijsten_TK2025_Nijmegen.eml.xml"
+    )
+
+    assert status == 422
+    assert b"did not match" in message
+
+
+@pytest.mark.parametrize("length", ["many", "-1"])
+def test_invalid_content_length_is_a_bad_request(start_server, length):
+    server = start_server()
+    connection = http.client.HTTPConnection(*server.server_address[:2])
+    try:
+        connection.putrequest("POST", "/convert")
+        connection.putheader("Content-Type", "application/json")
+        connection.putheader("Content-Length", length)
+        connection.endheaders()
+        response = connection.getresponse()
+
+        assert response.status == 400
+        assert b"Content-Length" in response.read()
+    finally:
+        connection.close()
+
+
+def test_requests_are_refused_when_the_pool_is_full(start_server):
+    server = start_server(max_pending=0)
+
+    status, _ = upload(f"{server.url}/convert", COUNTS_EML, CANDIDATES_EML)
+
+    assert status == 503
+
+
+def test_metrics_count_the_requests(start_server):
+    server = start_server()
+    upload(f"{server.url}/convert", COUNTS_EML, CANDIDATES_EML)
+    post(f"{server.url}/convert", b"{}", "application/json")
+
+    with urllib.request.urlopen(f"{server.url}/metrics") as response:
+        metrics = json.load(response)
+
+    assert metrics["requests"] == 2
+    assert metrics["statuses"] == {"200": 1, "400": 1}
+    assert metrics["latency"]["count"] == 2
+    assert metrics["in_flight"] == 0
+
+
+def test_warmed_candidates_are_not_evicted_by_counts_files(national_candidates_eml, monkeypatch):
+    monkeypatch.setattr(process_cache, "max_entries", 3)
+    process_cache.clear()
+    _init_server_worker(None, get_xml_backend().name, [national_candidates_eml])
+    counts = (tests_path / "Telling_TK2025_gemeente_West_Maas_en_Waal.eml.xml").read_bytes()
+    misses, hits = process_cache.stats.misses, process_cache.stats.hits
+
+    # Many more counts files of one contest than fit in the cache, then one of the other contest
+    requests = [counts.replace(b"<Cast>16290</Cast>", f"<Cast>{cast}</Cast>".encode()) for cast in range(6)]
+    requests.append(counts.replace(b'<ContestIdentifier Id="6"', b'<ContestIdentifier Id="10"'))
+    for request in requests:
+        _convert(request, national_candidates_eml, "wide")
+
+    # Only the counts files were parsed, the candidates of both contests were read from the cache
+    assert (process_cache.stats.misses - misses, process_cache.stats.hits - hits) == (len(requests), len(requests))
@@ -0,0 +1,95 @@
+import io
+from pathlib import Path
+
+import pytest
+
+from eml2csv import eml2csv
+from eml2csv.lib import InvalidInputError, _read_counts_eml
+from eml2csv.sharding import _split_shards, read_counts_sharded
+from tests.synthetic import SyntheticElection, write_pair
+
+counts_eml_path = "tests/Telling_TK2025_gemeente_West_Maas_en_Waal.eml.xml"
+candidates_eml_path = "tests/Kandidatenlijsten_TK2025_Nijmegen.eml.xml"
+
+
+@pytest.mark.parametrize("workers", [2, 3, 64])
+def test_sharded_read_matches_single_pass(workers):
+    expected = _read_counts_eml(counts_eml_path)
+    actual = read_counts_sharded(counts_eml_path, workers)
+
+    assert as_lists(actual) == as_lists(expected)
+
+
+def test_sharded_conversion_matches_oracle_file():
+    output = io.BytesIO()
+    eml2csv(counts_eml_path, candidates_eml_path, output, parse_workers=2)
+
+    assert output.getvalue() == Path("tests/osv4-3_telling_tk2025_gemeente_westmaasenwaal.csv").read_bytes()
+
+
+def test_rows_first_set_in_a_later_shard_keep_their_order(tmp_path):
+    counts_path, _ = write_pair(tmp_path, SyntheticElection(seed=3, reporting_units=6, affiliations=3, candidates=4))
+    content = counts_path.read_bytes()
+    # Without the candidate votes in the totals, candidates are first seen in the reporting units
+    start = content.index(b"<TotalVotes>")
+    end = content.index(b"</TotalVotes>")
+    totals = content[start:end]
+    list_totals = b"".join(
+        selection + b"</Selection>"
+        for selection in totals.split(b"</Selection>")
+        if b"AffiliationIdentifier" in selection
+    )
+    counts_path.write_bytes(content[:start] + list_totals[list_totals.index(b"<TotalVotes>") :] + content[end:])
+
+    expected = _read_counts_eml(str(counts_path))
+    assert as_lists(read_counts_sharded(str(counts_path), 3)) == as_lists(expected)
+
+
+def test_shards_are_consecutive_runs_of_about_the_same_size():
+    blocks = [(offset, offset + 10) for offset in range(100, 1100, 10)]
+
+    shards = _split_shards(blocks, 4)
+
+    assert [block for shard in shards for block in shard] == blocks
+    assert [len(shard) for shard in shards] == [25, 25, 25, 25]
+    assert _split_shards(blocks[:2], 4) == [[block] for block in blocks[:2]]
+
+
+@pytest.mark.parametrize(
+    ("original", "replacement"),
+    [
+        (b"</ReportingUnitVotes>", b"<!-- </ReportingUnitVotes> <ReportingUnitVotes> --></ReportingUnitVotes>"),
+        (b"<ReportingUnitVotes>", b"<ReportingUnitVotes><![CDATA[</ReportingUnitVotes>]]>"),
+        (b"<ReportingUnitVotes>", b"<ReportingUnitVotes Note='a > b'\n>"),
+        (b"</ReportingUnitVotes>", b"</ReportingUnitVotes\n>"),
+        (b"<TotalVotes>", b"<?note <ReportingUnitVotes> ?><TotalVotes>"),
+        (b"<EML", b"<!-- <ReportingUnitVotes> --><EML"),
+    ],
+    ids=["comment", "cdata", "attribute", "end_tag", "processing_instruction", "before_root"],
+)
+def test_sharded_read_skips_markup_that_looks_like_a_block(tmp_path, original, replacement):
+    content = Path(counts_eml_path).read_bytes()
+    assert original in content
+    counts_path = tmp_path / "counts.eml.xml"
+    counts_path.write_bytes(content.replace(original, replacement, 2))
+
+    expected = _read_counts_eml(str(counts_path))
+    # A shard per block, so that every boundary between blocks is one between shards as well
+    assert as_lists(read_counts_sharded(str(counts_path), 64)) == as_lists(expected)
+
+
+def test_sharded_read_checks_the_root_element():
+    with pytest.raises(InvalidInputError, match="was not an EML counts file"):
+        read_counts_sharded(candidates_eml_path, 2)
+
+
+def as_lists(counts_eml):
+    # The vote matrix does not compare by value, and the order of the rows and counters matters as well
+    return (
+        [getattr(counts_eml, name) for name in ("election_id", "contest_id", "authority_id", "authority_name")],
+        counts_eml.reporting_unit_ids,
+        counts_eml.reporting_unit_names,
+        [(counter, values.tolist()) for counter, values in counts_eml.counters.items()],
+        [(key, counts_eml.votes.rows[idx].tolist()) for key, idx in counts_eml.votes.row_index.items()],
+        counts_eml.votes.n_columns,
+    )
@@ -0,0 +1,136 @@
+import csv
+import sqlite3
+from pathlib import Path
+
+import pytest
+from typer.testing import CliRunner
+
+from eml2csv import ConversionJob, SqliteSink, convert_many
+from eml2csv.lib import _read_candidates_eml, _read_counts_eml
+from eml2csv.main import app
+
+PAIRS = [
+    (
+        "tests/Telling_GR2022_WestMaasenWaal.eml.xml",
+        "tests/Kandidatenlijsten_GR2022_WestMaasenWaal.eml.xml",
+        "tests/osv4-3_telling_gr2022_westmaasenwaal.csv",
+    ),
+    (
+        "tests/Telling_TK2025_gemeente_West_Maas_en_Waal.eml.xml",
+        "tests/Kandidatenlijsten_TK2025_Nijmegen.eml.xml",
+        "tests/osv4-3_telling_tk2025_gemeente_westmaasenwaal.csv",
+    ),
+]
+
+
+def _read_csv(path: str) -> list[list[str]]:
+    with open(path, encoding="utf-8-sig", newline="") as file:
+        return list(csv.reader(file, delimiter=";"))
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_convert_many_loads_counts_into_sqlite(tmp_path, workers):
+    database_path = str(tmp_path / "counts.sqlite")
+    jobs = [ConversionJob(counts, candidates) for counts, candidates, _ in PAIRS]
+
+    report = convert_many(jobs, workers=workers, output_sqlite=database_path)
+
+    assert report.failed == []
+    assert [result.output_csv_path for result in report.results] == [database_path] * len(jobs)
+    with sqlite3.connect(database_path) as connection:
+        for counts_eml_path, _, csv_path in PAIRS:
+            rows = _read_csv(csv_path)
+            (counts_id, authority_id) = connection.execute(
+                "SELECT id, authority_id FROM counts WHERE source LIKE ?", (f"%{Path(counts_eml_path).name}",)
+            ).fetchone()
+            assert authority_id == rows[3][2]
+
+            units = connection.execute(
+                "SELECT name, reporting_unit_id, zip FROM reporting_units WHERE counts_id = ? ORDER BY position",
+                (counts_id,),
+            ).fetchall()
+            assert [name for name, _, _ in units] == rows[5][5:]
+            assert [unit_id for _, unit_id, _ in units] == rows[6][5:]
+            assert [zip_code or "" for _, _, zip_code in units] == rows[7][5:]
+
+            # Every affiliation and candidate row of the csv matches the votes in the database
+            affiliation_id = None
+            for row in rows[24:]:
+                if row[0]:
+                    affiliation_id = row[0]
+                votes = connection.execute(
+                    "SELECT votes FROM votes WHERE counts_id = ? AND affiliation_id = ? AND candidate_id IS ?"
+                    " ORDER BY position",
+                    (counts_id, affiliation_id, row[2] or None),
+                ).fetchall()
+                assert [str(value) for (value,) in votes] == row[4:]
+
+            total_counted = connection.execute(
+                "SELECT value FROM counters WHERE counts_id = ? AND tag = 'TotalCounted' ORDER BY position",
+                (counts_id,),
+            ).fetchall()
+            assert [str(value) for (value,) in total_counted] == rows[13][4:]
+
+
+def test_sqlite_sink_replaces_counts_loaded_before(tmp_path):
+    database_path = str(tmp_path / "counts.sqlite")
+    counts_eml_path, candidates_eml_path, _ = PAIRS[0]
+    counts_eml = _read_counts_eml(counts_eml_path)
+    candidates_eml = _read_candidates_eml(candidates_eml_path)
+
+    for _ in range(2):
+        with SqliteSink(database_path) as sink:
+            sink.add(counts_eml, candidates_eml, counts_eml_path)
+
+    with sqlite3.connect(database_path) as connection:
+        assert connection.execute("SELECT COUNT(*) FROM counts").fetchone() == (1,)
+        assert connection.execute("SELECT COUNT(DISTINCT counts_id) FROM votes").fetchone() == (1,)
+        assert connection.execute("SELECT COUNT(*) FROM affiliations").fetchone() == (
+            len(candidates_eml.candidate_info),
+        )
+
+
+def test_sqlite_sink_rolls_back_file_that_fails(tmp_path):
+    database_path = str(tmp_path / "counts.sqlite")
+    counts_eml_path, candidates_eml_path, _ = PAIRS[0]
+    counts_eml = _read_counts_eml(counts_eml_path)
+    candidates_eml = _read_candidates_eml(candidates_eml_path)
+    # One name too few, which only fails after the counts row has been inserted
+    counts_eml.reporting_unit_names.pop()
+
+    with SqliteSink(database_path) as sink, pytest.raises(ValueError, match="zip"):
+        sink.add(counts_eml, candidates_eml, counts_eml_path)
+
+    with sqlite3.connect(database_path) as connection:
+        assert connection.execute("SELECT COUNT(*) FROM counts").fetchone() == (0,)
+
+
+def test_batch_command_writes_sqlite(tmp_path):
+    input_dir = tmp_path / "input"
+    input_dir.mkdir()
+    for counts_eml_path, _, _ in PAIRS:
+        (input_dir / Path(counts_eml_path).name).write_bytes(Path(counts_eml_path).read_bytes())
+    database_path = tmp_path / "counts.sqlite"
+
+    result = CliRunner().invoke(
+        app,
+        [
+            "batch",
+            str(input_dir),
+            "--candidates",
+            "tests/Kandidatenlijsten_GR2022_WestMaasenWaal.eml.xml",
+            "--output-sqlite",
+            str(database_path),
+            "--output-dir",
+            str(tmp_path / "csv"),
+            "--workers",
+            "1",
+        ],
+    )
+
+    # The TK2025 counts file does not match the GR2022 candidates file
+    assert result.exit_code == 1
+    assert "Converted 1 of 2 files" in result.output
+    assert not (tmp_path / "csv").exists()
+    with sqlite3.connect(database_path) as connection:
+        assert connection.execute("SELECT authority_id FROM counts").fetchall() == [("0668",)]
@@ -0,0 +1,29 @@
+import io
+
+from eml2csv import eml2csv
+from eml2csv.lib import _read_counts_eml
+from tests.synthetic import SyntheticElection, write_counts_eml, write_pair
+
+election = SyntheticElection(seed=7, reporting_units=5, affiliations=3, candidates=4)
+
+
+def test_generator_is_deterministic():
+    first, second = io.StringIO(), io.StringIO()
+    write_counts_eml(first, election)
+    write_counts_eml(second, election)
+
+    assert first.getvalue() == second.getvalue()
+
+
+def test_generated_pair_is_consistent(tmp_path):
+    counts_path, candidates_path = write_pair(tmp_path, election)
+    counts_eml = _read_counts_eml(str(counts_path))
+
+    assert len(counts_eml.reporting_unit_ids) == election.reporting_units
+    assert len(counts_eml.votes.rows) == election.affiliations * (election.candidates + 1)
+    for row in counts_eml.votes.rows:
+        assert row[0] == sum(row[1:])
+    for values in counts_eml.counters.values():
+        assert values[0] == sum(values[1:])
+
+    assert eml2csv(str(counts_path), str(candidates_path), str(tmp_path)) is not None
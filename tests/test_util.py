@@ -0,0 +1,125 @@
+import io
+from pathlib import Path
+from xml.etree.ElementTree import ParseError
+
+import pytest
+from defusedxml import EntitiesForbidden
+from typer.testing import CliRunner
+
+from eml2csv import eml2csv, probe_eml
+from eml2csv.main import app
+from eml2csv.util import (
+    XmlBackend,
+    get_xml_backend,
+    iterparse_xml,
+    parse_xml,
+    set_xml_backend,
+)
+
+tests_path = Path("tests")
+
+
+@pytest.fixture(params=["defusedxml", "lxml"])
+def xml_backend(request):
+    if request.param == "lxml":
+        pytest.importorskip("lxml")
+    previous = get_xml_backend().name
+    yield set_xml_backend(request.param)
+    set_xml_backend(previous)
+
+
+@pytest.mark.parametrize(
+    ("counts_eml_filename", "candidates_eml_filename", "oracle_filename"),
+    [
+        (
+            "Telling_TK2025_gemeente_West_Maas_en_Waal.eml.xml",
+            "Kandidatenlijsten_TK2025_Nijmegen.eml.xml",
+            "osv4-3_telling_tk2025_gemeente_westmaasenwaal.csv",
+        ),
+        (
+            "Telling_GR2022_WestMaasenWaal.eml.xml",
+            "Kandidatenlijsten_GR2022_WestMaasenWaal.eml.xml",
+            "osv4-3_telling_gr2022_westmaasenwaal.csv",
+        ),
+    ],
+)
+@pytest.mark.usefixtures("xml_backend")
+def test_backends_produce_identical_csv(counts_eml_filename, candidates_eml_filename, oracle_filename):
+    output_csv = io.BytesIO()
+    eml2csv(str(tests_path / counts_eml_filename), str(tests_path / candidates_eml_filename), output_csv)
+
+    assert output_csv.getvalue() == (tests_path / oracle_filename).read_bytes()
+
+
+@pytest.mark.usefixtures("xml_backend")
+def test_malformed_file_raises_parse_error():
+    with pytest.raises(ParseError):
+        parse_xml(io.BytesIO(b"<EML><Unclosed></EML>"))
+    with pytest.raises(ParseError):
+        list(iterparse_xml(io.BytesIO(b"<EML><Unclosed></EML>")))
+
+
+@pytest.mark.usefixtures("xml_backend")
+@pytest.mark.parametrize(
+    "doctype",
+    [
+        b'<!DOCTYPE EML [<!ENTITY secret SYSTEM "file:///etc/passwd">]>',
+        b'<!DOCTYPE EML [<!ENTITY v "van">]>',
+        b'<!DOCTYPE EML [<!ENTITY % p "van">]>',
+    ],
+)
+def test_documents_declaring_entities_are_refused(doctype):
+    document = doctype + b'<EML xmlns="urn:oasis:names:tc:evs:schema:eml" Id="510b"><Name>Jan</Name></EML>'
+
+    with pytest.raises(EntitiesForbidden):
+        parse_xml(io.BytesIO(document))
+    with pytest.raises(EntitiesForbidden):
+        list(iterparse_xml(io.BytesIO(document)))
+
+
+@pytest.mark.usefixtures("xml_backend")
+def test_candidates_file_declaring_entities_is_refused(tmp_path):
+    candidates = (tests_path / "Kandidatenlijsten_GR2022_WestMaasenWaal.eml.xml").read_bytes()
+    start = candidates.index(b"<EML")
+    candidates = candidates[:start] + b'<!DOCTYPE EML [<!ENTITY v "van">]>' + candidates[start:]
+    (tmp_path / "candidates.eml.xml").write_bytes(candidates.replace(b"<xnl:NamePrefix>van", b"<xnl:NamePrefix>&v;"))
+
+    with pytest.raises(EntitiesForbidden):
+        eml2csv(str(tests_path / "Telling_GR2022_WestMaasenWaal.eml.xml"), str(tmp_path / "candidates.eml.xml"), None)
+
+
+@pytest.mark.usefixtures("xml_backend")
+def test_probe_works_with_every_backend():
+    probe = probe_eml(str(tests_path / "Telling_GR2022_WestMaasenWaal.eml.xml"))
+
+    assert (probe.eml_id, probe.contest_id) == ("510b", "geen")
+
+
+def test_xml_backend_option(tmp_path):
+    (tmp_path / "input").mkdir()
+    for name in ["Telling_GR2022_WestMaasenWaal.eml.xml", "Kandidatenlijsten_GR2022_WestMaasenWaal.eml.xml"]:
+        (tmp_path / "input" / name).write_bytes((tests_path / name).read_bytes())
+    previous = get_xml_backend().name
+    try:
+        result = CliRunner().invoke(
+            app,
+            ["batch", str(tmp_path / "input"), "--output-dir", str(tmp_path / "output"), "--xml-backend", "defusedxml"],
+        )
+        assert result.exit_code == 0, result.output
+        assert get_xml_backend().name == "defusedxml"
+    finally:
+        set_xml_backend(previous)
+    assert (tmp_path / "output" / "osv4-3_telling_gr2022_westmaasenwaal.csv").read_bytes() == (
+        tests_path / "osv4-3_telling_gr2022_westmaasenwaal.csv"
+    ).read_bytes()
+
+
+def test_backend_must_implement_every_method():
+    class IncompleteBackend(XmlBackend):
+        name = "incomplete"
+
+        def parse(self, file_name):
+            return parse_xml(file_name)
+
+    with pytest.raises(TypeError, match="abstract"):
+        IncompleteBackend()  # type: ignore[abstract]
@@ -0,0 +1,73 @@
+import json
+import re
+from pathlib import Path
+
+import pytest
+from typer.testing import CliRunner
+
+import eml2csv
+from eml2csv.main import app
+from eml2csv.validation import CANDIDATE_VOTES, TOTAL, TOTALS, validate, validate_many
+
+COUNTS_EML = "tests/Telling_GR2022_WestMaasenWaal.eml.xml"
+
+
+@pytest.fixture
+def tampered_counts_eml(tmp_path):
+    # Add 5 votes to the first candidate of the first reporting unit
+    content = Path(COUNTS_EML).read_text(encoding="utf-8")
+    unit_start = content.index("<ReportingUnitVotes>")
+    candidate = re.compile(r"(<CandidateIdentifier Id=\"1\"></CandidateIdentifier></Candidate><ValidVotes>)(\d+)")
+    match = candidate.search(content, unit_start)
+    assert match is not None
+    content = content[: match.start(2)] + str(int(match[2]) + 5) + content[match.end(2) :]
+    path = tmp_path / "Telling_tampered.eml.xml"
+    path.write_text(content, encoding="utf-8")
+    return str(path)
+
+
+@pytest.mark.parametrize("counts_eml", [COUNTS_EML, "tests/Telling_TK2025_gemeente_West_Maas_en_Waal.eml.xml"])
+def test_official_counts_add_up(counts_eml):
+    report = validate(counts_eml)
+
+    assert report.ok
+    assert len(report.reporting_unit_ids) == len(report.by_reporting_unit()) - 1
+
+
+def test_violations_are_reported_per_reporting_unit(tampered_counts_eml):
+    report = validate(tampered_counts_eml)
+    unit_id = report.reporting_unit_ids[0]
+
+    assert not report.ok
+    by_reporting_unit = report.by_reporting_unit()
+    # The candidates now add up to 5 more than the list, and the reporting units to 5 more than the totals
+    [candidates] = by_reporting_unit[unit_id]
+    assert (candidates.check, candidates.column, candidates.subject) == (CANDIDATE_VOTES, 1, "list 1")
+    assert candidates.expected == candidates.actual + 5
+    [totals] = by_reporting_unit[TOTAL]
+    assert (totals.check, totals.column, totals.subject) == (TOTALS, 0, "list 1 candidate 1")
+    assert totals.expected == totals.actual + 5
+    assert all(not violations for unit, violations in by_reporting_unit.items() if unit not in {TOTAL, unit_id})
+
+
+def test_validate_many_reports_errors_without_stopping(tampered_counts_eml):
+    reports = validate_many(
+        [COUNTS_EML, "tests/Kandidatenlijsten_GR2022_WestMaasenWaal.eml.xml", tampered_counts_eml], workers=1
+    )
+
+    assert [report.ok for report in reports] == [True, False, False]
+    assert reports[1].error is not None
+    assert reports[2].error is None
+
+
+def test_validate_command_exits_with_error_on_violations(tampered_counts_eml):
+    result = CliRunner().invoke(app, ["validate", COUNTS_EML, tampered_counts_eml, "--format", "json"])
+
+    assert result.exit_code == 1
+    reports = json.loads(result.stdout)
+    assert [report["ok"] for report in reports] == [True, False]
+    assert set(reports[1]["violations"]) == {TOTAL, validate(tampered_counts_eml).reporting_unit_ids[0]}
+
+
+def test_package_exports_the_function_rather_than_the_module():
+    assert callable(eml2csv.validate)
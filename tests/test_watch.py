@@ -0,0 +1,141 @@
+import os
+from pathlib import Path
+
+import pytest
+
+from eml2csv import Manifest
+from eml2csv.watch import Watcher
+from eml2csv.worker import process_cache
+
+tests_path = Path("tests")
+gr_counts = "Telling_GR2022_WestMaasenWaal.eml.xml"
+gr_candidates = "Kandidatenlijsten_GR2022_WestMaasenWaal.eml.xml"
+gr_oracle = "osv4-3_telling_gr2022_westmaasenwaal.csv"
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def watcher(tmp_path, clock):
+    (tmp_path / "input").mkdir()
+    return Watcher(str(tmp_path / "input"), str(tmp_path / "output"), settle=2.0, clock=clock)
+
+
+def test_counts_file_is_converted_once_complete(tmp_path, watcher, clock):
+    (tmp_path / "output").mkdir()
+    (tmp_path / "input" / gr_candidates).write_bytes((tests_path / gr_candidates).read_bytes())
+    counts = (tests_path / gr_counts).read_bytes()
+    # The counts file is still being written
+    (tmp_path / "input" / gr_counts).write_bytes(counts[: len(counts) // 2])
+    assert watcher.poll() == []
+
+    clock.now = 1.0
+    (tmp_path / "input" / gr_counts).write_bytes(counts)
+    os.utime(tmp_path / "input" / gr_counts, ns=(1, 1))
+    assert watcher.poll() == []
+
+    # Unchanged, but not for long enough
+    clock.now = 2.0
+    assert watcher.poll() == []
+
+    clock.now = 3.5
+    results = watcher.poll()
+    assert len(results) == 1
+    assert results[0].result.ok, results[0].result.error
+    # Measured from the moment the partially written file was first seen
+    assert results[0].latency == 3.5
+    assert (tmp_path / "output" / gr_oracle).read_bytes() == (tests_path / gr_oracle).read_bytes()
+
+    clock.now = 10.0
+    assert watcher.poll() == []
+
+
+def test_counts_file_waits_for_candidates_file(tmp_path, watcher, clock):
+    (tmp_path / "output").mkdir()
+    (tmp_path / "input" / gr_counts).write_bytes((tests_path / gr_counts).read_bytes())
+    watcher.poll()
+    clock.now = 5.0
+    assert watcher.poll() == []
+
+    (tmp_path / "input" / gr_candidates).write_bytes((tests_path / gr_candidates).read_bytes())
+    watcher.poll()
+    clock.now = 10.0
+    results = watcher.poll()
+
+    assert [result.result.job.counts_eml_path for result in results] == [str(tmp_path / "input" / gr_counts)]
+    assert results[0].latency == 10.0
+
+
+def test_changed_counts_file_is_converted_again(tmp_path, watcher, clock):
+    (tmp_path / "output").mkdir()
+    for name in [gr_counts, gr_candidates]:
+        (tmp_path / "input" / name).write_bytes((tests_path / name).read_bytes())
+    watcher.poll()
+    clock.now = 5.0
+    assert len(watcher.poll()) == 1
+
+    os.utime(tmp_path / "input" / gr_counts, ns=(1, 1))
+    watcher.poll()
+    clock.now = 10.0
+    results = watcher.poll()
+
+    assert len(results) == 1
+    assert results[0].latency == 5.0
+
+
+def test_restarted_watcher_skips_up_to_date_outputs(tmp_path, clock):
+    (tmp_path / "input").mkdir()
+    (tmp_path / "output").mkdir()
+    for name in [gr_counts, gr_candidates]:
+        (tmp_path / "input" / name).write_bytes((tests_path / name).read_bytes())
+    manifest_path = str(tmp_path / "output" / "manifest.json")
+
+    skipped = []
+    for _ in range(2):
+        watcher = Watcher(
+            str(tmp_path / "input"), str(tmp_path / "output"), manifest=Manifest.load(manifest_path), clock=clock
+        )
+        watcher.poll()
+        clock.now += 5.0
+        skipped.extend(result.result.skipped for result in watcher.poll())
+
+    assert skipped == [False, True]
+
+
+def test_candidates_are_not_evicted_by_counts_files(tmp_path, clock, national_candidates_eml, monkeypatch):
+    monkeypatch.setattr(process_cache, "max_entries", 3)
+    process_cache.clear()
+    (tmp_path / "input").mkdir()
+    (tmp_path / "output").mkdir()
+    counts = (tests_path / "Telling_TK2025_gemeente_West_Maas_en_Waal.eml.xml").read_bytes()
+    other_contest = counts.replace(b'<ContestIdentifier Id="6"', b'<ContestIdentifier Id="10"')
+    # Converted in the order of their names: a contest, many more counts files of another, then the first again
+    (tmp_path / "input" / "a.eml.xml").write_bytes(other_contest)
+    for cast in range(6):
+        (tmp_path / "input" / f"b{cast}.eml.xml").write_bytes(
+            counts.replace(b"<Cast>16290</Cast>", f"<Cast>{cast}</Cast>".encode())
+        )
+    (tmp_path / "input" / "c.eml.xml").write_bytes(other_contest.replace(b"<Cast>16290</Cast>", b"<Cast>1</Cast>"))
+    watcher = Watcher(
+        str(tmp_path / "input"), str(tmp_path / "output"), candidates_eml_path=national_candidates_eml, clock=clock
+    )
+    watcher.poll()
+    clock.now = 5.0
+    misses, hits = process_cache.stats.misses, process_cache.stats.hits
+
+    results = watcher.poll()
+
+    assert [result.result.error for result in results] == [None] * 8
+    # Every counts file was parsed, but the candidates of each contest only once
+    assert (process_cache.stats.misses - misses, process_cache.stats.hits - hits) == (8 + 2, 6)